@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: map phase of vibetrack.chunked_analysis on a large synthetic diff,
+against the stand-in server (vibetrack.stub_server) taking a fixed time per
+request and serving several at once, with 1 worker versus N. --one-file puts
+all the hunks in a single file, which the one-request path would trim to
+MAX_FILE_BYTES; the chunks cover it by hunk instead.
+
+Usage: python benchmarks/bench_chunked_analysis.py [--files 200] [--latency 0.5] [--workers 4] [--one-file]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def make_diff(files, hunks, one_file=False):
+    if one_file:
+        hunks, files = hunks * files, 1
+    parts = []
+    for index in range(files):
+        body = ''.join(f'@@ -{h * 50 + 1},3 +{h * 50 + 1},3 @@\n context\n-value_{h} = {index}\n+value_{h} = {index + 1}\n context\n'
+                       for h in range(hunks))
+        parts.append(f'diff --git a/pkg/module_{index}.py b/pkg/module_{index}.py\n'
+                     f'--- a/pkg/module_{index}.py\n+++ b/pkg/module_{index}.py\n{body}')
+    return ''.join(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=200, help='files in the diff')
+    parser.add_argument('--hunks', type=int, default=6, help='hunks per file')
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds the server spends per request')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent requests in the parallel run')
+    parser.add_argument('--one-file', action='store_true', help='put every hunk in one big file')
+    args = parser.parse_args()
+
+    from vibetrack.stub_server import StubServer
+
+    server = StubServer(latency=args.latency).start()
+    os.environ['VIBETRACK_API_URL'] = server.url
+    os.environ['VIBETRACK_NO_CACHE'] = '1'
+    os.environ['VIBETRACK_CONCURRENCY'] = str(args.workers)
+    os.environ.setdefault('VIBETRACK_CACHE_DIR', tempfile.mkdtemp())
+
+    from vibetrack.chunked_analysis import analyze_chunks, needs_chunks, split_diff
+    from vibetrack.diff_utils import prepare_diff_for_model
+
+    diff = make_diff(args.files, args.hunks, args.one_file)
+    prepared = prepare_diff_for_model(diff)
+    chunks = split_diff(diff)
+    covered = sum(chunk.text.count('\n+value_') for chunk in chunks)
+    print(f'{len(diff)} bytes of diff; one request would send {len(prepared.text)} bytes '
+          f'({len(prepared.trimmed)} files trimmed, {len(prepared.summarized)} summarized)')
+    print(f'chunked: {needs_chunks(prepared)} -> {len(chunks)} chunks, '
+          f"{covered} of {diff.count(chr(10) + '+value_')} added lines sent")
+
+    print(f"{'workers':<10} {'wall (s)':>10} {'parts/s':>10}")
+    for workers in (1, args.workers):
+        start = time.perf_counter()
+        analyze_chunks(chunks, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f'{workers:<10} {elapsed:>10.3f} {len(chunks) / elapsed:>10.1f}')
+    server.stop()
+
+if __name__ == '__main__':
+    main()
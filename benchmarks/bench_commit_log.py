@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: checking every commit of a range against its message, one commit
+at a time the way a per-commit script of `vibetrack` invocations does (git
+processes for the message and the diff, a new HTTP connection, one request
+after another) versus commit_analyzer.analyze_commit_range, which reads the
+whole range from one `git log -p` stream and keeps several requests in
+flight. The model is the stand-in server (vibetrack.stub_server).
+
+Usage: python benchmarks/bench_commit_log.py [--commits 60] [--latency 0.3] [--slots 4]
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def make_repo(path, commits, files, seed):
+    """Create a repository with `commits` commits, each editing a few Python files"""
+    rng = random.Random(seed)
+
+    def git(*args):
+        return subprocess.run(['git'] + list(args), cwd=path, check=True, stdout=subprocess.PIPE).stdout
+
+    git('init', '-q')
+    git('config', 'user.email', 'bench@example.com')
+    git('config', 'user.name', 'bench')
+    paths = [f'module_{index}.py' for index in range(files)]
+    contents = {relative: [f'def function_{line}():\n    return {line}\n' for line in range(40)] for relative in paths}
+    for index in range(commits):
+        for relative in rng.sample(paths, 2):
+            lines = contents[relative]
+            line = rng.randrange(len(lines))
+            lines[line] = f'def function_{line}():\n    return {line} + {index}\n'
+            with open(os.path.join(path, relative), 'w') as f:
+                f.writelines(lines)
+        git('add', '-A')
+        git('commit', '-q', '-m', f'Tweak return values ({index})')
+
+def per_commit(hashes):
+    """One invocation's worth of work per commit, in sequence"""
+    from vibetrack.commit_analyzer import range_messages
+    from vibetrack.diff_utils import prepare_diff_for_model, read_commit_diff
+    from vibetrack.local_client import LocalModelClient
+
+    for commit_hash in hashes:
+        message = subprocess.check_output(['git', 'log', '-1', '--format=%B', commit_hash]).decode()
+        diff = read_commit_diff(commit_hash)
+        client = LocalModelClient(cache=None)
+        client.chat(range_messages(message, prepare_diff_for_model(diff).text), temperature=0.3, max_tokens=256)
+        client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--commits', type=int, default=60, help='commits in the range')
+    parser.add_argument('--files', type=int, default=20, help='files in the repository')
+    parser.add_argument('--latency', type=float, default=0.3, help='seconds the server spends per request')
+    parser.add_argument('--slots', type=int, default=4, help='requests the server runs at once')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ['VIBETRACK_NO_CACHE'] = '1'
+    os.environ.setdefault('VIBETRACK_CACHE_DIR', tempfile.mkdtemp())
+    from vibetrack.stub_server import StubServer
+
+    server = StubServer(latency=args.latency, slots=args.slots).start()
+    os.environ['VIBETRACK_API_URL'] = server.url
+
+    with tempfile.TemporaryDirectory() as path:
+        make_repo(path, args.commits + 1, args.files, args.seed)
+        os.chdir(path)
+        from vibetrack.commit_analyzer import analyze_commit_range
+
+        revision_range = f'HEAD~{args.commits}..HEAD'
+        hashes = subprocess.check_output(['git', 'rev-list', '--reverse', revision_range]).decode().split()
+
+        print(f'{args.commits} commits, server: {args.latency}s per request, {args.slots} at once')
+        print(f"{'method':<28} {'wall (s)':>10} {'commits/min':>12}")
+
+        start = time.perf_counter()
+        per_commit(hashes)
+        elapsed = time.perf_counter() - start
+        print(f"{'per commit, sequential':<28} {elapsed:>10.3f} {60 * len(hashes) / elapsed:>12.0f}")
+
+        for concurrency in (1, args.slots):
+            start = time.perf_counter()
+            results, _ = analyze_commit_range(revision_range, concurrency=concurrency)
+            elapsed = time.perf_counter() - start
+            assert len(results) == len(hashes)
+            label = f'git log -p, {concurrency} at a time'
+            print(f'{label:<28} {elapsed:>10.3f} {60 * len(results) / elapsed:>12.0f}')
+        os.chdir('/')
+    server.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark: buffered `git diff` (check_output + decode + splitlines + join)
+versus the streaming reader in vibetrack.diff_utils.
+
+"stream" only reads the files one after another. "parsed" is read_git_diff,
+which keeps the whole diff as a ParsedDiff, so its peak grows with the diff.
+"shown" is what `vibetrack check` runs: every file drawn in a panel (to
+/dev/null) and spooled to a temporary file. "analyzed" goes on to prepare the
+model request and its chunks and to save the Markdown, JSON and HTML reports
+and the history entry, all read back from the spool. Those two stay bounded.
+
+Each mode runs in a fresh interpreter so peak RSS is measured independently.
+
+Usage: python benchmarks/bench_diff_stream.py [--mb 200] [--files 400] [--modes legacy,stream,parsed,shown,analyzed]
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def legacy_read():
+    """The pre-streaming code path of generate_git_diff"""
+    from vibetrack.diff_utils import DEFAULT_EXTENSIONS
+
+    diff_output = subprocess.check_output(['git', 'diff', 'HEAD~1', 'HEAD'], stderr=subprocess.STDOUT).decode('utf-8')
+    filtered_diff = []
+    capture = False
+    for line in diff_output.splitlines():
+        if line.startswith('diff --git'):
+            capture = False
+            for ext in DEFAULT_EXTENSIONS:
+                if line.endswith(ext) or (ext + ' ') in line:
+                    capture = True
+                    break
+        if capture:
+            filtered_diff.append(line)
+    return len('\n'.join(filtered_diff))
+
+def stream_read():
+    """Consume the diff file by file without ever holding all of it"""
+    from vibetrack.diff_utils import stream_git_diff
+
+    total = 0
+    for file_diff in stream_git_diff(['HEAD~1', 'HEAD']):
+        total += len(file_diff)
+    return total
+
+def parsed_read():
+    """The diff as the analysis commands hold it"""
+    from vibetrack.diff_utils import read_git_diff
+
+    return len(read_git_diff(['HEAD~1', 'HEAD']))
+
+def _shown():
+    from rich.console import Console
+
+    import vibetrack.main
+    from vibetrack.diff_utils import stream_git_diff
+
+    vibetrack.main.console = Console(file=open(os.devnull, 'w'), force_terminal=True, width=120)
+    return vibetrack.main.show_diff_stream(stream_git_diff(['HEAD~1', 'HEAD']), 'diff')
+
+def shown_read():
+    """The display path of the analysis commands, drawn to /dev/null and spooled"""
+    return len(_shown())
+
+def analyzed_read():
+    """shown, then the model request, its chunks and every report, without asking a model"""
+    from vibetrack.chunked_analysis import split_diff
+    from vibetrack.diff_utils import prepare_diff_for_model
+    from vibetrack.history_store import HistoryStore
+    from vibetrack.save_result import save_report
+
+    diff = _shown()
+    prepare_diff_for_model(diff)
+    split_diff(diff)
+    with HistoryStore('history.sqlite') as store:
+        save_report(diff, 'explanation', 'HEAD~1', 'HEAD', formats=['md', 'json', 'html'], store=store)
+    return len(diff)
+
+MODES = {'legacy': legacy_read, 'stream': stream_read, 'parsed': parsed_read, 'shown': shown_read,
+         'analyzed': analyzed_read}
+
+def run_child(mode):
+    """Entry point of the measured child process"""
+    sys.path.insert(0, REPO_ROOT)
+    start = time.perf_counter()
+    size = MODES[mode]()
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak_kb //= 1024
+    print(f'{elapsed:.3f} {peak_kb} {size}')
+
+def make_repo(path, total_mb, files):
+    """Create a repository whose last commit has a diff of roughly total_mb megabytes"""
+    def git(*args):
+        subprocess.check_call(['git'] + list(args), cwd=path, stdout=subprocess.DEVNULL)
+
+    git('init', '-q')
+    git('config', 'user.email', 'bench@example.com')
+    git('config', 'user.name', 'bench')
+    git('commit', '-q', '--allow-empty', '-m', 'empty')
+
+    # Each line shows up once as an added line in the diff
+    line = 'value = "' + 'x' * 70 + '"\n'
+    lines_per_file = max(1, (total_mb * 1024 * 1024) // (len(line) * files))
+    for index in range(files):
+        with open(os.path.join(path, f'module_{index}.py'), 'w') as f:
+            f.write(line * lines_per_file)
+    git('add', '-A')
+    git('commit', '-q', '-m', 'big change')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mb', type=int, default=200, help='approximate diff size in MB')
+    parser.add_argument('--files', type=int, default=400, help='number of changed files')
+    parser.add_argument('--modes', default='legacy,stream,parsed,shown,analyzed', help='modes to run, comma-separated')
+    parser.add_argument('--child', choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as repo:
+        print(f'Creating a ~{args.mb} MB diff across {args.files} files...')
+        make_repo(repo, args.mb, args.files)
+
+        print(f"{'mode':<8} {'wall (s)':>10} {'peak RSS (MB)':>15} {'diff chars':>14}")
+        for mode in args.modes.split(','):
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), '--child', mode], cwd=repo
+            ).decode().split()
+            elapsed, peak_kb, size = float(output[0]), int(output[1]), int(output[2])
+            print(f'{mode:<8} {elapsed:>10.3f} {peak_kb / 1024:>15.1f} {size:>14}')
+
+if __name__ == '__main__':
+    main()
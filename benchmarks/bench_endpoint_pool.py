@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark: a batch of model requests against 1 versus N stand-in servers
+(vibetrack.stub_server), each generating a fixed number of requests at a
+time, then the same batch with one server shut down halfway through to show
+the failover.
+
+Usage: python benchmarks/bench_endpoint_pool.py [--servers 3] [--requests 36] [--latency 0.3] [--slots 2]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', type=int, default=3, help='stand-in inference servers')
+    parser.add_argument('--requests', type=int, default=36, help='requests in the batch')
+    parser.add_argument('--latency', type=float, default=0.3, help='seconds a server spends per request')
+    parser.add_argument('--slots', type=int, default=2, help='requests each server runs at once')
+    args = parser.parse_args()
+
+    os.environ['VIBETRACK_NO_CACHE'] = '1'
+    os.environ.setdefault('VIBETRACK_CACHE_DIR', tempfile.mkdtemp())
+
+    from vibetrack.async_engine import AsyncEngine
+    from vibetrack.local_client import LocalModelClient
+    from vibetrack.stub_server import StubServer
+
+    servers = [StubServer(latency=args.latency, slots=args.slots).start() for _ in range(args.servers)]
+    urls = [server.url for server in servers]
+    prompts = [[{'role': 'user', 'content': f'prompt {index}'}] for index in range(args.requests)]
+
+    async def batch(client, concurrency):
+        async with AsyncEngine(concurrency, client=client) as engine:
+            return await engine.chat_many(prompts)
+
+    print(f"{'servers':<22} {'wall (s)':>10} {'req/s':>8} {'failed':>8} {'retries':>8}")
+    for label, endpoints, kill_after in (('1', urls[:1], None),
+                                         (str(args.servers), urls, None),
+                                         (f'{args.servers}, one dies', urls, args.latency * 2)):
+        concurrency = args.slots * len(endpoints)
+        client = LocalModelClient(api_url=endpoints, pool_size=concurrency)
+        if kill_after is not None:
+            def kill():
+                time.sleep(kill_after)
+                servers[0].stop()
+            threading.Thread(target=kill, daemon=True).start()
+        start = time.perf_counter()
+        results = asyncio.run(batch(client, concurrency))
+        elapsed = time.perf_counter() - start
+        failed = sum(isinstance(result, Exception) for result in results)
+        print(f'{label:<22} {elapsed:>10.3f} {len(prompts) / elapsed:>8.1f} {failed:>8} {client.retries:>8}')
+        client.close()
+    for server in servers[1:]:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
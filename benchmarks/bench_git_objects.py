@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark: commit message + changed files per commit, asked one git process
+at a time (`git log --format=%B` and `git diff-tree` per commit, the old
+get_commit_message path) versus vibetrack.git_objects.ObjectStore, which
+keeps `git cat-file --batch` running and diffs trees in-process.
+
+The second table reads each commit's diff for a path filter that keeps one
+package out of ten, as `vibetrack commit` does: one `git log -p` per commit,
+versus read_commit_diff, which asks the store first and starts git only for
+commits that touch a kept file.
+
+Usage: python benchmarks/bench_git_objects.py [--commits 500] [--files 200]
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vibetrack.git_objects import ObjectStore
+
+def make_repo(path, commits, files, seed):
+    """Create a repository with `commits` commits, each touching a few files across a small tree"""
+    rng = random.Random(seed)
+
+    def git(*args, **kwargs):
+        return subprocess.run(['git'] + list(args), cwd=path, check=True, stdout=subprocess.PIPE, **kwargs).stdout
+
+    git('init', '-q')
+    git('config', 'user.email', 'bench@example.com')
+    git('config', 'user.name', 'bench')
+
+    paths = [os.path.join(f'pkg_{i % 10}', f'sub_{i % 7}', f'module_{i}.py') for i in range(files)]
+    for relative in paths:
+        os.makedirs(os.path.join(path, os.path.dirname(relative)), exist_ok=True)
+        with open(os.path.join(path, relative), 'w') as f:
+            f.write(f'# {relative}\n')
+    git('add', '-A')
+    git('commit', '-q', '-m', 'initial')
+
+    # fast-import keeps repository creation quick even for thousands of commits
+    stream = []
+    branch = git('branch', '--show-current').decode().strip()
+    for index in range(commits):
+        message = f'change {index}\n\nTouches a few modules.\n'
+        stream.append(f'commit refs/heads/{branch}')
+        stream.append(f'committer bench <bench@example.com> {1700000000 + index} +0000')
+        stream.append(f'data {len(message.encode())}')
+        stream.append(message)
+        if index == 0:
+            stream.append(f'from refs/heads/{branch}^0')
+        for relative in rng.sample(paths, 3):
+            content = f'# {relative}\nvalue = {index}\n'
+            stream.append(f'M 100644 inline {relative}')
+            stream.append(f'data {len(content.encode())}')
+            stream.append(content)
+        stream.append('')
+    git('fast-import', '--quiet', input=('\n'.join(stream) + '\n').encode())
+    git('reset', '-q', '--hard')
+    return git('rev-list', 'HEAD').decode().split()
+
+def per_call(commits):
+    """Two git processes per commit"""
+    changed = 0
+    for oid in commits:
+        subprocess.check_output(['git', 'log', '--format=%B', '-n', '1', oid]).decode('utf-8').strip()
+        output = subprocess.check_output(['git', 'diff-tree', '--no-commit-id', '-r', '--root', '--name-status', oid])
+        changed += len(output.splitlines())
+    return changed
+
+def batched(commits):
+    """One long-lived cat-file process for everything"""
+    changed = 0
+    with ObjectStore() as store:
+        for oid in commits:
+            store.commit_message(oid)
+            changed += len(store.commit_changes(oid))
+    return changed
+
+def diff_per_call(commits, path_filter):
+    """One git log -p per commit"""
+    from vibetrack.diff_utils import ParsedDiff, stream_commit_diff
+    return sum(len(ParsedDiff.from_chunks(stream_commit_diff(oid, path_filter))) for oid in commits)
+
+def diff_routed(commits, path_filter):
+    """git log -p only for the commits the store says touch a kept file"""
+    from vibetrack.diff_utils import read_commit_diff
+    return sum(len(read_commit_diff(oid, path_filter)) for oid in commits)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--commits', type=int, default=500, help='number of commits to analyze')
+    parser.add_argument('--files', type=int, default=200, help='files in the tree')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as repo:
+        print(f'Creating {args.commits} commits over {args.files} files...')
+        commits = make_repo(repo, args.commits, args.files, args.seed)
+        os.chdir(repo)
+
+        print(f"{'mode':<10} {'wall (s)':>10} {'commits/s':>12} {'changes':>10}")
+        for name, function in (('per-call', per_call), ('batched', batched)):
+            start = time.perf_counter()
+            changed = function(commits)
+            elapsed = time.perf_counter() - start
+            print(f'{name:<10} {elapsed:>10.3f} {len(commits) / elapsed:>12.1f} {changed:>10}')
+
+        from vibetrack.diff_utils import PathFilter
+        path_filter = PathFilter(include=['pkg_0/*'])
+        print(f"\n{'diff read':<10} {'wall (s)':>10} {'commits/s':>12} {'diff chars':>10}")
+        for name, function in (('per-call', diff_per_call), ('routed', diff_routed)):
+            start = time.perf_counter()
+            size = function(commits, path_filter)
+            elapsed = time.perf_counter() - start
+            print(f'{name:<10} {elapsed:>10.3f} {len(commits) / elapsed:>12.1f} {size:>10}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: finding "every analysis on branch X in the last week" among many
+saved analyses. The file variant is the old one-JSON-file-per-run history/
+directory, globbed and parsed on every query. The store variant is the
+SQLite analysis history (vibetrack.history_store): several writer processes
+append the same analyses in batches at once, then the query runs on its
+indexes.
+
+Usage: python benchmarks/bench_history.py [--analyses 20000] [--writers 4] [--batch 200]
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BRANCHES = ['main', 'develop'] + [f'feature-{index}' for index in range(40)]
+NOW = datetime(2024, 6, 1)
+
+def make_row(index, rng):
+    created = NOW - timedelta(minutes=rng.randrange(60 * 24 * 180))
+    row_id = f'{created:%Y-%m-%d_%H-%M-%S}_bench-{index}'
+    branch = rng.choice(BRANCHES)
+    explanation = f'Analysis {index}: the change adjusts the request handling. ' * 8
+    return {
+        'id': row_id, 'batch': row_id, 'created_at': created.isoformat(), 'repo': '/srv/app', 'branch': branch,
+        'analysis_type': rng.choice(('diff', 'diff', 'tree')), 'commit_hash': f'{rng.getrandbits(160):040x}',
+        'files_changed': 3, 'additions': 40, 'deletions': 12, 'summary': explanation[:80],
+        'data': {'metadata': {'id': row_id, 'generated': created.isoformat(), 'current_branch': branch},
+                 'analysis': {'diff': '+line\n' * 200, 'explanation': explanation}},
+    }
+
+def rows_for(writer, writers, analyses, seed):
+    rng = random.Random(seed)
+    rows = [make_row(index, rng) for index in range(analyses)]
+    return rows[writer::writers]
+
+def write_files(directory, rows):
+    for row in rows:
+        with open(os.path.join(directory, f"vibetrack_{row['analysis_type']}_{row['id']}.json"), 'w') as f:
+            json.dump(row, f)
+
+def append_batches(args):
+    path, writer, writers, analyses, seed, batch = args
+    from vibetrack.history_store import HistoryStore
+    rows = rows_for(writer, writers, analyses, seed)
+    started = time.perf_counter()
+    with HistoryStore(path) as store:
+        for start in range(0, len(rows), batch):
+            store.append_many(rows[start:start + batch])
+    return len(rows), started, time.perf_counter()
+
+def query_files(directory, branch, since):
+    found = []
+    for filename in glob.glob(os.path.join(directory, 'vibetrack_*.json')):
+        with open(filename) as f:
+            row = json.load(f)
+        if row['branch'] == branch and row['created_at'] >= since:
+            found.append(row)
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--analyses', type=int, default=20000, help='saved analyses')
+    parser.add_argument('--writers', type=int, default=4, help='processes appending at once')
+    parser.add_argument('--batch', type=int, default=200, help='analyses per transaction')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    from vibetrack.history_store import HistoryStore
+
+    since = (NOW - timedelta(days=7)).isoformat()
+    with tempfile.TemporaryDirectory() as directory:
+        files = os.path.join(directory, 'history')
+        os.makedirs(files)
+        path = os.path.join(directory, 'history.sqlite')
+        print(f'{args.analyses} analyses, {args.writers} writers, {args.batch} per transaction')
+        print(f"{'step':<40} {'wall (s)':>10} {'found':>8}")
+
+        rows = rows_for(0, 1, args.analyses, args.seed)
+        start = time.perf_counter()
+        write_files(files, rows)
+        print(f"{'write one file per analysis':<40} {time.perf_counter() - start:>10.3f} {args.analyses:>8}")
+
+        # Timed from the first writer starting to append to the last one finishing, rows already built
+        with multiprocessing.Pool(args.writers) as pool:
+            spans = pool.map(append_batches, [(path, writer, args.writers, args.analyses, args.seed, args.batch)
+                                              for writer in range(args.writers)])
+        written = sum(count for count, _, _ in spans)
+        elapsed = max(end for _, _, end in spans) - min(start for _, start, _ in spans)
+        print(f"{'append to the store, concurrent writers':<40} {elapsed:>10.3f} {written:>8}")
+
+        for branch in ('main', 'feature-7'):
+            start = time.perf_counter()
+            found = query_files(files, branch, since)
+            print(f"{f'{branch}, last week: glob + parse files':<40} {time.perf_counter() - start:>10.3f} {len(found):>8}")
+            with HistoryStore(path) as store:
+                start = time.perf_counter()
+                found = store.query(repo='/srv/app', branch=branch, since=since, limit=0)
+                print(f"{f'{branch}, last week: indexed query':<40} {time.perf_counter() - start:>10.3f} {len(found):>8}")
+
+if __name__ == '__main__':
+    main()
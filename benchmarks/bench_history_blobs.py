@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: disk usage and write throughput of saved analyses when the same
+commits are analyzed over and over (CI re-runs, several people checking the
+same branch). The files variant writes the Markdown, JSON and HTML reports of
+every run to history/, each with the whole diff. The store variants append
+the runs to the analysis history (vibetrack.history_store), where each
+distinct diff is stored once, compressed with the given codec.
+
+Usage: python benchmarks/bench_history_blobs.py [--commits 40] [--runs 5] [--files 30]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def make_diff(rng, files):
+    """A diff that looks like source code changes, `files` files with a few hunks each"""
+    words = ['value', 'request', 'result', 'config', 'handler', 'items', 'index', 'client', 'session', 'path']
+    parts = []
+    for number in range(files):
+        name = f'src/{rng.choice(words)}_{number}.py'
+        parts.append(f'diff --git a/{name} b/{name}\n--- a/{name}\n+++ b/{name}\n')
+        for hunk in range(4):
+            parts.append(f'@@ -{hunk * 40 + 1},12 +{hunk * 40 + 1},14 @@ def {rng.choice(words)}_{hunk}(self):\n')
+            for _ in range(12):
+                left, right = rng.sample(words, 2)
+                marker = rng.choice(' +-  ')
+                parts.append(f'{marker}        {left} = self.{right}.get({left}, {rng.randrange(100)})\n')
+    return ''.join(parts)
+
+def directory_size(path):
+    total = 0
+    for root, _, names in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in names)
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--commits', type=int, default=40, help='distinct diffs')
+    parser.add_argument('--runs', type=int, default=5, help='analyses of each diff')
+    parser.add_argument('--files', type=int, default=30, help='files per diff')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    from vibetrack.history_store import _CODECS, HistoryStore
+    from vibetrack.save_result import Report
+
+    rng = random.Random(args.seed)
+    diffs = [make_diff(rng, args.files) for _ in range(args.commits)]
+    raw = sum(len(diff.encode('utf-8')) for diff in diffs) * args.runs
+    explanation = 'The change moves the lookups onto the session and adds defaults. ' * 10
+    reports = [Report(diff, explanation, 'HEAD~1', 'HEAD', extra_data={'commit_hash': f'{number:040x}'})
+               for _ in range(args.runs) for number, diff in enumerate(diffs)]
+    for report in reports:
+        report.stats  # counted up front, so only the writing is timed
+        report._context = ('main', [], None, '/srv/app')
+
+    print(f'{len(reports)} analyses of {args.commits} diffs, {raw / len(reports) / 1024:.0f} KiB of diff each')
+    print(f"{'variant':<32} {'disk (MiB)':>11} {'analyses/s':>11} {'MiB/s':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        files = os.path.join(directory, 'history')
+        start = time.perf_counter()
+        for report in reports:
+            report.save(['md', 'json', 'html'], files)
+        elapsed = time.perf_counter() - start
+        print(f"{'files: md + json + html':<32} {directory_size(files) / 1024 / 1024:>11.1f} "
+              f'{len(reports) / elapsed:>11.0f} {raw / elapsed / 1024 / 1024:>8.1f}')
+
+        for codec in ('none', 'zlib', 'lzma', 'zstd'):
+            if codec not in _CODECS:
+                print(f"{'store, ' + codec:<32} {'(pip install zstandard)':>32}")
+                continue
+            path = os.path.join(directory, f'history-{codec}.sqlite')
+            start = time.perf_counter()
+            with HistoryStore(path, codec) as store:
+                # One transaction per run, as a batch job would append
+                for run in range(args.runs):
+                    batch = reports[run * args.commits:(run + 1) * args.commits]
+                    store.append_many([report.history_row() for report in batch])
+            elapsed = time.perf_counter() - start
+            size = sum(os.path.getsize(name) for name in (path, path + '-wal') if os.path.exists(name))
+            print(f"{'store, ' + codec:<32} {size / 1024 / 1024:>11.1f} "
+                  f'{len(reports) / elapsed:>11.0f} {raw / elapsed / 1024 / 1024:>8.1f}')
+
+if __name__ == '__main__':
+    main()
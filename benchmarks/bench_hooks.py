@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark: time `git commit` spends in a pre-commit check of the staged
+changes. The cold variant runs the way a plain hook would: a new Python
+process imports vibetrack (typer, rich, requests, cryptography) and waits
+for the model. The hook variants use the installed vibetrack hooks and their
+warm background analyzer. The model is the stand-in server
+(vibetrack.stub_server).
+
+Usage: python benchmarks/bench_hooks.py [--commits 5] [--latency 0.5] [--think 2]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COLD_HOOK = """
+import vibetrack.cli_en
+from vibetrack.diff_utils import read_git_diff, prepare_diff_for_model
+from vibetrack.hook_manager import staged_messages
+from vibetrack.local_client import get_client
+get_client().chat(staged_messages(prepare_diff_for_model(read_git_diff(['--cached'])).text), max_tokens=200)
+"""
+
+def git(path, *args):
+    return subprocess.run(['git'] + list(args), cwd=path, check=True, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE).stdout
+
+def stage_change(path, index):
+    with open(os.path.join(path, f'module_{index % 5}.py'), 'a') as f:
+        f.write(f'\ndef step_{index}(value):\n    return value * {index}\n')
+    git(path, 'add', '-A')
+
+def timed_commit(path, index):
+    start = time.perf_counter()
+    git(path, 'commit', '-q', '-m', f'Add step_{index}() to module_{index % 5}.py')
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--commits', type=int, default=5, help='commits per variant')
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds before the model answers')
+    parser.add_argument('--think', type=float, default=2.0,
+                        help='seconds between staging and committing in the warm variant')
+    args = parser.parse_args()
+
+    os.environ['VIBETRACK_NO_CACHE'] = '1'
+    os.environ.setdefault('VIBETRACK_CACHE_DIR', tempfile.mkdtemp())
+    os.environ.setdefault('VIBETRACK_INDEX', os.path.join(tempfile.mkdtemp(), 'index.sqlite'))
+    os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [sys.path[0], os.environ.get('PYTHONPATH')]))
+    from vibetrack.stub_server import StubServer
+
+    server = StubServer(latency=args.latency, token_rate=50).start()
+    os.environ['VIBETRACK_API_URL'] = server.url
+
+    with tempfile.TemporaryDirectory() as path:
+        git(path, 'init', '-q')
+        git(path, 'config', 'user.email', 'bench@example.com')
+        git(path, 'config', 'user.name', 'bench')
+        stage_change(path, 0)
+        git(path, 'commit', '-q', '-m', 'Initial commit')
+
+        from vibetrack.hook_manager import find_repository, install_hooks, stop_daemon
+        index = 1
+        print(f'server: {args.latency}s before the answer, 50 tokens/s')
+        print(f"{'pre-commit check':<40} {'median (s)':>10} {'max (s)':>8}")
+
+        times = []
+        for _ in range(args.commits):
+            stage_change(path, index)
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', COLD_HOOK], cwd=path, check=True)
+            git(path, 'commit', '-q', '-m', f'Add step_{index}()')
+            times.append(time.perf_counter() - start)
+            index += 1
+        print(f"{'cold process, blocking model call':<40} {statistics.median(times):>10.3f} {max(times):>8.3f}")
+
+        install_hooks(cwd=path)
+        for label, think in (('warm hooks, commit right after staging', 0.0),
+                             (f'warm hooks, commit {args.think:g}s after staging', args.think)):
+            times = []
+            for _ in range(args.commits):
+                stage_change(path, index)
+                time.sleep(think)
+                times.append(timed_commit(path, index))
+                index += 1
+            print(f'{label:<40} {statistics.median(times):>10.3f} {max(times):>8.3f}')
+        stop_daemon(find_repository(path)[0])
+    server.stop()
+
+if __name__ == '__main__':
+    main()
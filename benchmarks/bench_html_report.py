@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark: the HTML report for diffs with many files. The one-<pre> variant
+puts the whole escaped diff into the page, which the browser has to lay out
+before it shows anything. The paged variant (Report.html) shows a file index
+and collapsed per-file sections, and keeps each file's diff compressed in a
+script block until the section is opened. "Markup" is what the browser
+parses into elements when the page opens; the compressed blocks are read
+only on expand.
+
+Usage: python benchmarks/bench_html_report.py [--files 100,1000,5000] [--lines 60]
+"""
+
+import argparse
+import html
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHUNK_RE = re.compile(r'<script type="application/octet-stream" id="chunk-\d+">[^<]*</script>')
+
+def make_diff(files, lines):
+    parts = []
+    for number in range(files):
+        path = f'src/package_{number % 40}/module_{number}.py'
+        parts.append(f'diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -1,{lines} +1,{lines} @@\n')
+        parts.append(''.join(f'-    result_{line} = compute(value, {line})\n'
+                             f'+    result_{line} = compute(value, {line}, cache=True)\n' for line in range(lines // 2)))
+    return ''.join(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', default='100,1000,5000', help='files per diff, comma-separated')
+    parser.add_argument('--lines', type=int, default=60, help='changed lines per file')
+    args = parser.parse_args()
+
+    from vibetrack.save_result import Report
+
+    print(f"{'files':>6} {'diff (MiB)':>11} {'variant':<10} {'page (MiB)':>11} {'markup (MiB)':>13} {'write (s)':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for files in (int(count) for count in args.files.split(',')):
+            diff = make_diff(files, args.lines)
+            size = len(diff.encode('utf-8')) / 1024 / 1024
+            report = Report(diff, 'Every call now goes through the cache.', 'HEAD~1', 'HEAD')
+            report.stats
+            report._context = ('main', [], None, directory)
+
+            start = time.perf_counter()
+            page = f'<pre>{html.escape(diff)}</pre>'
+            with open(os.path.join(directory, 'single.html'), 'w', encoding='utf-8') as f:
+                f.write(page)
+            elapsed = time.perf_counter() - start
+            page_size = len(page.encode('utf-8')) / 1024 / 1024
+            print(f"{files:>6} {size:>11.1f} {'one <pre>':<10} {page_size:>11.1f} {page_size:>13.1f} {elapsed:>10.2f}")
+
+            start = time.perf_counter()
+            filename = report.save(['html'], directory)['html']
+            elapsed = time.perf_counter() - start
+            with open(filename, encoding='utf-8') as f:
+                page = f.read()
+            page_size = len(page.encode('utf-8')) / 1024 / 1024
+            markup = len(CHUNK_RE.sub('', page).encode('utf-8')) / 1024 / 1024
+            print(f"{files:>6} {size:>11.1f} {'paged':<10} {page_size:>11.1f} {markup:>13.1f} {elapsed:>10.2f}")
+
+if __name__ == '__main__':
+    main()
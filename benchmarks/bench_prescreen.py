@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark: checking a range of commits with and without the local pre-screen
+(vibetrack.prescreen). The history mixes version bumps, documentation and CI
+commits, commits whose message names what they change, vague 'wip' commits
+and plain code changes; the pre-screen settles the clear ones without a model
+request. The model is the stand-in server (vibetrack.stub_server).
+
+Usage: python benchmarks/bench_prescreen.py [--commits 80] [--latency 0.3] [--slots 4]
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def make_repo(path, commits, seed):
+    """Create a repository whose commits look like an ordinary project's history"""
+    rng = random.Random(seed)
+
+    def git(*args):
+        return subprocess.run(['git'] + list(args), cwd=path, check=True, stdout=subprocess.PIPE).stdout
+
+    def write(relative, text, mode='a'):
+        os.makedirs(os.path.dirname(os.path.join(path, relative)) or path, exist_ok=True)
+        with open(os.path.join(path, relative), mode) as f:
+            f.write(text)
+
+    git('init', '-q')
+    git('config', 'user.email', 'bench@example.com')
+    git('config', 'user.name', 'bench')
+    write('app/core.py', 'def run():\n    return 0\n', 'w')
+    git('add', '-A')
+    git('commit', '-q', '-m', 'Initial commit')
+    for index in range(commits):
+        kind = rng.choice(('bump', 'docs', 'ci', 'named', 'wip', 'code'))
+        if kind == 'bump':
+            write('pyproject.toml', f'[project]\nversion = "1.{index}.0"\n', 'w')
+            message = 'chore: bump version'
+        elif kind == 'docs':
+            write('docs/guide.md', f'Step {index}: run the tool.\n')
+            message = f'docs: describe step {index} in the guide'
+        elif kind == 'ci':
+            write('.github/workflows/ci.yml', f'# job {index}\n')
+            message = 'ci: add a job to the workflow'
+        elif kind == 'named':
+            write('app/core.py', f'\ndef handle_case_{index}(value):\n    return value + {index}\n')
+            message = f'feat: add `handle_case_{index}` to core.py'
+        elif kind == 'wip':
+            for name in ('core', 'cli', 'store', 'report'):
+                write(f'app/{name}.py', ''.join(f'value_{index}_{line} = {line}\n' for line in range(120)))
+            message = 'wip'
+        else:
+            write('app/core.py', f'\ndef helper_{index}():\n    return {index}\n')
+            message = 'Make the core module easier to extend'
+        git('add', '-A')
+        git('commit', '-q', '-m', message)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--commits', type=int, default=80, help='commits in the range')
+    parser.add_argument('--latency', type=float, default=0.3, help='seconds the server spends per request')
+    parser.add_argument('--slots', type=int, default=4, help='requests the server runs at once')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ['VIBETRACK_NO_CACHE'] = '1'
+    os.environ.setdefault('VIBETRACK_CACHE_DIR', tempfile.mkdtemp())
+    from vibetrack.stub_server import StubServer
+
+    server = StubServer(latency=args.latency, slots=args.slots).start()
+    os.environ['VIBETRACK_API_URL'] = server.url
+
+    with tempfile.TemporaryDirectory() as path:
+        make_repo(path, args.commits, args.seed)
+        os.chdir(path)
+        from vibetrack.commit_analyzer import analyze_commit_range
+        from vibetrack.privacy_manager import SilentMode
+
+        revision_range = f'HEAD~{args.commits}..HEAD'
+        hashes = subprocess.check_output(['git', 'rev-list', revision_range]).decode().split()
+
+        print(f'{args.commits} commits, server: {args.latency}s per request, {args.slots} at once')
+        print(f"{'method':<40} {'wall (s)':>10} {'model calls':>12} {'avoided':>8}")
+        for prescreen in (False, True):
+            label = 'with pre-screen' if prescreen else 'every commit to the model'
+
+            requests_before = server.stats['requests']
+            start = time.perf_counter()
+            _, stats = analyze_commit_range(revision_range, concurrency=args.slots, prescreen=prescreen)
+            elapsed = time.perf_counter() - start
+            calls = server.stats['requests'] - requests_before
+            print(f"{'log, ' + label:<40} {elapsed:>10.3f} {calls:>12} {stats['model_calls_avoided']:>8}")
+
+            requests_before = server.stats['requests']
+            start = time.perf_counter()
+            results = SilentMode.check_commits_quality(hashes, concurrency=args.slots, prescreen=prescreen)
+            elapsed = time.perf_counter() - start
+            calls = server.stats['requests'] - requests_before
+            avoided = sum(1 for result in results if result.get('prescreened'))
+            print(f"{'check-commit, ' + label:<40} {elapsed:>10.3f} {calls:>12} {avoided:>8}")
+        os.chdir('/')
+    server.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark: peak memory (tracemalloc) and wall time of saving one analysis as
+Markdown, JSON and HTML as the diff grows. The whole-string variant joins each
+report into one string and writes it in a single call, the way reports were
+written before; the streaming variant is Report.save, which writes the diff
+in REPORT_CHUNK_CHARS slices.
+
+Usage: python benchmarks/bench_report_memory.py [--sizes 1,10,50]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LINE = '+        value = self.items.get(key, "<default>") & mask  # ünicode\n'
+
+def make_diff(megabytes):
+    lines = megabytes * 1024 * 1024 // len(LINE)
+    return f'diff --git a/big.py b/big.py\n--- a/big.py\n+++ b/big.py\n@@ -0,0 +1,{lines} @@\n' + LINE * lines
+
+def whole_string(report, directory):
+    for report_format in ('md', 'json', 'html'):
+        text = ''.join(report.render(report_format))
+        with open(report.filename(report_format, directory), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+def streaming(report, directory):
+    report.save(['md', 'json', 'html'], directory)
+
+def measure(function, report, directory):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(report, directory)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1,10,50', help='diff sizes in MiB, comma-separated')
+    args = parser.parse_args()
+
+    from vibetrack.save_result import Report
+
+    print(f"{'diff':>8} {'variant':<16} {'peak (MiB)':>11} {'wall (s)':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for megabytes in (int(size) for size in args.sizes.split(',')):
+            report = Report(make_diff(megabytes), 'The change adds one line per key.', 'HEAD~1', 'HEAD')
+            # Counted and looked up before measuring, so only the writing is timed
+            report.stats
+            report._context = ('main', [], None, directory)
+            for label, function in (('whole string', whole_string), ('streaming', streaming)):
+                peak, elapsed = measure(function, report, directory)
+                print(f'{megabytes:>5} MiB {label:<16} {peak / 1024 / 1024:>11.1f} {elapsed:>9.2f}')
+
+if __name__ == '__main__':
+    main()
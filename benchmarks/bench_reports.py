@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: saving one analysis as Markdown, JSON and HTML. The separate
+variant calls save_markdown, save_json_report and save_html_report one after
+the other, so each builds its own report; the shared variant builds one
+Report and saves all three formats from it. The concurrent variant runs
+several writers at once in the same history directory and checks that no
+report overwrote another.
+
+Usage: python benchmarks/bench_reports.py [--files 200] [--runs 20] [--writers 8]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def make_diff(files):
+    """A diff touching `files` files with a few hunks each"""
+    parts = []
+    for index in range(files):
+        parts.append(f'diff --git a/src/module_{index}.py b/src/module_{index}.py\n'
+                     f'--- a/src/module_{index}.py\n+++ b/src/module_{index}.py\n')
+        for hunk in range(3):
+            parts.append(f'@@ -{hunk * 20 + 1},4 +{hunk * 20 + 1},4 @@\n def step_{hunk}(value):\n'
+                         f'-    return value < {hunk}\n+    return value <= {hunk} and value & 1\n \n')
+    return ''.join(parts)
+
+def timed(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), max(times)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=200, help='files in the diff')
+    parser.add_argument('--runs', type=int, default=20, help='saves per variant')
+    parser.add_argument('--writers', type=int, default=8, help='concurrent writers')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        subprocess.run(['git', 'init', '-q'], cwd=path, check=True)
+        subprocess.run(['git', '-c', 'user.email=bench@example.com', '-c', 'user.name=bench',
+                        'commit', '-q', '--allow-empty', '-m', 'Initial commit'], cwd=path, check=True)
+        os.chdir(path)
+        from vibetrack.save_result import Report, save_html_report, save_json_report, save_markdown
+
+        diff = make_diff(args.files)
+        explanation = "The change tightens every step's comparison. " * 40
+        print(f'diff: {args.files} files, {len(diff) // 1024} KiB')
+        print(f"{'md + json + html':<40} {'median (s)':>10} {'max (s)':>8}")
+
+        def separate():
+            for save in (save_markdown, save_json_report, save_html_report):
+                save(diff, explanation, 'old', 'new')
+
+        def shared():
+            Report(diff, explanation, 'old', 'new').save(['md', 'json', 'html'])
+
+        for label, function in (('one report per format', separate), ('one report, all formats', shared)):
+            median, worst = timed(function, args.runs)
+            print(f'{label:<40} {median:>10.3f} {worst:>8.3f}')
+
+        before = len(os.listdir('history'))
+        threads = [threading.Thread(target=shared) for _ in range(args.writers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        written = len(os.listdir('history')) - before
+        print(f"{f'{args.writers} concurrent writers':<40} {elapsed:>10.3f} {'':>8}"
+              f'  {written}/{args.writers * 3} files')
+        os.chdir('/')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vibetrack.tree_diff.compare_trees on two large directory trees,
+hashing with a single worker versus the default thread pool.
+
+Usage: python benchmarks/bench_tree_diff.py [--files 100000] [--changed 1000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vibetrack.diff_utils import PathFilter
+from vibetrack.tree_diff import compare_trees
+
+def make_trees(directory, files, changed, seed):
+    """Write a tree, copy it, then modify, rename and delete a few files in the copy"""
+    rng = random.Random(seed)
+    old_root = os.path.join(directory, 'old')
+    new_root = os.path.join(directory, 'new')
+    paths = [os.path.join(f'pkg_{i % 50}', f'mod_{i % 13}', f'file_{i}.py') for i in range(files)]
+    for relative in paths:
+        path = os.path.join(old_root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(f'# {relative}\n' + 'value = 1\n' * rng.randint(5, 200))
+    shutil.copytree(old_root, new_root)
+
+    for relative in rng.sample(paths, changed):
+        path = os.path.join(new_root, relative)
+        roll = rng.random()
+        if roll < 0.6:
+            # Same size, different content: only a hash tells them apart
+            with open(path, 'r+') as f:
+                f.seek(0)
+                f.write('X')
+        elif roll < 0.8:
+            os.rename(path, path.replace('.py', '_moved.py'))
+        else:
+            os.remove(path)
+    return old_root, new_root
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=100000, help='files per tree')
+    parser.add_argument('--changed', type=int, default=1000, help='files touched in the new tree')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f'Creating two trees of {args.files} files...')
+        old_root, new_root = make_trees(directory, args.files, args.changed, args.seed)
+        path_filter = PathFilter(ignore_file=None)
+
+        print(f"{'workers':<10} {'wall (s)':>10} {'changes':>10}")
+        for workers in (1, None):
+            start = time.perf_counter()
+            changes = compare_trees(old_root, new_root, path_filter=path_filter, workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"{workers or 'default':<10} {elapsed:>10.3f} {len(changes):>10}")
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,10 @@ setup(
         'requests>=2.28.0',
         'cryptography>=41.0.0'
     ],
+    extras_require={
+        'async': ['aiohttp>=3.8.0'],
+        'zstd': ['zstandard>=0.20.0'],
+    },
     entry_points={
         'console_scripts': [
             'vibetrack = vibetrack.cli_en:app',
@@ -0,0 +1,128 @@
+"""
+Index of commits that were already analyzed, so batch and CI runs over the
+same history only ask the model about new commits.
+
+Each row is keyed by commit SHA, kind of analysis ('quality', 'analysis',
+'range'), prompt version and model: changing a prompt (bumping its version)
+or switching models makes every commit due again, nothing else does. The row
+holds the analysis result and, when one was written, the report it went into.
+The index is one SQLite file, VIBETRACK_INDEX or
+$XDG_CACHE_HOME/vibetrack/index.sqlite (~/.cache by default), so a CI job
+can keep it between runs with its cache step.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    commit_hash TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    model TEXT NOT NULL,
+    analyzed_at TEXT NOT NULL,
+    result TEXT NOT NULL,
+    report TEXT,
+    PRIMARY KEY (commit_hash, kind, prompt_version, model)
+) WITHOUT ROWID
+"""
+# SQLite's default limit on bound parameters is 999 in older builds
+_BATCH = 500
+
+def default_index_path():
+    """VIBETRACK_INDEX, else $XDG_CACHE_HOME/vibetrack/index.sqlite (~/.cache by default)"""
+    configured = os.environ.get('VIBETRACK_INDEX')
+    if configured:
+        return configured
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'vibetrack', 'index.sqlite')
+
+class AnalysisIndex:
+    """Analyzed commits by (SHA, kind, prompt version, model); safe to share between threads"""
+
+    def __init__(self, path=None):
+        self.path = path or default_index_path()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._db:
+            # WAL lets a nightly job write while someone else reads
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def results(self, commit_hashes, kind, prompt_version, model):
+        """{commit SHA: stored result} for the given commits that were already analyzed"""
+        commit_hashes = list(commit_hashes)
+        found = {}
+        with self._lock:
+            for start in range(0, len(commit_hashes), _BATCH):
+                batch = commit_hashes[start:start + _BATCH]
+                rows = self._db.execute(
+                    f'SELECT commit_hash, result FROM analyses WHERE kind = ? AND prompt_version = ? AND model = ? '
+                    f"AND commit_hash IN ({', '.join('?' * len(batch))})",
+                    [kind, prompt_version, model] + batch)
+                for commit_hash, result in rows:
+                    found[commit_hash] = json.loads(result)
+        return found
+
+    def pending(self, commit_hashes, kind, prompt_version, model):
+        """The commits that still need this analysis, in the given order"""
+        commit_hashes = list(commit_hashes)
+        done = self.results(commit_hashes, kind, prompt_version, model)
+        return [commit_hash for commit_hash in commit_hashes if commit_hash not in done]
+
+    def record(self, commit_hash, kind, prompt_version, model, result, report=None):
+        """Store (or replace) one commit's result"""
+        self.record_many([(commit_hash, result)], kind, prompt_version, model, report)
+
+    def record_many(self, items, kind, prompt_version, model, report=None):
+        """Store (commit SHA, result) pairs in one transaction"""
+        analyzed_at = datetime.now().isoformat()
+        rows = [(commit_hash, kind, prompt_version, model, analyzed_at,
+                 json.dumps(result, ensure_ascii=False, default=str), report)
+                for commit_hash, result in items]
+        with self._lock, self._db:
+            self._db.executemany('INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def set_report(self, commit_hashes, kind, prompt_version, model, report):
+        """Point already recorded commits at the report their results were written to"""
+        with self._lock, self._db:
+            self._db.executemany(
+                'UPDATE analyses SET report = ? WHERE commit_hash = ? AND kind = ? AND prompt_version = ? AND model = ?',
+                [(report, commit_hash, kind, prompt_version, model) for commit_hash in commit_hashes])
+
+    def report(self, commit_hash, kind, prompt_version, model):
+        """Where the commit's result was written, or None"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT report FROM analyses WHERE commit_hash = ? AND kind = ? AND prompt_version = ? AND model = ?',
+                (commit_hash, kind, prompt_version, model)).fetchone()
+        return row[0] if row else None
+
+    def forget(self, kind=None):
+        """Drop every row (of one kind), so those commits are analyzed again; returns how many went"""
+        with self._lock, self._db:
+            if kind is None:
+                return self._db.execute('DELETE FROM analyses').rowcount
+            return self._db.execute('DELETE FROM analyses WHERE kind = ?', (kind,)).rowcount
+
+    def counts(self):
+        """{(kind, prompt version, model): commits} for display"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT kind, prompt_version, model, COUNT(*) FROM analyses GROUP BY kind, prompt_version, model')
+            return {(kind, prompt_version, model): count for kind, prompt_version, model, count in rows}
@@ -0,0 +1,275 @@
+"""
+Asyncio engine that keeps many analyses (commits, file pairs, repositories)
+in flight at once.
+
+Git runs as asyncio subprocesses and model requests go through aiohttp when
+it is installed (`pip install vibetrack[async]`), otherwise through the
+shared LocalModelClient on worker threads. One semaphore bounds the model
+requests (VIBETRACK_CONCURRENCY) and another the git processes, so a batch of
+a thousand commits never has more requests waiting on the server than it can
+run. Synchronous code drives it with run_sync.
+"""
+
+import asyncio
+import functools
+import os
+import subprocess
+import time
+
+try:
+    import aiohttp
+except ImportError:  # optional: the thread fallback below needs only requests
+    aiohttp = None
+
+from vibetrack.diff_engine import DEFAULT_ALGORITHM
+from vibetrack.diff_utils import (IGNORE_FILE, LOG_RECORD_SEPARATOR, PathFilter, commit_log_args, commit_needs_diff,
+                                  generate_diff, parse_diff, parse_log_record, prepare_diff_for_model)
+from vibetrack.git_objects import ObjectStore, get_object_store
+from vibetrack.local_client import CONCURRENCY, RETRY_STATUSES, build_messages, get_client
+from vibetrack.repo_context import find_worktree_root
+from vibetrack.response_cache import cache_key
+
+GIT_CONCURRENCY = max(2, os.cpu_count() or 1)
+# Longest line read from a git stream (minified files put whole bundles on one line)
+LINE_LIMIT = 64 * 1024 * 1024
+
+class AsyncEngine:
+    """Bounded-concurrency git and model calls on one event loop; use as `async with AsyncEngine() as engine`"""
+
+    def __init__(self, concurrency=None, git_concurrency=None, client=None, use_aiohttp=None):
+        self.concurrency = concurrency or CONCURRENCY
+        self.git_concurrency = git_concurrency or GIT_CONCURRENCY
+        self.client = client or get_client()
+        self.use_aiohttp = aiohttp is not None and (use_aiohttp is None or use_aiohttp)
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._model_slots = None
+        self._git_slots = None
+        self._session = None
+        self._stores = {}
+
+    async def __aenter__(self):
+        # Created here so they belong to the running loop (Python 3.8/3.9 bind them at creation)
+        self._model_slots = asyncio.Semaphore(self.concurrency)
+        self._git_slots = asyncio.Semaphore(self.git_concurrency)
+        if self.use_aiohttp:
+            connect_timeout, read_timeout = self.client.timeout
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        for store in self._stores.values():
+            store.close()
+        self._stores.clear()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # Git
+
+    async def git(self, *args, cwd=None):
+        """Output of a git command as bytes; raises CalledProcessError like subprocess.check_output"""
+        async with self._git_slots:
+            process = await asyncio.create_subprocess_exec('git', *args, cwd=cwd,
+                                                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            output, error = await process.communicate()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, ['git'] + list(args), output,
+                                                error.decode('utf-8', errors='replace'))
+        return output
+
+    @staticmethod
+    def _path_filter(path_filter, cwd):
+        if path_filter is None:
+            # Each repository brings its own .vibetrackignore
+            path_filter = PathFilter(ignore_file=os.path.join(find_worktree_root(cwd) or cwd, IGNORE_FILE)) if cwd else PathFilter()
+        return path_filter
+
+    @classmethod
+    def _pathspecs(cls, path_filter, cwd):
+        return cls._path_filter(path_filter, cwd).pathspecs()
+
+    async def read_diff(self, diff_args, path_filter=None, cwd=None):
+        """Same as diff_utils.read_git_diff"""
+        output = await self.git('diff', *diff_args, *self._pathspecs(path_filter, cwd), cwd=cwd)
+        return parse_diff(output.decode('utf-8', errors='replace'))
+
+    async def read_commit_diff(self, commit_hash='HEAD', path_filter=None, cwd=None):
+        """Same as diff_utils.read_commit_diff"""
+        if cwd is None and not await asyncio.get_running_loop().run_in_executor(None, commit_needs_diff,
+                                                                                 commit_hash, path_filter):
+            return parse_diff('')
+        output = await self.git('log', '--no-walk', '--format=', '-p', '-m', '--first-parent', '--no-color',
+                                commit_hash, *self._pathspecs(path_filter, cwd), cwd=cwd)
+        return parse_diff(output.decode('utf-8', errors='replace'))
+
+    async def iter_commit_log(self, revision_range, path_filter=None, cwd=None, max_count=None):
+        """Same as diff_utils.stream_commit_log: (commit info, ParsedDiff) per commit as git produces them"""
+        args = commit_log_args(revision_range, self._path_filter(path_filter, cwd), max_count)
+        async with self._git_slots:
+            process = await asyncio.create_subprocess_exec('git', *args, cwd=cwd, limit=LINE_LIMIT,
+                                                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            try:
+                record = []
+                while True:
+                    line = (await process.stdout.readline()).decode('utf-8', errors='replace')
+                    if not line or (line.startswith(LOG_RECORD_SEPARATOR) and record):
+                        if record:
+                            yield parse_log_record(''.join(record))
+                        record = []
+                    if not line:
+                        break
+                    record.append(line)
+                error = await process.stderr.read()
+                if await process.wait() != 0:
+                    raise subprocess.CalledProcessError(process.returncode, ['git'] + args, None,
+                                                        error.decode('utf-8', errors='replace'))
+            finally:
+                # The consumer may stop early; never leave git blocked on a full pipe
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+
+    async def commit_message(self, commit_hash='HEAD', cwd=None):
+        """Commit message read through the repository's persistent ObjectStore"""
+        if cwd is None:
+            store = get_object_store()
+        else:
+            store = self._stores.get(cwd)
+            if store is None:
+                store = self._stores[cwd] = ObjectStore(cwd)
+        message = await asyncio.get_running_loop().run_in_executor(None, store.commit_message, commit_hash)
+        if message is None:
+            raise ValueError(f'Unknown commit: {commit_hash}')
+        return message
+
+    # Model
+
+    async def chat(self, messages, temperature=0.7, max_tokens=1024):
+        """Completion text for chat messages, with at most `concurrency` requests at the server"""
+        cache = self.client.cache
+        key = None
+        if self._session is not None and cache is not None:
+            key = cache_key(self.client.model, messages, temperature=temperature, max_tokens=max_tokens)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry['text']
+
+        async with self._model_slots:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                if self._session is None:
+                    # requests is blocking: run the shared client (and its cache) on a worker thread
+                    call = functools.partial(self.client.chat, messages, temperature=temperature, max_tokens=max_tokens)
+                    return await asyncio.get_running_loop().run_in_executor(None, call)
+                text = await self._post({
+                    'model': self.client.model,
+                    'messages': messages,
+                    'temperature': temperature,
+                    'max_tokens': max_tokens
+                })
+            finally:
+                self.in_flight -= 1
+
+        if key is not None and text:
+            cache.put(key, text, model=self.client.model)
+        return text
+
+    async def _post(self, payload):
+        """aiohttp version of LocalModelClient.post: fail over or retry on transport failures and 429/5xx"""
+        pool = self.client.pool
+        attempt = 0
+        tried = []
+        while True:
+            endpoint = pool.acquire(exclude=tried)
+            tried.append(endpoint)
+            started = time.perf_counter()
+            failed, ok = True, False
+            try:
+                async with self._session.post(endpoint.url, json=payload) as response:
+                    if response.status not in RETRY_STATUSES or attempt >= self.client.max_retries:
+                        # A 4xx is the request's fault: no latency sample, but no failure of the server either
+                        failed, ok = response.status in RETRY_STATUSES, 200 <= response.status < 300
+                        response.raise_for_status()
+                        result = await response.json(content_type=None)
+                        return result['choices'][0]['message']['content'].strip()
+                    delay = self.client.next_delay(attempt, tried, response)
+            except (aiohttp.ClientConnectorError, aiohttp.ClientOSError, aiohttp.ServerDisconnectedError,
+                    aiohttp.ClientPayloadError):
+                # The same transport failures as RETRY_ERRORS, including a body cut off after a 2xx
+                failed, ok = True, False
+                if attempt >= self.client.max_retries:
+                    raise
+                delay = self.client.next_delay(attempt, tried)
+            except asyncio.TimeoutError:
+                failed, ok = True, False
+                # As in post(): a slow server is only relieved by another one
+                if attempt >= self.client.max_retries or not self.client.can_fail_over(tried):
+                    raise
+                delay = 0
+            finally:
+                pool.release(endpoint, time.perf_counter() - started if ok else None, failed)
+            if delay:
+                await asyncio.sleep(delay)
+            attempt += 1
+            self.client.retries += 1
+
+    async def chat_many(self, message_lists, temperature=0.7, max_tokens=1024, on_done=None):
+        """chat() for many prompts at once; a failed prompt gives its exception in place of the text"""
+        async def one(index, messages):
+            try:
+                return await self.chat(messages, temperature=temperature, max_tokens=max_tokens)
+            except Exception as e:
+                return e
+            finally:
+                if on_done is not None:
+                    on_done(index)
+        return await asyncio.gather(*(one(index, messages) for index, messages in enumerate(message_lists)))
+
+    # Analyses
+
+    async def explain(self, diff, persian_mode=False):
+        """The model's explanation of a diff (prepared to the size budgets first)"""
+        return await self.chat(build_messages(prepare_diff_for_model(diff), persian_mode))
+
+    async def analyze_commit(self, commit_hash='HEAD', persian_mode=False, path_filter=None, cwd=None):
+        """Message, diff and explanation of one commit"""
+        message, diff = await asyncio.gather(self.commit_message(commit_hash, cwd),
+                                             self.read_commit_diff(commit_hash, path_filter, cwd))
+        return {
+            'commit_hash': commit_hash,
+            'commit_message': message,
+            'diff': diff,
+            'analysis': await self.explain(diff, persian_mode) if diff else None
+        }
+
+    async def analyze_file_pair(self, old_file, new_file, persian_mode=False, algorithm=DEFAULT_ALGORITHM):
+        """Diff two files on a worker thread (the diff engine is CPU-bound), then explain the diff"""
+        call = functools.partial(generate_diff, old_file, new_file, algorithm=algorithm)
+        diff = parse_diff(await asyncio.get_running_loop().run_in_executor(None, call))
+        return {
+            'old_file': old_file,
+            'new_file': new_file,
+            'diff': diff,
+            'analysis': await self.explain(diff, persian_mode) if diff else None
+        }
+
+    async def gather(self, coroutines):
+        """Run analyses side by side; a failed one gives its exception in place of the result"""
+        return await asyncio.gather(*coroutines, return_exceptions=True)
+
+def run_sync(function, *args, concurrency=None, **kwargs):
+    """Call `function(engine, *args, **kwargs)` on a fresh AsyncEngine from synchronous code
+
+    e.g. run_sync(AsyncEngine.analyze_commit, "HEAD~1"). Not usable from inside
+    a running event loop: there, await the engine directly.
+    """
+    async def main():
+        async with AsyncEngine(concurrency) as engine:
+            return await function(engine, *args, **kwargs)
+    return asyncio.run(main())
@@ -0,0 +1,216 @@
+"""
+Map-reduce analysis for diffs too large for one model request.
+
+The diff is cut on file boundaries, then on hunk boundaries for files that do
+not fit, into chunks of at most VIBETRACK_CHUNK_TOKENS tokens. Every chunk is
+explained on its own (map), several at a time against the local server, and
+one last request merges the partial explanations (reduce). Wall time then
+depends on how many requests the server can run at once rather than on the
+size of the diff.
+"""
+
+import os
+import time
+
+from vibetrack.async_engine import AsyncEngine, run_sync
+from vibetrack.compaction import BYTES_PER_TOKEN, estimate_tokens
+from vibetrack.diff_utils import parse_diff, prepare_diff_for_model
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+CHUNK_TOKENS = _env_int('VIBETRACK_CHUNK_TOKENS', 3000)
+MAX_CHUNKS = _env_int('VIBETRACK_MAX_CHUNKS', 24)
+# Partial explanations are kept short so that all of them fit in the reduce prompt
+PART_MAX_TOKENS = 384
+
+class DiffChunk:
+    """A piece of the diff analyzed in one map request"""
+    __slots__ = ('index', 'text', 'paths', 'tokens')
+
+    def __init__(self, index, text, paths, tokens):
+        self.index = index
+        self.text = text
+        self.paths = paths
+        self.tokens = tokens
+
+def _split_lines(header, hunk_text, budget):
+    """Cut one oversized hunk on line boundaries, repeating the file and hunk headers"""
+    hunk_header, _, body = hunk_text.partition('\n')
+    prefix = f'{header}{hunk_header} (continued)\n'
+    room = max(budget - estimate_tokens(prefix), 1) * BYTES_PER_TOKEN
+    pieces = []
+    current = []
+    size = 0
+    for line in body.splitlines(True):
+        line_size = len(line.encode('utf-8'))
+        if current and size + line_size > room:
+            pieces.append(''.join(current))
+            current = []
+            size = 0
+        current.append(line)
+        size += line_size
+    if current:
+        pieces.append(''.join(current))
+    return [(header + hunk_header + '\n' if i == 0 else prefix) + piece for i, piece in enumerate(pieces)]
+
+def _file_pieces(diff, diff_file, budget):
+    """The file's diff as one piece, or split on hunk boundaries when it is over budget"""
+    file_text = diff.file_text(diff_file)
+    if estimate_tokens(file_text) <= budget or not diff_file.hunks:
+        return [file_text]
+
+    header = diff.text[diff_file.start:diff_file.hunks[0].start]
+    pieces = []
+    current = header
+    for position, hunk in enumerate(diff_file.hunks):
+        end = diff_file.hunks[position + 1].start if position + 1 < len(diff_file.hunks) else diff_file.end
+        hunk_text = diff.text[hunk.start:end]
+        if estimate_tokens(current + hunk_text) <= budget:
+            current += hunk_text
+            continue
+        if current != header:
+            pieces.append(current)
+        if estimate_tokens(header + hunk_text) <= budget:
+            current = header + hunk_text
+        else:
+            pieces.extend(_split_lines(header, hunk_text, budget))
+            current = header
+    if current != header:
+        pieces.append(current)
+    return pieces
+
+def needs_chunks(prepared):
+    """Whether a PreparedDiff lost content to the size budgets, so it should be chunked instead"""
+    return bool(prepared.trimmed) or any(reason == 'over budget' for _, reason in prepared.summarized)
+
+def split_diff(diff, token_budget=None, max_chunks=None):
+    """Cut a diff into DiffChunks of at most token_budget tokens
+
+    Lockfiles, generated files etc. are summarized first, as for a single
+    request. Files that do not fit in max_chunks chunks are listed in a final
+    note instead.
+    """
+    token_budget = token_budget or CHUNK_TOKENS
+    max_chunks = max_chunks or MAX_CHUNKS
+    # Per-file summaries still apply; the size budgets are what chunking replaces,
+    # so a big file is split by hunk below instead of being trimmed to its head
+    diff = parse_diff(prepare_diff_for_model(diff, max_file_bytes=0, max_total_bytes=0).text)
+
+    chunks = []
+    current, paths = [], []
+    current_tokens = 0
+    left_out = []
+    full = False
+
+    def flush():
+        nonlocal current, paths, current_tokens
+        if current:
+            chunks.append(DiffChunk(len(chunks), ''.join(current), paths, current_tokens))
+        current, paths, current_tokens = [], [], 0
+
+    for diff_file in diff.files:
+        if not full:
+            for piece in _file_pieces(diff, diff_file, token_budget):
+                tokens = estimate_tokens(piece)
+                if current and current_tokens + tokens > token_budget:
+                    flush()
+                    full = len(chunks) >= max_chunks
+                    if full:
+                        break
+                current.append(piece)
+                current_tokens += tokens
+                if diff_file.path not in paths:
+                    paths.append(diff_file.path)
+        if full:
+            left_out.append(diff_file)
+    flush()
+
+    if not diff.files and diff.text.strip():
+        chunks.append(DiffChunk(0, diff.text, [], estimate_tokens(diff.text)))
+    if left_out and chunks:
+        names = ', '.join(diff_file.path for diff_file in left_out[:20])
+        more = f' and {len(left_out) - 20} more' if len(left_out) > 20 else ''
+        last = chunks[-1]
+        last.text += f'# vibetrack: {len(left_out)} files left out or cut short (over budget): {names}{more}\n'
+    return chunks
+
+def part_messages(chunk, total, persian_mode=False):
+    """Map prompt: explain one part of a larger change"""
+    files = ', '.join(chunk.paths) or '-'
+    if persian_mode:
+        system_prompt = 'تو یک برنامه‌نویس باتجربه هستی. فقط بخشی از یک تغییر بزرگ رو میبینی؛ کوتاه و دقیق توضیح بده.'
+        user_prompt = f"""این بخش {chunk.index + 1} از {total} یک تغییر بزرگه (فایل‌ها: {files}):
+
+{chunk.text}
+
+در چند جمله‌ی کوتاه به فارسی بگو در این بخش دقیقاً چی عوض شده و احتمالاً چرا. از حدس زدن درباره‌ی بخش‌های دیگه خودداری کن."""
+    else:
+        system_prompt = 'You are a senior code reviewer. You see only one part of a larger change; be brief and precise.'
+        user_prompt = f"""This is part {chunk.index + 1} of {total} of a larger change (files: {files}):
+
+{chunk.text}
+
+In a few short sentences, state exactly what changed in this part and the likely reason. Do not speculate about the other parts."""
+    return [
+        {'role': 'system', 'content': system_prompt},
+        {'role': 'user', 'content': user_prompt}
+    ]
+
+def reduce_messages(chunks, partials, persian_mode=False):
+    """Reduce prompt: merge the partial explanations into one narrative"""
+    notes = '\n\n'.join(f"Part {chunk.index + 1} ({', '.join(chunk.paths) or '-'}):\n{partial}"
+                        for chunk, partial in zip(chunks, partials))
+    if persian_mode:
+        system_prompt = """تو یک برنامه‌نویس باتجربه و مربی کدنویسی هستی. کارت اینه که تغییرات کد رو به زبان ساده و فارسی توضیح بدی. مخصوصاً برای کسایی که vibe coding میکنن و نمیدونن چی عوض شده."""
+        user_prompt = f"""یک تغییر بزرگ در {len(chunks)} بخش بررسی شده. خلاصه‌ی هر بخش:
+
+{notes}
+
+این خلاصه‌ها رو با هم ترکیب کن و به زبان فارسی و ساده توضیح بده:
+1. دقیقاً چی عوض شده؟
+2. چرا این تغییر انجام شده؟ (احتمالاً چه دلیلی داشته؟)
+3. این تغییر چه تأثیری روی رفتار برنامه داره؟
+4. اگه کسی ازت سوال بپرسه، چطور میتونی توضیح بدی؟
+
+جواب رو به صورت داستانی و قابل فهم بنویس، نه خیلی تکنیکال."""
+    else:
+        system_prompt = 'You are a senior code reviewer and mentor. Analyze code diffs and explain them clearly for developers who might be confused about what changed.'
+        user_prompt = f"""A large change was reviewed in {len(chunks)} parts. Notes on each part:
+
+{notes}
+
+Combine these notes into one explanation of the whole change:
+1. What exactly changed?
+2. Why was it likely changed? (What was the probable reason?)
+3. What's the difference in behavior?
+4. How would you explain this to someone who asks about it?
+
+Make your explanation narrative and easy to understand, not overly technical."""
+    return [
+        {'role': 'system', 'content': system_prompt},
+        {'role': 'user', 'content': user_prompt}
+    ]
+
+def analyze_chunks(chunks, persian_mode=False, workers=None, on_done=None):
+    """Explain every chunk concurrently; returns the partial explanations in chunk order
+
+    A part that fails is replaced by a note so the reduce step can still run;
+    if every part fails the first error is raised.
+    """
+    started = time.perf_counter()
+
+    def done(index):
+        if on_done is not None:
+            on_done(chunks[index], time.perf_counter() - started)
+
+    results = run_sync(AsyncEngine.chat_many, [part_messages(chunk, len(chunks), persian_mode) for chunk in chunks],
+                       temperature=0.3, max_tokens=PART_MAX_TOKENS, on_done=done, concurrency=workers)
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors and len(errors) == len(chunks):
+        raise errors[0]
+    return [f'(this part could not be analyzed: {result})' if isinstance(result, Exception) else result
+            for result in results]
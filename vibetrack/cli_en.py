@@ -1,8 +1,10 @@
 import typer
 import os
-from typing import Optional
+import subprocess
+from typing import List, Optional
 from datetime import datetime
 from rich.console import Console
+from rich.markup import escape
 from rich.panel import Panel
 from rich.text import Text
 from rich.table import Table
@@ -57,6 +59,19 @@ def check_git_repo():
         
         raise typer.Exit(1)
 
+def apply_cache_option(no_cache):
+    """Turn the response cache off for this run when --no-cache is given"""
+    if no_cache:
+        from vibetrack.local_client import disable_cache
+        disable_cache()
+
+def build_path_filter(include, exclude):
+    """Build the file filter from --include/--exclude globs (None keeps the defaults)"""
+    if not include and not exclude:
+        return None
+    from vibetrack.diff_utils import PathFilter
+    return PathFilter(include=include or None, exclude=exclude)
+
 @app.callback()
 def main_callback():
     """Main callback"""
@@ -68,6 +83,9 @@ def check_changes(
     all_changes: bool = typer.Option(False, "--all", "-a", help="📋 Analyze all changes"),
     commit: Optional[str] = typer.Option(None, "--commit", "-c", help="Compare with specific commit"),
     no_save: bool = typer.Option(False, "--no-save", help="Don't save analysis to file"),
+    include: Optional[List[str]] = typer.Option(None, "--include", "-i", help="Only analyze files matching this glob (repeatable)"),
+    exclude: Optional[List[str]] = typer.Option(None, "--exclude", "-x", help="Skip files matching this glob (repeatable, on top of .vibetrackignore)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ask the model again instead of reusing a cached answer"),
 ):
     """
     🔍 Analyze current changes - Main command for understanding your modifications
@@ -76,6 +94,7 @@ def check_changes(
     It analyzes your changes and explains what was modified and why.
     """
     check_git_repo()
+    apply_cache_option(no_cache)
     
     console.print("🔍 [bold blue]Analyzing your changes...[/bold blue]")
     
@@ -99,12 +118,13 @@ def check_changes(
                 console.print(Panel(status_info, title="[bold cyan]📊 Current Status[/bold cyan]", border_style="cyan"))
             
             # Analyze changes based on options
+            path_filter = build_path_filter(include, exclude)
             if staged:
-                analyze_staged_changes(save_to_file=not no_save, persian_mode=False)
+                analyze_staged_changes(save_to_file=not no_save, persian_mode=False, path_filter=path_filter)
             elif commit:
-                analyze_git_diff(commit, "HEAD", save_to_file=not no_save, persian_mode=False)
+                analyze_git_diff(commit, "HEAD", save_to_file=not no_save, persian_mode=False, path_filter=path_filter)
             else:
-                analyze_pending_changes(save_to_file=not no_save, persian_mode=False)
+                analyze_pending_changes(save_to_file=not no_save, persian_mode=False, path_filter=path_filter)
             
         except Exception as e:
             progress.stop()
@@ -116,6 +136,9 @@ def compare_commits(
     commit1: str = typer.Argument(..., help="First commit/branch"),
     commit2: str = typer.Argument("HEAD", help="Second commit/branch (default: HEAD)"),
     no_save: bool = typer.Option(False, "--no-save", help="Don't save analysis to file"),
+    include: Optional[List[str]] = typer.Option(None, "--include", "-i", help="Only analyze files matching this glob (repeatable)"),
+    exclude: Optional[List[str]] = typer.Option(None, "--exclude", "-x", help="Skip files matching this glob (repeatable, on top of .vibetrackignore)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ask the model again instead of reusing a cached answer"),
 ):
     """
     📖 Compare two commits or branches
@@ -126,6 +149,7 @@ def compare_commits(
       vibetrack compare abc123 def456   # Compare two specific commits
     """
     check_git_repo()
+    apply_cache_option(no_cache)
     
     console.print(f"📖 [bold blue]Comparing {commit1} with {commit2}...[/bold blue]")
     
@@ -138,12 +162,82 @@ def compare_commits(
         task = progress.add_task(f"📚 Analyzing differences...", total=None)
         
         try:
-            analyze_git_diff(commit1, commit2, save_to_file=not no_save, persian_mode=False)
+            analyze_git_diff(commit1, commit2, save_to_file=not no_save, persian_mode=False,
+                             path_filter=build_path_filter(include, exclude))
         except Exception as e:
             progress.stop()
             console.print(f"❌ [bold red]Error:[/bold red] {str(e)}", style="red")
             raise typer.Exit(1)
 
+@app.command("compare-dirs", help="📂 Compare two directory trees")
+def compare_directories(
+    old_dir: str = typer.Argument(..., help="Original directory"),
+    new_dir: str = typer.Argument(..., help="Changed directory"),
+    no_save: bool = typer.Option(False, "--no-save", help="Don't save analysis to file"),
+    include: Optional[List[str]] = typer.Option(None, "--include", "-i", help="Only analyze files matching this glob (repeatable)"),
+    exclude: Optional[List[str]] = typer.Option(None, "--exclude", "-x", help="Skip files matching this glob (repeatable, on top of .vibetrackignore)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ask the model again instead of reusing a cached answer"),
+):
+    """
+    📂 Compare two source trees that are not in Git (vendor drops, release tarballs...)
+    
+    Examples:
+      vibetrack compare-dirs vendor/lib-1.2 vendor/lib-1.3
+      vibetrack compare-dirs release-1.0/ release-1.1/ -x "tests/"
+    """
+    for directory in (old_dir, new_dir):
+        if not os.path.isdir(directory):
+            console.print(f"❌ [bold red]Error:[/bold red] {directory} is not a directory!", style="red")
+            raise typer.Exit(1)
+    
+    from vibetrack.main import analyze_tree_diff
+    
+    apply_cache_option(no_cache)
+    
+    try:
+        analyze_tree_diff(old_dir, new_dir, save_to_file=not no_save,
+                          path_filter=build_path_filter(include, exclude))
+    except Exception as e:
+        console.print(f"❌ [bold red]Error:[/bold red] {str(e)}", style="red")
+        raise typer.Exit(1)
+
+@app.command("log", help="📜 Check every commit of a range")
+def check_log(
+    revision_range: str = typer.Argument(..., help="Commit range, e.g. v1.2..v1.3 or main..feature"),
+    concurrency: Optional[int] = typer.Option(None, "--concurrency", "-j", help="Commits analyzed at once (default: VIBETRACK_CONCURRENCY)"),
+    max_count: int = typer.Option(500, "--max-count", "-n", help="Analyze at most this many commits (0: no limit)"),
+    no_save: bool = typer.Option(False, "--no-save", help="Don't save analysis to file"),
+    include: Optional[List[str]] = typer.Option(None, "--include", "-i", help="Only analyze files matching this glob (repeatable)"),
+    exclude: Optional[List[str]] = typer.Option(None, "--exclude", "-x", help="Skip files matching this glob (repeatable, on top of .vibetrackignore)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ask the model again instead of reusing a cached answer"),
+    reanalyze: bool = typer.Option(False, "--reanalyze", help="Check commits again even if the analysis index has them"),
+    no_prescreen: bool = typer.Option(False, "--no-prescreen", help="Send every commit to the model, even those the local pre-screen is sure about"),
+):
+    """
+    📜 Check every commit of a range against its message, several at a time
+    
+    Examples:
+      vibetrack log v1.2..v1.3          # Audit a release
+      vibetrack log main..feature -j 8  # Everything a branch adds, 8 commits at once
+    """
+    check_git_repo()
+    apply_cache_option(no_cache)
+    
+    from vibetrack.analysis_index import AnalysisIndex
+    from vibetrack.commit_analyzer import show_commit_range
+    try:
+        with AnalysisIndex() as index:
+            show_commit_range(revision_range, persian_mode=False, concurrency=concurrency,
+                              path_filter=build_path_filter(include, exclude), max_count=max_count or None,
+                              save_to_file=not no_save, index=index, reanalyze=reanalyze,
+                              prescreen=False if no_prescreen else None)
+    except subprocess.CalledProcessError as e:
+        console.print(f"❌ [bold red]Git error:[/bold red] {(e.stderr or str(e)).strip()}", style="red")
+        raise typer.Exit(1)
+    except Exception as e:
+        console.print(f"❌ [bold red]Error:[/bold red] {str(e)}", style="red")
+        raise typer.Exit(1)
+
 @app.command("status", help="📊 Show project status")
 def project_status():
     """
@@ -169,6 +263,376 @@ def project_status():
     if recent_commits:
         console.print(Panel(recent_commits, title="[bold yellow]📝 Recent Commits[/bold yellow]", border_style="yellow"))
 
+@app.command("cache", help="⚡ Show or clear cached AI answers")
+def manage_cache(
+    clear: bool = typer.Option(False, "--clear", help="Remove every cached answer"),
+):
+    """
+    ⚡ Cached AI answers: an unchanged diff is answered from disk instead of asking the model again
+    """
+    from vibetrack.response_cache import ResponseCache
+    
+    cache = ResponseCache()
+    if clear:
+        removed = cache.clear()
+        console.print(f"🧹 [bold green]Removed {removed} cached answers[/bold green]")
+        return
+    
+    entries, size = cache.usage()
+    totals = cache.totals()
+    lookups = totals.get("hits", 0) + totals.get("misses", 0)
+    hit_rate = f"{100 * totals.get('hits', 0) / lookups:.0f}%" if lookups else "-"
+    
+    table = Table(show_header=False, border_style="cyan")
+    table.add_row("📁 Location", cache.directory)
+    table.add_row("🗂️ Entries", f"{entries} / {cache.max_entries}")
+    table.add_row("💾 Size", f"{size / 1024:.1f} KiB / {cache.max_bytes / 1024 / 1024:.0f} MiB")
+    table.add_row("✅ Hits", str(totals.get("hits", 0)))
+    table.add_row("❌ Misses", str(totals.get("misses", 0)))
+    table.add_row("🎯 Hit rate", hit_rate)
+    console.print(Panel(table, title="[bold cyan]⚡ Response Cache[/bold cyan]", border_style="cyan", expand=False))
+
+@app.command("servers", help="🖥️ Check the AI servers")
+def show_servers():
+    """
+    🖥️ Probe every configured AI server (VIBETRACK_API_URL, comma-separated for several)
+    """
+    import time
+    from vibetrack.endpoint_pool import EndpointPool
+    from vibetrack.local_client import API_URL
+    
+    pool = EndpointPool(API_URL)
+    table = Table(border_style="cyan")
+    table.add_column("Server", style="cyan")
+    table.add_column("Status")
+    table.add_column("Response", justify="right")
+    for endpoint in pool.endpoints:
+        started = time.perf_counter()
+        alive = pool.check(endpoint)
+        elapsed = time.perf_counter() - started
+        status = "[green]✅ up[/green]" if alive else "[red]❌ down[/red]"
+        table.add_row(endpoint.url, status, f"{elapsed * 1000:.0f} ms")
+    console.print(Panel(table, title=f"[bold cyan]🖥️ AI Servers ({pool.strategy})[/bold cyan]", border_style="cyan", expand=False))
+
+@app.command("index", help="🗃️ Show or clear the index of analyzed commits")
+def manage_index(
+    clear: bool = typer.Option(False, "--clear", help="Forget every analyzed commit, so the next runs check them again"),
+):
+    """
+    🗃️ Commits already analyzed by `vibetrack log` and `vibetrack silent`, by kind, prompt version and model
+    """
+    from vibetrack.analysis_index import AnalysisIndex
+    
+    with AnalysisIndex() as index:
+        if clear:
+            removed = index.forget()
+            console.print(f"🧹 [bold green]Forgot {removed} analyzed commits[/bold green]")
+            return
+        counts = index.counts()
+    
+    table = Table(border_style="cyan")
+    table.add_column("Kind", style="cyan")
+    table.add_column("Prompt")
+    table.add_column("Model")
+    table.add_column("Commits", justify="right")
+    for (kind, prompt_version, model), count in sorted(counts.items()):
+        table.add_row(kind, f"v{prompt_version}", model, str(count))
+    console.print(Panel(table, title=f"[bold cyan]🗃️ Analysis Index[/bold cyan] [dim]{index.path}[/dim]",
+                        border_style="cyan", expand=False))
+
+# Saved analyses (history_store): query them, show one, export files on demand
+history_app = typer.Typer(help="📚 Search saved analyses and export them as Markdown, HTML or JSON", rich_markup_mode="rich")
+app.add_typer(history_app, name="history")
+
+_TYPE_LABELS = {"diff": "🔍 diff", "tree": "📂 tree", "log": "📜 log"}
+
+@history_app.callback(invoke_without_command=True)
+def history_list(
+    ctx: typer.Context,
+    branch: Optional[str] = typer.Option(None, "--branch", "-b", help="Only analyses made on this branch"),
+    analysis_type: Optional[str] = typer.Option(None, "--type", "-t", help="Only this kind of analysis: diff, tree or log"),
+    commit: Optional[str] = typer.Option(None, "--commit", "-c", help="Only analyses of this commit (SHA or prefix)"),
+    since: Optional[str] = typer.Option(None, "--since", help="Made after this date or span back (2024-05-01, 12h, 7d, 2w)"),
+    until: Optional[str] = typer.Option(None, "--until", help="Made before this date or span back"),
+    all_repos: bool = typer.Option(False, "--all-repos", help="Search every repository, not just this one"),
+    limit: int = typer.Option(20, "--limit", "-n", help="Show at most this many (0: no limit)"),
+    as_json: bool = typer.Option(False, "--json", help="Print JSON instead of a table"),
+):
+    """
+    📚 Saved analyses, newest first
+
+    Examples:
+      vibetrack history --branch main --since 7d
+      vibetrack history --commit 3f2a9c1
+      vibetrack history export 2024-05-01_10-15-30_1f3a-1 --format html
+    """
+    if ctx.invoked_subcommand is not None:
+        return
+    import json
+    from vibetrack.history_store import HistoryStore
+    from vibetrack.repo_context import find_git_dir
+    from vibetrack.save_result import repository_context
+    
+    repo = None if all_repos or find_git_dir() is None else repository_context()[3]
+    try:
+        with HistoryStore() as store:
+            rows = store.query(repo=repo, branch=branch, analysis_type=analysis_type, commit=commit,
+                               since=since, until=until, limit=limit)
+    except ValueError as e:
+        console.print(f"❌ [bold red]Error:[/bold red] {e}", style="red")
+        raise typer.Exit(1)
+    if as_json:
+        typer.echo(json.dumps(rows, indent=2, ensure_ascii=False))
+        return
+    if not rows:
+        console.print("[dim]No saved analyses match[/dim]")
+        return
+    
+    table = Table(border_style="cyan")
+    table.add_column("ID", style="cyan", overflow="fold")
+    table.add_column("Type", no_wrap=True)
+    table.add_column("Branch", style="yellow", no_wrap=True)
+    table.add_column("Commit", style="dim", no_wrap=True)
+    table.add_column("+/-", justify="right", no_wrap=True)
+    table.add_column("Summary", min_width=24)
+    if repo is None:
+        table.add_column("Repository", style="dim")
+    for row in rows:
+        cells = [row["id"], _TYPE_LABELS.get(row["analysis_type"], row["analysis_type"]), row["branch"] or "-",
+                 (row["commit_hash"] or "-")[:8], f"+{row['additions'] or 0} -{row['deletions'] or 0}",
+                 escape(_short_summary(row["summary"] or ""))]
+        if repo is None:
+            cells.append(row["repo"])
+        table.add_row(*cells)
+    console.print(table)
+
+def _short_summary(text, limit=60):
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + '…'
+
+def _history_rows(report_id):
+    from vibetrack.history_store import HistoryStore
+    
+    try:
+        with HistoryStore() as store:
+            rows = store.get(report_id)
+    except ValueError as e:
+        console.print(f"❌ [bold red]Error:[/bold red] {e}", style="red")
+        raise typer.Exit(1)
+    if not rows:
+        console.print(f"❌ [bold red]Error:[/bold red] no saved analysis {report_id}", style="red")
+        raise typer.Exit(1)
+    return rows
+
+@history_app.command("show", help="Show one saved analysis")
+def history_show(
+    report_id: str = typer.Argument(..., help="Analysis ID (or the start of it)"),
+):
+    from rich.markdown import Markdown
+    from vibetrack.save_result import Report, range_report
+    
+    rows = _history_rows(report_id)
+    first = rows[0]
+    if first["analysis_type"] == "log":
+        data = first["data"]
+        chunks = range_report(data["range"], [row["data"]["result"] for row in rows], data["stats"],
+                              datetime.fromisoformat(first["created_at"]), first["branch"])
+    else:
+        chunks = Report.from_dict(first["data"]).render("md", [])
+    console.print(Markdown("".join(chunks)))
+
+@history_app.command("export", help="Write a saved analysis as Markdown, HTML or JSON")
+def history_export(
+    report_id: str = typer.Argument(..., help="Analysis ID (or the start of it)"),
+    report_format: Optional[List[str]] = typer.Option(None, "--format", "-f", help="md, html or json (repeatable, default md)"),
+    output_dir: str = typer.Option("history", "--output-dir", "-o", help="Directory to write to"),
+):
+    from vibetrack.save_result import export_history
+    
+    rows = _history_rows(report_id)
+    for name in report_format or ["md"]:
+        try:
+            filename = export_history(rows, name, output_dir)
+        except ValueError as e:
+            console.print(f"❌ [bold red]Error:[/bold red] {e}", style="red")
+            raise typer.Exit(1)
+        console.print(f"[bold green]✅ Exported to:[/bold green] [cyan]{filename}[/cyan]")
+
+def _size(count):
+    return f"{count / 1024 / 1024:.1f} MiB" if count >= 1024 * 1024 else f"{count / 1024:.1f} KiB"
+
+@history_app.command("gc", help="Drop old analyses and the stored diffs nothing refers to")
+def history_gc(
+    older_than: Optional[str] = typer.Option(None, "--older-than", help="Also drop analyses made before this date or span back (90d, 12w)"),
+):
+    """
+    🧹 Drop stored diffs no analysis refers to any more (and, with --older-than, old analyses), then compact the file
+    """
+    from vibetrack.history_store import HistoryStore
+    
+    try:
+        with HistoryStore() as store:
+            before = store.usage()
+            reports, blobs = store.gc(older_than)
+            after = store.usage()
+    except ValueError as e:
+        console.print(f"❌ [bold red]Error:[/bold red] {e}", style="red")
+        raise typer.Exit(1)
+    console.print(f"🧹 [bold green]Removed {reports} analyses and {blobs} stored diffs[/bold green]")
+    
+    table = Table(show_header=False, border_style="cyan")
+    table.add_row("📁 Location", store.path)
+    table.add_row("📚 Analyses", str(after["reports"]))
+    table.add_row("🧩 Distinct diffs", f"{after['blobs']} ({_size(after['diff_bytes'])}, "
+                                      f"{_size(after['stored_bytes'])} compressed)")
+    table.add_row("💾 File size", f"{_size(before['file_bytes'])} → {_size(after['file_bytes'])}")
+    console.print(Panel(table, title="[bold cyan]📚 Analysis History[/bold cyan]", border_style="cyan", expand=False))
+
+# Git hooks served by a warm background analyzer (hook_manager)
+hooks_app = typer.Typer(help="🪝 Install git hooks that explain changes as you commit and push", rich_markup_mode="rich")
+app.add_typer(hooks_app, name="hooks")
+
+_HOOK_ACTIONS = {
+    "installed": "[green]✅ installed[/green]",
+    "updated": "[green]✅ updated[/green]",
+    "chained": "[green]✅ installed[/green] [dim](the existing hook runs first)[/dim]",
+    "skipped": "[yellow]⚠️ skipped: another hook is there (use --force to chain it)[/yellow]",
+    "removed": "[green]🧹 removed[/green]",
+    "restored": "[green]🧹 removed[/green] [dim](the previous hook is back)[/dim]",
+    "absent": "[dim]not installed[/dim]",
+}
+
+@hooks_app.command("install", help="Install the pre-commit, commit-msg and pre-push hooks")
+def hooks_install(
+    hook: Optional[List[str]] = typer.Option(None, "--hook", help="Only this hook (repeatable): pre-commit, commit-msg or pre-push"),
+    force: bool = typer.Option(False, "--force", help="Keep an existing hook by running it before ours"),
+):
+    """
+    🪝 Install the hooks and start the background analyzer
+
+    The hooks never stop a commit or a push; each one prints what is ready
+    within its time budget (VIBETRACK_HOOK_BUDGET) and lets the rest finish
+    in the background.
+    """
+    check_git_repo()
+    from vibetrack.hook_manager import HOOKS, find_repository, install_hooks, is_running, start_daemon
+    
+    try:
+        outcome = install_hooks(hook or HOOKS, force)
+    except ValueError as e:
+        console.print(f"❌ [bold red]Error:[/bold red] {e}", style="red")
+        raise typer.Exit(1)
+    for name, action in outcome.items():
+        console.print(f"🪝 {name}: {_HOOK_ACTIONS[action]}")
+    if all(action == "skipped" for action in outcome.values()):
+        raise typer.Exit(1)
+    git_dir, root = find_repository()
+    if not is_running(git_dir):
+        start_daemon(git_dir, root)
+    console.print("[dim]The background analyzer starts on staged changes as soon as you stage them.[/dim]")
+
+@hooks_app.command("uninstall", help="Remove the hooks and stop the background analyzer")
+def hooks_uninstall():
+    check_git_repo()
+    from vibetrack.hook_manager import find_repository, stop_daemon, uninstall_hooks
+    
+    for name, action in uninstall_hooks().items():
+        console.print(f"🪝 {name}: {_HOOK_ACTIONS[action]}")
+    stop_daemon(find_repository()[0])
+
+@hooks_app.command("status", help="Show the hooks, the background analyzer and its latest answers")
+def hooks_status():
+    check_git_repo()
+    from vibetrack.hook_manager import daemon_status, find_repository, hook_budget, installed_hooks
+    
+    git_dir, _ = find_repository()
+    table = Table(border_style="cyan")
+    table.add_column("Hook", style="cyan")
+    table.add_column("Installed")
+    table.add_column("Budget", justify="right")
+    for name, installed in installed_hooks().items():
+        table.add_row(name, "[green]✅[/green]" if installed else "[dim]-[/dim]", f"{hook_budget(name):.1f} s")
+    console.print(table)
+    
+    status = daemon_status(git_dir)
+    if status is None:
+        console.print("[yellow]💤 The background analyzer is not running; the next hook starts it[/yellow]")
+        return
+    console.print(f"[green]⚡ Background analyzer running[/green] [dim](pid {status['pid']}, "
+                  f"up {status['uptime'] / 60:.0f} min, {status['requests']} requests, {status['model']})[/dim]")
+    states = {"running": "[yellow]⏳ running[/yellow]", "done": "[green]✅ done[/green]",
+              "failed": "[red]❌ failed[/red]", "cancelled": "[dim]cancelled[/dim]"}
+    for job in status["jobs"][:5]:
+        console.print(Panel(escape(job["text"] or "…"), border_style="cyan",
+                            title=f"{states.get(job['state'], job['state'])} {escape(job['label'])} "
+                                  f"[dim]{job['seconds']:.1f} s[/dim]"))
+
+@hooks_app.command("stop", help="Stop the background analyzer (the next hook starts it again)")
+def hooks_stop():
+    check_git_repo()
+    from vibetrack.hook_manager import find_repository, stop_daemon
+    
+    if stop_daemon(find_repository()[0]):
+        console.print("💤 [green]Background analyzer stopped[/green]")
+    else:
+        console.print("[dim]The background analyzer was not running[/dim]")
+
+# Non-interactive commands for CI: plain JSON or text on stdout, no banners or panels
+silent_app = typer.Typer(help="🤫 Non-interactive analysis for CI (JSON or text output)", rich_markup_mode="rich")
+app.add_typer(silent_app, name="silent")
+
+def _emit(result, output_format):
+    from vibetrack.privacy_manager import SilentMode
+    typer.echo(SilentMode.generate_ci_report(result, output_format))
+    if not result.get("success"):
+        raise typer.Exit(1)
+
+@silent_app.command("analyze", help="Explain the current changes (or a commit) without any interaction")
+def silent_analyze(
+    commit: Optional[str] = typer.Option(None, "--commit", "-c", help="Analyze this commit instead (default: uncommitted changes, else HEAD)"),
+    output_format: str = typer.Option("json", "--output-format", "-f", help="json or text"),
+    include: Optional[List[str]] = typer.Option(None, "--include", "-i", help="Only analyze files matching this glob (repeatable)"),
+    exclude: Optional[List[str]] = typer.Option(None, "--exclude", "-x", help="Skip files matching this glob (repeatable, on top of .vibetrackignore)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ask the model again instead of reusing a cached answer"),
+):
+    from vibetrack.diff_utils import read_commit_diff, read_git_diff
+    from vibetrack.privacy_manager import SilentMode
+    
+    apply_cache_option(no_cache)
+    path_filter = build_path_filter(include, exclude)
+    if commit:
+        diff = read_commit_diff(commit, path_filter)
+    else:
+        # A CI checkout has no uncommitted changes: fall back to what HEAD brought in
+        diff = read_git_diff(['HEAD'], path_filter) or read_commit_diff('HEAD', path_filter)
+    _emit(SilentMode.analyze_silent(diff), output_format)
+
+@silent_app.command("check-commit", help="Rate a commit's quality, or every commit not rated yet")
+def silent_check_commit(
+    commit: str = typer.Argument("HEAD", help="Commit to check (with --new: the revision to walk back from)"),
+    new: bool = typer.Option(False, "--new", help="Check every commit reachable from COMMIT that the analysis index has not seen"),
+    max_count: int = typer.Option(200, "--max-count", "-n", help="With --new: check at most this many commits per run (0: no limit)"),
+    concurrency: Optional[int] = typer.Option(None, "--concurrency", "-j", help="Commits checked at once (default: VIBETRACK_CONCURRENCY)"),
+    output_format: str = typer.Option("json", "--output-format", "-f", help="json or text"),
+    no_index: bool = typer.Option(False, "--no-index", help="Neither reuse nor record results in the analysis index (not with --new)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ask the model again instead of reusing a cached answer"),
+    no_prescreen: bool = typer.Option(False, "--no-prescreen", help="Send every commit to the model, even those the local pre-screen is sure about"),
+):
+    from vibetrack.analysis_index import AnalysisIndex
+    from vibetrack.privacy_manager import SilentMode
+    
+    apply_cache_option(no_cache)
+    prescreen = False if no_prescreen else None
+    if no_index and not new:
+        _emit(SilentMode.check_commit_quality(commit, prescreen=prescreen), output_format)
+        return
+    with AnalysisIndex() as index:
+        if new:
+            result = SilentMode.check_new_commits(commit, index, concurrency, max_count or None, prescreen)
+        else:
+            result = SilentMode.check_commits_quality([commit], concurrency, index, prescreen)[0]
+    _emit(result, output_format)
+
 @app.command("about", help="ℹ️ About VibeTrack")
 def show_about():
     """
@@ -230,6 +694,14 @@ def show_help():
     
     commands_table.add_row("vibetrack check", "🔍 Analyze current changes", "vibetrack check --staged")
     commands_table.add_row("vibetrack compare", "📖 Compare commits/branches", "vibetrack compare HEAD~1 HEAD")
+    commands_table.add_row("vibetrack log", "📜 Check every commit of a range", "vibetrack log v1.2..v1.3")
+    commands_table.add_row("vibetrack compare-dirs", "📂 Compare two directory trees", "vibetrack compare-dirs old/ new/")
+    commands_table.add_row("vibetrack servers", "🖥️ Check the AI servers", "vibetrack servers")
+    commands_table.add_row("vibetrack history", "📚 Search and export saved analyses", "vibetrack history -b main --since 7d")
+    commands_table.add_row("vibetrack index", "🗃️ Show or clear analyzed commits", "vibetrack index --clear")
+    commands_table.add_row("vibetrack silent", "🤫 JSON/text analysis for CI", "vibetrack silent check-commit --new")
+    commands_table.add_row("vibetrack hooks", "🪝 Git hooks with a warm analyzer", "vibetrack hooks install")
+    commands_table.add_row("vibetrack cache", "⚡ Show or clear cached AI answers", "vibetrack cache --clear")
     commands_table.add_row("vibetrack status", "📊 Project status", "vibetrack status")
     commands_table.add_row("vibetrack about", "ℹ️ About VibeTrack", "vibetrack about")
     
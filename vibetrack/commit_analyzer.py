@@ -1,23 +1,34 @@
+import asyncio
+import re
 import subprocess
-from vibetrack.local_client import send_to_local_model
+import time
+from vibetrack.async_engine import AsyncEngine
+from vibetrack.diff_utils import prepare_diff_for_model
+from vibetrack.git_objects import get_object_store
+from vibetrack.local_client import CONCURRENCY
+from vibetrack.main import show_model_analysis
+from vibetrack.prescreen import screen_commit
 from rich.console import Console
+from rich.markup import escape
 from rich.panel import Panel
+from rich.progress import BarColumn, Progress, SpinnerColumn, TextColumn
+from rich.table import Table
 
 console = Console()
 
 def get_commit_message(commit_hash="HEAD"):
     """Get commit message for a specific commit"""
     try:
-        message = subprocess.check_output(
-            ['git', 'log', '--format=%B', '-n', '1', commit_hash],
-            stderr=subprocess.STDOUT
-        ).decode('utf-8').strip()
-        return message
+        return get_object_store().commit_message(commit_hash)
     except subprocess.CalledProcessError:
         return None
 
-def analyze_commit_message_vs_changes(commit_hash="HEAD", persian_mode=False):
-    """Analyze if commit message matches the actual changes"""
+def analyze_commit_message_vs_changes(commit_hash="HEAD", persian_mode=False, prescreen=None):
+    """Analyze if commit message matches the actual changes
+
+    Commits the local pre-screen is confident about are not sent to the model
+    (prescreen=False, or VIBETRACK_PRESCREEN=0, sends every one).
+    """
     
     if persian_mode:
         console.print(f"[bold blue]🔍 دارم پیام کامیت {commit_hash} رو با تغییرات مقایسه میکنم...[/bold blue]")
@@ -35,11 +46,8 @@ def analyze_commit_message_vs_changes(commit_hash="HEAD", persian_mode=False):
     
     # Get changes for this commit
     try:
-        from vibetrack.diff_utils import generate_git_diff
-        if commit_hash == "HEAD":
-            diff = generate_git_diff("HEAD~1", "HEAD")
-        else:
-            diff = generate_git_diff(f"{commit_hash}~1", commit_hash)
+        from vibetrack.diff_utils import read_commit_diff
+        diff = read_commit_diff(commit_hash)
     except Exception as e:
         if persian_mode:
             console.print(f"❌ [red]خطا در دریافت تغییرات: {e}[/red]")
@@ -47,7 +55,7 @@ def analyze_commit_message_vs_changes(commit_hash="HEAD", persian_mode=False):
             console.print(f"❌ [red]Error getting changes: {e}[/red]")
         return
     
-    if not diff.strip():
+    if not diff:
         if persian_mode:
             console.print("ℹ️  [yellow]هیچ تغییری در این کامیت پیدا نشد[/yellow]")
         else:
@@ -64,13 +72,34 @@ def analyze_commit_message_vs_changes(commit_hash="HEAD", persian_mode=False):
     )
     console.print(message_panel)
     
+    screen = screen_commit(commit_message, diff, prescreen)
+    if screen is not None and screen.confident:
+        if persian_mode:
+            verdict = "✅ پیام با تغییرات جوره" if screen.verdict == "MATCH" else "❌ پیام با تغییرات جور نیست"
+            console.print(f"[bold]⚡ {verdict}[/bold] [dim](بررسی سریع محلی، امتیاز {screen.score:.2f}؛ بدون مدل)[/dim]")
+        else:
+            verdict = "✅ Message fits the changes" if screen.verdict == "MATCH" else "❌ Message does not fit the changes"
+            console.print(f"[bold]⚡ {verdict}[/bold] [dim](local pre-screen, score {screen.score:.2f}; no model call)[/dim]")
+        console.print(f"[dim]{escape(screen.summary)}[/dim]")
+        return {
+            'commit_hash': commit_hash,
+            'commit_message': commit_message,
+            'diff': diff.text,
+            'diff_stats': diff.stats(),
+            'analysis': screen.summary,
+            'prescreen': screen.as_dict(),
+            'model_stats': None
+        }
+    
+    diff_text = prepare_diff_for_model(diff).text
+
     # Analyze with AI
     if persian_mode:
         prompt = f"""پیام کامیت:
 {commit_message}
 
 تغییرات واقعی کد:
-{diff}
+{diff_text}
 
 لطفاً تحلیل کن:
 1. آیا پیام کامیت با تغییرات واقعی مطابقت داره؟
@@ -84,7 +113,7 @@ def analyze_commit_message_vs_changes(commit_hash="HEAD", persian_mode=False):
 {commit_message}
 
 Actual code changes:
-{diff}
+{diff_text}
 
 Please analyze:
 1. Does the commit message match the actual changes?
@@ -99,27 +128,23 @@ Provide a clear and understandable analysis."""
     else:
         console.print("\n[bold blue]🤖 Analyzing message vs changes consistency...[/bold blue]")
     
-    analysis = send_to_local_model(prompt, persian_mode=persian_mode)
-    
-    # Display analysis
+    # Display the analysis as it streams in
     title = "[bold yellow]�� تحلیل تطابق[/bold yellow]" if persian_mode else "[bold yellow]🧠 Consistency Analysis[/bold yellow]"
-    analysis_panel = Panel(
-        analysis,
-        title=title,
-        border_style="yellow",
-        expand=False
-    )
-    console.print(analysis_panel)
+    analysis, model_stats = show_model_analysis(prompt, persian_mode=persian_mode, title=title)
     
     return {
         'commit_hash': commit_hash,
         'commit_message': commit_message,
-        'diff': diff,
-        'analysis': analysis
+        'diff': diff.text,
+        'diff_stats': diff.stats(),
+        'analysis': analysis,
+        'prescreen': screen.as_dict() if screen is not None else None,
+        'model_stats': model_stats
     }
 
 def suggest_better_commit_message(diff, persian_mode=False):
     """Suggest a better commit message based on changes"""
+    diff = prepare_diff_for_model(diff).text
     
     if persian_mode:
         prompt = f"""بر اساس این تغییرات کد:
@@ -146,15 +171,237 @@ Please suggest a good commit message that:
 
 Just provide the commit message, no extra explanation."""
     
-    suggestion = send_to_local_model(prompt, persian_mode=persian_mode)
-    
     title = "[bold green]💡 پیشنهاد پیام کامیت[/bold green]" if persian_mode else "[bold green]💡 Suggested Commit Message[/bold green]"
-    suggestion_panel = Panel(
-        suggestion,
-        title=title,
-        border_style="green",
-        expand=False
-    )
-    console.print(suggestion_panel)
+    suggestion, _ = show_model_analysis(prompt, persian_mode=persian_mode, title=title, border_style="green")
     
-    return suggestion
\ No newline at end of file
+    return suggestion
+
+# Commit ranges: every commit of A..B read from one 'git log -p' stream and
+# checked against its message, several at a time
+
+VERDICTS = ("MATCH", "PARTIAL", "MISMATCH")
+_VERDICT_RE = re.compile(r'\b(' + '|'.join(VERDICTS) + r')\b')
+# Short answers keep a release of a few hundred commits quick to check
+RANGE_MAX_TOKENS = 256
+# Bump when range_messages changes, so the analysis index treats every commit as due again
+RANGE_PROMPT_VERSION = "1"
+
+def _range_kind(persian_mode):
+    return "range-fa" if persian_mode else "range"
+
+def range_messages(commit_message, diff_text, persian_mode=False):
+    """Brief message-vs-changes check of one commit, starting with a verdict word"""
+    if persian_mode:
+        system_prompt = "تو یک برنامه‌نویس باتجربه هستی که کامیت‌های یک نسخه رو بررسی میکنه. کوتاه و دقیق جواب بده."
+        user_prompt = f"""پیام کامیت:
+{commit_message}
+
+تغییرات واقعی کد:
+{diff_text}
+
+آیا پیام کامیت با تغییرات مطابقت داره؟ خط اول فقط یکی از این سه کلمه‌ی انگلیسی باشه: MATCH، PARTIAL یا MISMATCH.
+بعد در حداکثر سه جمله به فارسی بگو این کامیت واقعاً چی کار میکنه و پیام چه چیزی رو جا انداخته یا اشتباه گفته."""
+    else:
+        system_prompt = "You are a senior code reviewer auditing the commits of a release. Be brief and precise."
+        user_prompt = f"""Commit message:
+{commit_message}
+
+Actual code changes:
+{diff_text}
+
+Does the commit message match the changes? Answer on the first line with exactly one word: MATCH, PARTIAL or MISMATCH.
+Then, in at most three sentences, say what the commit really does and what the message leaves out or gets wrong."""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def parse_verdict(answer):
+    """(verdict or None, the rest of the answer) from a range_messages answer"""
+    first_line, _, rest = answer.strip().partition('\n')
+    match = _VERDICT_RE.search(first_line.upper())
+    if match is None:
+        return None, answer.strip()
+    return match.group(1), rest.strip() or first_line[match.end():].strip(' :.-*')
+
+async def _analyze_range(engine, revision_range, persian_mode, path_filter, max_count, on_found, on_done,
+                         index, reanalyze, prescreen):
+    kind = _range_kind(persian_mode)
+
+    async def check(info, diff):
+        result = {
+            'commit_hash': info['hash'],
+            'subject': info['message'].splitlines()[0] if info['message'] else '',
+            'commit_message': info['message'],
+            'author': info['author'],
+            'date': info['date'],
+            'diff_stats': diff.stats(),
+            'verdict': None,
+            'analysis': None,
+            'error': None,
+            'from_index': False,
+            'prescreened': False,
+        }
+        try:
+            stored = None
+            if index is not None and not reanalyze:
+                stored = index.results([info['hash']], kind, RANGE_PROMPT_VERSION, engine.client.model).get(info['hash'])
+            screen = screen_commit(info['message'], diff, prescreen) if stored is None else None
+            if stored is not None:
+                result.update(verdict=stored['verdict'], analysis=stored['analysis'], from_index=True)
+            elif screen is not None and screen.confident:
+                # Cheap to redo, so not recorded: a later run without the pre-screen still asks the model
+                result.update(verdict=screen.verdict, analysis=f"Pre-screen ({screen.score:.2f}): {screen.summary}",
+                              prescreened=True)
+                return result
+            elif diff:
+                messages = range_messages(info['message'], prepare_diff_for_model(diff).text, persian_mode)
+                answer = await engine.chat(messages, temperature=0.3, max_tokens=RANGE_MAX_TOKENS)
+                result['verdict'], result['analysis'] = parse_verdict(answer)
+            if index is not None and stored is None:
+                index.record(info['hash'], kind, RANGE_PROMPT_VERSION, engine.client.model,
+                             {'verdict': result['verdict'], 'analysis': result['analysis']})
+        except Exception as e:
+            result['error'] = str(e)
+        finally:
+            if on_done is not None:
+                on_done(result)
+        return result
+
+    # Commits are checked as soon as git has produced them, while the log is still streaming
+    tasks = []
+    async for info, diff in engine.iter_commit_log(revision_range, path_filter, max_count=max_count):
+        tasks.append(asyncio.ensure_future(check(info, diff)))
+        if on_found is not None:
+            on_found(len(tasks))
+    return await asyncio.gather(*tasks)
+
+def analyze_commit_range(revision_range, persian_mode=False, concurrency=None, path_filter=None, max_count=None,
+                         on_found=None, on_done=None, index=None, reanalyze=False, prescreen=None):
+    """Check every commit of a range (e.g. v1.2..v1.3) against its message; returns (results, stats)
+
+    results are in commit order, oldest first; a commit whose check failed has
+    its 'error' set. stats holds the commit count, wall time and commits per minute.
+    With an AnalysisIndex, commits checked before are taken from it ('from_index')
+    unless reanalyze is set, and new checks are recorded in it. Commits the local
+    pre-screen is confident about are not sent to the model ('prescreened');
+    stats['model_calls_avoided'] counts them.
+    """
+    concurrency = concurrency or CONCURRENCY
+    started = time.perf_counter()
+
+    async def run():
+        async with AsyncEngine(concurrency) as engine:
+            return await _analyze_range(engine, revision_range, persian_mode, path_filter, max_count,
+                                        on_found, on_done, index, reanalyze, prescreen)
+
+    results = asyncio.run(run())
+    elapsed = time.perf_counter() - started
+    stats = {
+        'commits': len(results),
+        'failed': sum(1 for result in results if result['error']),
+        'from_index': sum(1 for result in results if result['from_index']),
+        'model_calls_avoided': sum(1 for result in results if result['prescreened']),
+        'concurrency': concurrency,
+        'total_time': elapsed,
+        'commits_per_minute': 60 * len(results) / elapsed if elapsed > 0 else None,
+    }
+    return results, stats
+
+# Longer summaries are cut in the table; the saved report keeps them whole
+TABLE_SUMMARY_CHARS = 160
+
+def _short(text, limit=TABLE_SUMMARY_CHARS):
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + '…'
+
+_VERDICT_STYLES = {
+    "MATCH": "[green]✅ match[/green]",
+    "PARTIAL": "[yellow]⚠️ partial[/yellow]",
+    "MISMATCH": "[red]❌ mismatch[/red]",
+}
+
+def show_commit_range(revision_range, persian_mode=False, concurrency=None, path_filter=None, max_count=None,
+                      save_to_file=True, index=None, reanalyze=False, prescreen=None):
+    """Check a commit range with a progress bar, print the per-commit table and save the report"""
+    if persian_mode:
+        console.print(f"[bold blue]📜 دارم کامیت‌های {revision_range} رو بررسی میکنم...[/bold blue]")
+    else:
+        console.print(f"[bold blue]📜 Checking the commits of {revision_range}...[/bold blue]")
+
+    with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"), BarColumn(),
+                  TextColumn("{task.completed}/{task.total}"), console=console, transient=True) as progress:
+        task = progress.add_task("📜 کامیت‌ها" if persian_mode else "📜 Commits", total=None)
+        results, stats = analyze_commit_range(
+            revision_range, persian_mode, concurrency, path_filter, max_count,
+            on_found=lambda count: progress.update(task, total=count),
+            on_done=lambda result: progress.advance(task), index=index, reanalyze=reanalyze, prescreen=prescreen)
+
+    if not results:
+        if persian_mode:
+            console.print("ℹ️  [yellow]هیچ کامیتی در این بازه پیدا نشد[/yellow]")
+        else:
+            console.print("ℹ️  [yellow]No commits found in this range[/yellow]")
+        return results, stats
+
+    table = Table(title=f"📜 {revision_range}", border_style="cyan", show_lines=True)
+    table.add_column("#", justify="right", style="dim")
+    table.add_column("Commit", style="cyan", no_wrap=True)
+    table.add_column("پیام" if persian_mode else "Subject")
+    table.add_column("+/-", justify="right", no_wrap=True)
+    table.add_column("نتیجه" if persian_mode else "Verdict", no_wrap=True)
+    table.add_column("خلاصه" if persian_mode else "Summary")
+    for number, result in enumerate(results, 1):
+        diff_stats = result['diff_stats']
+        if result['error']:
+            verdict, summary = "[red]⚠️ error[/red]", f"[red]{escape(_short(result['error']))}[/red]"
+        elif result['analysis'] is None:
+            verdict, summary = "[dim]-[/dim]", "[dim]no changes[/dim]"
+        else:
+            verdict = _VERDICT_STYLES.get(result['verdict'], "[dim]?[/dim]")
+            if result['from_index']:
+                verdict += " [dim]↺[/dim]"
+            elif result['prescreened']:
+                verdict += " [dim]⚡[/dim]"
+            summary = escape(_short(result['analysis']))
+        table.add_row(str(number), result['commit_hash'][:8], escape(result['subject']),
+                      f"[green]+{diff_stats['additions']}[/green] [red]-{diff_stats['deletions']}[/red]",
+                      verdict, summary)
+    console.print(table)
+
+    rate = f"{stats['commits_per_minute']:.0f}" if stats['commits_per_minute'] else "-"
+    if persian_mode:
+        console.print(f"[dim]⏱ {stats['commits']} کامیت در {stats['total_time']:.1f}s ({rate} کامیت در دقیقه، {stats['concurrency']} تا همزمان)[/dim]")
+    else:
+        console.print(f"[dim]⏱ {stats['commits']} commits in {stats['total_time']:.1f}s ({rate} commits/min, {stats['concurrency']} at a time)[/dim]")
+    if stats['from_index']:
+        if persian_mode:
+            console.print(f"[dim]↺ {stats['from_index']} کامیت قبلاً بررسی شده بود و از ایندکس خونده شد[/dim]")
+        else:
+            console.print(f"[dim]↺ {stats['from_index']} commits were checked before and read from the index[/dim]")
+    if stats['model_calls_avoided']:
+        if persian_mode:
+            console.print(f"[dim]⚡ {stats['model_calls_avoided']} کامیت با بررسی سریع محلی مشخص شد (بدون درخواست به مدل)[/dim]")
+        else:
+            console.print(f"[dim]⚡ {stats['model_calls_avoided']} commits were settled by the local pre-screen (model calls avoided)[/dim]")
+
+    if save_to_file and results:
+        from vibetrack.save_result import REPORT_FORMATS, record_range, save_range_report
+        batch = record_range(revision_range, results, stats)
+        filename = save_range_report(revision_range, results, stats, batch) if "md" in REPORT_FORMATS else None
+        if index is not None:
+            from vibetrack.local_client import get_client
+            checked = [result['commit_hash'] for result in results
+                       if not result['from_index'] and not result['prescreened'] and not result['error']]
+            index.set_report(checked, _range_kind(persian_mode), RANGE_PROMPT_VERSION, get_client().model,
+                             filename or batch)
+        if persian_mode:
+            console.print(f"\n[bold green]✅ گزارش در تاریخچه ذخیره شد:[/bold green] [cyan]{batch}[/cyan]")
+        else:
+            console.print(f"\n[bold green]✅ Analysis saved to history:[/bold green] [cyan]{batch}[/cyan]")
+        if filename:
+            if persian_mode:
+                console.print(f"[bold green]✅ گزارش ذخیره شد در:[/bold green] [cyan]{filename}[/cyan]")
+            else:
+                console.print(f"[bold green]✅ Analysis saved to:[/bold green] [cyan]{filename}[/cyan]")
+    return results, stats
@@ -0,0 +1,307 @@
+"""
+Prompt compaction: make a diff cheaper for the model to read without hiding
+what changed.
+
+Prompt processing dominates on a CPU-bound inference box, so every line the
+model does not need is time saved. For the files that are sent, compaction
+- drops `index` lines and the `---`/`+++` lines that repeat the paths, and
+  shortens mode lines;
+- re-cuts hunks with fewer context lines (VIBETRACK_CONTEXT_LINES, default
+  1), falling back to none when the diff is still over the token budget;
+- collapses hunks whose only change is whitespace;
+- collapses blocks of lines that were only moved (removed in one place and
+  added unchanged in another);
+- replaces a hunk that repeats an earlier one (the same edit in many files)
+  with a reference to the first.
+The result stays a parseable git-style diff.
+"""
+
+import os
+import re
+
+BYTES_PER_TOKEN = 4
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+CONTEXT_LINES = _env_int('VIBETRACK_CONTEXT_LINES', 1)
+# Shorter moved blocks or repeated hunks are cheaper to show than to describe
+MOVE_MIN_LINES = 3
+DEDUPE_MIN_BYTES = 120
+
+_HUNK_HEADER_RE = re.compile(r'@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@(.*)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def estimate_tokens(text):
+    """Rough token count (about four bytes per token for code and English)"""
+    return (len(text.encode('utf-8')) + BYTES_PER_TOKEN - 1) // BYTES_PER_TOKEN
+
+class _Line:
+    """One body line of a hunk with its position on both sides"""
+    __slots__ = ('kind', 'text', 'old_no', 'new_no', 'hidden', 'note')
+
+    def __init__(self, kind, text, old_no, new_no):
+        self.kind = kind
+        self.text = text
+        self.old_no = old_no
+        self.new_no = new_no
+        # Set on lines of a moved block: the first one carries the note, the others are skipped
+        self.hidden = False
+        self.note = None
+
+class _Hunk:
+    __slots__ = ('section', 'lines', 'raw')
+
+    def __init__(self, section, lines, raw):
+        self.section = section
+        self.lines = lines
+        self.raw = raw
+
+def _parse_hunk(hunk_text):
+    """Split a hunk into _Lines, or None when the header cannot be read"""
+    header, _, body = hunk_text.partition('\n')
+    match = _HUNK_HEADER_RE.match(header)
+    if match is None:
+        return None
+    old_start, old_count = int(match.group(1)), int(match.group(2) or 1)
+    new_start, new_count = int(match.group(3)), int(match.group(4) or 1)
+    # An empty side's start is the line before the change
+    old_cursor = old_start + 1 if old_count == 0 else old_start
+    new_cursor = new_start + 1 if new_count == 0 else new_start
+
+    lines = []
+    for text in body.splitlines(True):
+        kind = text[:1]
+        if kind == ' ' or (kind == '\n' and text == '\n'):
+            # Some tools strip the space of empty context lines
+            lines.append(_Line(' ', text if kind == ' ' else ' \n', old_cursor, new_cursor))
+            old_cursor += 1
+            new_cursor += 1
+        elif kind == '-':
+            lines.append(_Line('-', text, old_cursor, new_cursor))
+            old_cursor += 1
+        elif kind == '+':
+            lines.append(_Line('+', text, old_cursor, new_cursor))
+            new_cursor += 1
+        else:
+            # '\ No newline at end of file' and anything unexpected stay with the previous line
+            lines.append(_Line('\\', text, old_cursor, new_cursor))
+    return _Hunk(match.group(5), lines, hunk_text)
+
+def _compact_header(header):
+    """File header without index lines and repeated paths"""
+    lines = header.splitlines(True)
+    has_git_line = any(line.startswith('diff --git ') for line in lines)
+    kept = []
+    old_mode = None
+    for line in lines:
+        if line.startswith('index '):
+            continue
+        if has_git_line and line.startswith(('--- ', '+++ ')):
+            # The 'diff --git' line already names the file
+            continue
+        if line.startswith(('new file mode ', 'deleted file mode ')):
+            kept.append(line.split(' mode ', 1)[0] + '\n')
+        elif line.startswith('old mode '):
+            old_mode = line[len('old mode '):].strip()
+        elif line.startswith('new mode ') and old_mode is not None:
+            kept.append(f"mode change {old_mode} => {line[len('new mode '):].strip()}\n")
+        else:
+            kept.append(line)
+    return ''.join(kept)
+
+def _run_key(run):
+    # Exact content: a re-indented block is an edit, not a move
+    return tuple(line.text[1:].rstrip() for line in run)
+
+def _runs(hunk, kind):
+    """Maximal blocks of consecutive lines of one kind ('-' or '+')"""
+    if hunk.lines is None:
+        return
+    run = []
+    for line in hunk.lines:
+        if line.kind == kind:
+            run.append(line)
+            continue
+        if line.kind == '\\' and run:
+            continue
+        if len(run) >= MOVE_MIN_LINES:
+            yield run
+        run = []
+    if len(run) >= MOVE_MIN_LINES:
+        yield run
+
+def _mark_moves(files):
+    """Collapse blocks that were removed in one place and added unchanged in another"""
+    added = {}
+    for path, _, _, hunks in files:
+        for hunk in hunks:
+            for run in _runs(hunk, '+'):
+                added.setdefault(_run_key(run), []).append((path, run))
+
+    moved = 0
+    for path, _, _, hunks in files:
+        for hunk in hunks:
+            for run in _runs(hunk, '-'):
+                targets = added.get(_run_key(run))
+                if not targets:
+                    continue
+                target_path, target = targets.pop(0)
+                for line in run[1:] + target[1:]:
+                    line.hidden = True
+                run[0].note = f'# vibetrack: {len(run)} lines moved to {target_path}:{target[0].new_no}\n'
+                target[0].note = f'# vibetrack: {len(run)} lines moved here from {path}:{run[0].old_no}\n'
+                moved += len(run)
+    return moved
+
+def _span(count, cursor):
+    return cursor - 1 if count == 0 else cursor
+
+def _format_header(lines, section, elided=False):
+    """The @@ header counting the lines that are emitted
+
+    Lines of a moved block are replaced by a note and do not count. A hunk
+    elided as a whole (one note line) keeps the header of all its lines, so
+    the note says which lines it stands for.
+    """
+    first = lines[0]
+    if not elided:
+        lines = [line for line in lines if not line.hidden and line.note is None]
+    old_count = sum(1 for line in lines if line.kind in ' -')
+    new_count = sum(1 for line in lines if line.kind in ' +')
+    old_start = _span(old_count, next((line.old_no for line in lines if line.kind in ' -'), first.old_no))
+    new_start = _span(new_count, next((line.new_no for line in lines if line.kind in ' +'), first.new_no))
+    old = f'{old_start}' if old_count == 1 else f'{old_start},{old_count}'
+    new = f'{new_start}' if new_count == 1 else f'{new_start},{new_count}'
+    return f'@@ -{old} +{new} @@{section}\n'
+
+def _regroup(hunk, context):
+    """Re-cut a hunk so that at most `context` unchanged lines surround each change"""
+    lines = hunk.lines
+    changes = [index for index, line in enumerate(lines) if line.kind in '+-']
+    if not changes:
+        return [lines]
+    groups = []
+    start = changes[0]
+    previous = changes[0]
+    for index in changes[1:]:
+        between = sum(1 for line in lines[previous + 1:index] if line.kind == ' ')
+        if between > 2 * context:
+            groups.append((start, previous))
+            start = index
+        previous = index
+    groups.append((start, previous))
+
+    result = []
+    for first, last in groups:
+        begin = first
+        kept = 0
+        while begin > 0 and kept < context and lines[begin - 1].kind in ' \\':
+            begin -= 1
+            kept += lines[begin].kind == ' '
+        if begin < first and lines[begin].kind == '\\':
+            begin += 1
+        end = last
+        kept = 0
+        while end + 1 < len(lines) and lines[end + 1].kind in ' \\':
+            if lines[end + 1].kind == ' ':
+                if kept == context:
+                    break
+                kept += 1
+            end += 1
+        result.append(lines[begin:end + 1])
+    return result
+
+def _is_whitespace_only(lines):
+    removed = [_WHITESPACE_RE.sub('', line.text[1:]) for line in lines if line.kind == '-']
+    added = [_WHITESPACE_RE.sub('', line.text[1:]) for line in lines if line.kind == '+']
+    if not removed and not added:
+        return False
+    return [text for text in removed if text] == [text for text in added if text]
+
+class CompactedDiff:
+    """Compacted (header, body) per file plus what the compaction saved"""
+
+    def __init__(self, parts, tokens_before, tokens_after, context, counts):
+        # DiffFile -> (header text, body text)
+        self.parts = parts
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+        self.context = context
+        # What was collapsed: 'whitespace-only hunks', 'moved lines', 'duplicate hunks'
+        self.counts = counts
+
+    @property
+    def tokens_saved(self):
+        return max(self.tokens_before - self.tokens_after, 0)
+
+    @property
+    def text(self):
+        return ''.join(header + body for header, body in self.parts.values())
+
+def _render(files, context):
+    parts = {}
+    counts = {'whitespace-only hunks': 0, 'moved lines': 0, 'duplicate hunks': 0}
+    seen = {}
+    for path, diff_file, header, hunks in files:
+        body = []
+        for hunk in hunks:
+            if hunk.lines is None:
+                body.append(hunk.raw)
+                continue
+            for lines in _regroup(hunk, context):
+                if _is_whitespace_only(lines):
+                    added = sum(1 for line in lines if line.kind == '+')
+                    removed = sum(1 for line in lines if line.kind == '-')
+                    body.append(f'{_format_header(lines, hunk.section, elided=True)}'
+                                f'# vibetrack: whitespace-only change (+{added} -{removed} lines)\n')
+                    counts['whitespace-only hunks'] += 1
+                    continue
+                text = ''.join(line.note or line.text for line in lines if not line.hidden)
+                if len(text) >= DEDUPE_MIN_BYTES:
+                    first = seen.get(text)
+                    if first is not None:
+                        body.append(f'{_format_header(lines, hunk.section, elided=True)}# vibetrack: same change as {first}\n')
+                        counts['duplicate hunks'] += 1
+                        continue
+                    seen[text] = f'{path}:{lines[0].new_no}'
+                body.append(_format_header(lines, hunk.section) + text)
+        parts[diff_file] = (header, ''.join(body))
+    return parts, counts
+
+def compact_files(diff, diff_files=None, context=None, token_budget=0):
+    """Compact some files of a ParsedDiff (all by default) into a CompactedDiff
+
+    When the result is still over token_budget (0: no budget), the context
+    lines are dropped altogether.
+    """
+    if diff_files is None:
+        diff_files = diff.files
+    context = CONTEXT_LINES if context is None else context
+
+    files = []
+    tokens_before = 0
+    for diff_file in diff_files:
+        tokens_before += estimate_tokens(diff.file_text(diff_file))
+        header_end = diff_file.hunks[0].start if diff_file.hunks else diff_file.end
+        header = _compact_header(diff.text[diff_file.start:header_end])
+        hunks = []
+        for position, hunk in enumerate(diff_file.hunks):
+            end = diff_file.hunks[position + 1].start if position + 1 < len(diff_file.hunks) else diff_file.end
+            raw = diff.text[hunk.start:end]
+            hunks.append(_parse_hunk(raw) or _Hunk('', None, raw))
+        files.append((diff_file.path, diff_file, header, hunks))
+
+    moved = _mark_moves(files)
+    parts, counts = _render(files, context)
+    tokens_after = sum(estimate_tokens(header + body) for header, body in parts.values())
+    if 0 < token_budget < tokens_after and context > 0:
+        # Still too big: drop the remaining context too
+        context = 0
+        parts, counts = _render(files, context)
+        tokens_after = sum(estimate_tokens(header + body) for header, body in parts.values())
+    counts['moved lines'] = moved
+    return CompactedDiff(parts, tokens_before, tokens_after, context, counts)
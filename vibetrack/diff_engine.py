@@ -0,0 +1,927 @@
+"""
+Line diff engine used for file-to-file comparisons.
+
+Files are memory-mapped and every line is interned to an integer ID, so the
+algorithms below only ever compare small ints. Three algorithms are available,
+matching the ones git offers:
+
+- myers:     linear-space Myers O(ND) (git's default)
+- patience:  anchors on lines that are unique on both sides, Myers in between
+- histogram: anchors on the least frequent common lines, Myers as fallback
+
+The output is a git-style unified diff ('diff --git' header, index line,
+hunk headers with function context and '\\ No newline at end of file').
+"""
+
+import hashlib
+import mmap
+import os
+import stat
+from array import array
+
+DEFAULT_ALGORITHM = 'myers'
+DEFAULT_CONTEXT = 3
+
+# Same limits as git's xdiff
+_BINARY_SNIFF_BYTES = 8000
+_FUNC_CONTEXT_MAX = 80
+_HISTOGRAM_MAX_CHAIN = 64
+
+class LineFile:
+    """A memory-mapped file split into lines that are addressed by byte offsets"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._map = None
+        self.data = b''
+        self.offsets = array('q', [0])
+
+        if path is None:
+            # Stands for /dev/null: the file does not exist on this side
+            self.mode = None
+            return
+
+        self.mode = os.stat(path).st_mode
+        size = os.path.getsize(path)
+        if size:
+            self._file = open(path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = self._map
+            self._index_lines(size)
+
+    def _index_lines(self, size):
+        offsets = self.offsets
+        find = self._map.find
+        position = 0
+        while position < size:
+            newline = find(b'\n', position)
+            position = size if newline < 0 else newline + 1
+            offsets.append(position)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = None
+            self._file = None
+            self.data = b''
+
+    def line(self, index):
+        return self.data[self.offsets[index]:self.offsets[index + 1]]
+
+    def same_content(self, other, chunk=1 << 20):
+        """Compare contents in chunks so two large mappings are never copied whole"""
+        size = len(self.data)
+        if size != len(other.data):
+            return False
+        for start in range(0, size, chunk):
+            if self.data[start:start + chunk] != other.data[start:start + chunk]:
+                return False
+        return True
+
+    def is_binary(self):
+        return b'\0' in self.data[:_BINARY_SNIFF_BYTES]
+
+    def blob_id(self):
+        """The git blob SHA-1 of the file content"""
+        if self.path is None:
+            return '0' * 40
+        digest = hashlib.sha1(b'blob %d\0' % len(self.data))
+        digest.update(self.data)
+        return digest.hexdigest()
+
+    def git_mode(self):
+        if self.mode is None:
+            return None
+        return '100755' if self.mode & stat.S_IXUSR else '100644'
+
+def intern_lines(*files):
+    """Map every distinct line to a small int so the algorithms compare ints, not text"""
+    table = {}
+    sequences = []
+    for line_file in files:
+        ids = array('l')
+        offsets = line_file.offsets
+        data = line_file.data
+        setdefault = table.setdefault
+        for index in range(len(offsets) - 1):
+            ids.append(setdefault(data[offsets[index]:offsets[index + 1]], len(table)))
+        sequences.append(ids)
+    return sequences
+
+# Algorithms. Each one marks the changed lines of a[a_lo:a_hi] and b[b_lo:b_hi]
+# in the bytearrays changed_a / changed_b, the same representation xdiff uses.
+# Myers follows git's xdiff (xdiffi.c / xprepare.c) closely so the chosen
+# alignment, not just the edit distance, is the one git picks.
+
+# Tuning constants from xdiff
+_MAX_COST_MIN = 256
+_HEUR_MIN_COST = 256
+_SNAKE_CNT = 20
+_K_HEUR = 4
+_MAX_EQLIMIT = 1024
+_SIMSCAN_WINDOW = 100
+_KPDIS_RUN = 4
+_LINE_MAX = 1 << 62
+
+def _bogosqrt(n):
+    root = 1
+    while n > 0:
+        n >>= 2
+        root <<= 1
+    return root
+
+def _trim(a, a_lo, a_hi, b, b_lo, b_hi):
+    while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+        a_lo += 1
+        b_lo += 1
+    while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+        a_hi -= 1
+        b_hi -= 1
+    return a_lo, a_hi, b_lo, b_hi
+
+def _mark_range(changed, lo, hi):
+    for index in range(lo, hi):
+        changed[index] = 1
+
+def _reduce(lines, lo, hi, other_counts, limit, changed):
+    """Drop lines that cannot be matched (xdl_cleanup_records), marking them changed right away
+
+    A line with many matches is dropped too when it sits in a run made mostly
+    of unmatched lines (xdl_clean_mmatch). Instead of rescanning up to
+    _SIMSCAN_WINDOW lines around each of them, the runs are read off prefix
+    sums of unmatched lines and the nearest single-match line on each side.
+    """
+    size = hi - lo
+    # 0: no match on the other side, 1: some matches, 2: too many matches
+    kinds = bytearray(size)
+    for i in range(size):
+        matches = other_counts.get(lines[lo + i], 0)
+        if matches:
+            kinds[i] = 2 if matches >= limit else 1
+
+    unmatched = array('l', [0]) * (size + 1)
+    previous_single = array('l', [-1]) * size
+    running, last = 0, -1
+    for i in range(size):
+        previous_single[i] = last
+        if kinds[i] == 1:
+            last = i
+        elif not kinds[i]:
+            running += 1
+        unmatched[i + 1] = running
+    next_single = array('l', [size]) * size
+    last = size
+    for i in range(size - 1, -1, -1):
+        next_single[i] = last
+        if kinds[i] == 1:
+            last = i
+
+    reduced = array('l')
+    index = array('l')
+    for i in range(size):
+        kind = kinds[i]
+        keep = kind == 1
+        if kind == 2:
+            first = max(previous_single[i] + 1, i - _SIMSCAN_WINDOW)
+            no_match_before = unmatched[i] - unmatched[first]
+            if no_match_before:
+                final = min(next_single[i] - 1, i + _SIMSCAN_WINDOW)
+                no_match_after = unmatched[final + 1] - unmatched[i + 1]
+                if no_match_after:
+                    no_match = no_match_before + no_match_after
+                    multi = (i - first - no_match_before) + (final - i - no_match_after) + 2
+                    keep = not multi * _KPDIS_RUN < multi + no_match
+                else:
+                    keep = True
+            else:
+                keep = True
+        if keep:
+            reduced.append(lines[lo + i])
+            index.append(lo + i)
+        else:
+            changed[lo + i] = 1
+    return reduced, index
+
+def _split(ha1, off1, lim1, ha2, off2, lim2, kvdf, kvdb, base, need_min, mxcost):
+    """Find the split point of the middle snake, with xdiff's cost heuristics (xdl_split)"""
+    dmin, dmax = off1 - lim2, lim1 - off2
+    fmid, bmid = off1 - off2, lim1 - lim2
+    odd = (fmid - bmid) & 1
+    fmin = fmax = fmid
+    bmin = bmax = bmid
+
+    kvdf[base + fmid] = off1
+    kvdb[base + bmid] = lim1
+
+    ec = 0
+    while True:
+        ec += 1
+        got_snake = False
+
+        # Extend the top-down search window
+        if fmin > dmin:
+            fmin -= 1
+            kvdf[base + fmin - 1] = -1
+        else:
+            fmin += 1
+        if fmax < dmax:
+            fmax += 1
+            kvdf[base + fmax + 1] = -1
+        else:
+            fmax -= 1
+
+        for d in range(fmax, fmin - 1, -2):
+            if kvdf[base + d - 1] >= kvdf[base + d + 1]:
+                i1 = kvdf[base + d - 1] + 1
+            else:
+                i1 = kvdf[base + d + 1]
+            previous = i1
+            i2 = i1 - d
+            while i1 < lim1 and i2 < lim2 and ha1[i1] == ha2[i2]:
+                i1 += 1
+                i2 += 1
+            if i1 - previous > _SNAKE_CNT:
+                got_snake = True
+            kvdf[base + d] = i1
+            if odd and bmin <= d <= bmax and kvdb[base + d] <= i1:
+                return i1, i2, True, True
+
+        # Extend the bottom-up search window
+        if bmin > dmin:
+            bmin -= 1
+            kvdb[base + bmin - 1] = _LINE_MAX
+        else:
+            bmin += 1
+        if bmax < dmax:
+            bmax += 1
+            kvdb[base + bmax + 1] = _LINE_MAX
+        else:
+            bmax -= 1
+
+        for d in range(bmax, bmin - 1, -2):
+            if kvdb[base + d - 1] < kvdb[base + d + 1]:
+                i1 = kvdb[base + d - 1]
+            else:
+                i1 = kvdb[base + d + 1] - 1
+            previous = i1
+            i2 = i1 - d
+            while i1 > off1 and i2 > off2 and ha1[i1 - 1] == ha2[i2 - 1]:
+                i1 -= 1
+                i2 -= 1
+            if previous - i1 > _SNAKE_CNT:
+                got_snake = True
+            kvdb[base + d] = i1
+            if not odd and fmin <= d <= fmax and i1 <= kvdf[base + d]:
+                return i1, i2, True, True
+
+        if need_min:
+            continue
+
+        # The edit cost is getting high: settle for a good-enough snake
+        if got_snake and ec > _HEUR_MIN_COST:
+            best = 0
+            for d in range(fmax, fmin - 1, -2):
+                dd = d - fmid if d > fmid else fmid - d
+                i1 = kvdf[base + d]
+                i2 = i1 - d
+                v = (i1 - off1) + (i2 - off2) - dd
+                if (v > _K_HEUR * ec and v > best
+                        and off1 + _SNAKE_CNT <= i1 < lim1 and off2 + _SNAKE_CNT <= i2 < lim2):
+                    k = 1
+                    while ha1[i1 - k] == ha2[i2 - k]:
+                        if k == _SNAKE_CNT:
+                            best = v
+                            split = (i1, i2)
+                            break
+                        k += 1
+            if best > 0:
+                return split[0], split[1], True, False
+
+            best = 0
+            for d in range(bmax, bmin - 1, -2):
+                dd = d - bmid if d > bmid else bmid - d
+                i1 = kvdb[base + d]
+                i2 = i1 - d
+                v = (lim1 - i1) + (lim2 - i2) - dd
+                if (v > _K_HEUR * ec and v > best
+                        and off1 < i1 <= lim1 - _SNAKE_CNT and off2 < i2 <= lim2 - _SNAKE_CNT):
+                    k = 0
+                    while ha1[i1 + k] == ha2[i2 + k]:
+                        if k == _SNAKE_CNT - 1:
+                            best = v
+                            split = (i1, i2)
+                            break
+                        k += 1
+            if best > 0:
+                return split[0], split[1], False, True
+
+        # Enough is enough: take the furthest reaching path
+        if ec >= mxcost:
+            fbest = fbest1 = -1
+            for d in range(fmax, fmin - 1, -2):
+                i1 = min(kvdf[base + d], lim1)
+                i2 = i1 - d
+                if lim2 < i2:
+                    i1 = lim2 + d
+                    i2 = lim2
+                if fbest < i1 + i2:
+                    fbest = i1 + i2
+                    fbest1 = i1
+
+            bbest = bbest1 = _LINE_MAX
+            for d in range(bmax, bmin - 1, -2):
+                i1 = max(off1, kvdb[base + d])
+                i2 = i1 - d
+                if i2 < off2:
+                    i1 = off2 + d
+                    i2 = off2
+                if i1 + i2 < bbest:
+                    bbest = i1 + i2
+                    bbest1 = i1
+
+            if (lim1 + lim2) - bbest < fbest - (off1 + off2):
+                return fbest1, fbest - fbest1, True, False
+            return bbest1, bbest - bbest1, False, True
+
+def myers(a, a_lo, a_hi, b, b_lo, b_hi, changed_a, changed_b, need_min=False):
+    """git's Myers variant: discard unmatchable lines, then divide and conquer on middle snakes"""
+    # Occurrence counts and limits cover the whole range, before trimming, as in xprepare.c
+    counts_a = {}
+    for i in range(a_lo, a_hi):
+        counts_a[a[i]] = counts_a.get(a[i], 0) + 1
+    counts_b = {}
+    for j in range(b_lo, b_hi):
+        counts_b[b[j]] = counts_b.get(b[j], 0) + 1
+    limit_a = min(_bogosqrt(a_hi - a_lo), _MAX_EQLIMIT)
+    limit_b = min(_bogosqrt(b_hi - b_lo), _MAX_EQLIMIT)
+
+    a_lo, a_hi, b_lo, b_hi = _trim(a, a_lo, a_hi, b, b_lo, b_hi)
+    ha1, index1 = _reduce(a, a_lo, a_hi, counts_b, limit_a, changed_a)
+    ha2, index2 = _reduce(b, b_lo, b_hi, counts_a, limit_b, changed_b)
+
+    n1, n2 = len(ha1), len(ha2)
+    diagonals = n1 + n2 + 3
+    kvdf = [0] * (diagonals + 1)
+    kvdb = [0] * (diagonals + 1)
+    base = n2 + 1
+    mxcost = max(_bogosqrt(diagonals), _MAX_COST_MIN)
+
+    # Iterative version of xdl_recs_cmp
+    stack = [(0, n1, 0, n2, need_min)]
+    while stack:
+        off1, lim1, off2, lim2, minimal = stack.pop()
+        off1, lim1, off2, lim2 = _trim(ha1, off1, lim1, ha2, off2, lim2)
+        if off1 == lim1:
+            for j in range(off2, lim2):
+                changed_b[index2[j]] = 1
+        elif off2 == lim2:
+            for i in range(off1, lim1):
+                changed_a[index1[i]] = 1
+        else:
+            i1, i2, min_lo, min_hi = _split(ha1, off1, lim1, ha2, off2, lim2, kvdf, kvdb, base, minimal, mxcost)
+            stack.append((i1, lim1, i2, lim2, min_hi))
+            stack.append((off1, i1, off2, i2, min_lo))
+
+def patience(a, a_lo, a_hi, b, b_lo, b_hi, changed_a, changed_b):
+    """Patience diff (xpatience.c): anchor on lines unique to both sides, Myers where there are none"""
+    stack = [(a_lo, a_hi, b_lo, b_hi)]
+    while stack:
+        lo1, hi1, lo2, hi2 = stack.pop()
+        if lo1 == hi1 or lo2 == hi2:
+            _mark_range(changed_a, lo1, hi1)
+            _mark_range(changed_b, lo2, hi2)
+            continue
+
+        # First position in a of every line, in order of first appearance; -1 marks "not unique"
+        first_position = {}
+        position_b = {}
+        for i in range(lo1, hi1):
+            line = a[i]
+            if line in first_position:
+                position_b[line] = -1
+            else:
+                first_position[line] = i
+        has_matches = False
+        for j in range(lo2, hi2):
+            line = b[j]
+            if line in first_position:
+                has_matches = True
+                position_b[line] = -1 if line in position_b else j
+
+        if not has_matches:
+            _mark_range(changed_a, lo1, hi1)
+            _mark_range(changed_b, lo2, hi2)
+            continue
+
+        # Longest increasing run of unique common lines, by patience sorting
+        piles = []
+        for line, i in first_position.items():
+            j = position_b.get(line, -1)
+            if j < 0:
+                continue
+            left, right = -1, len(piles)
+            while left + 1 < right:
+                middle = left + (right - left) // 2
+                if piles[middle][1] > j:
+                    right = middle
+                else:
+                    left = middle
+            entry = (i, j, piles[left] if left >= 0 else None)
+            if left + 1 == len(piles):
+                piles.append(entry)
+            else:
+                piles[left + 1] = entry
+
+        if not piles:
+            myers(a, lo1, hi1, b, lo2, hi2, changed_a, changed_b)
+            continue
+
+        anchors = []
+        entry = piles[-1]
+        while entry is not None:
+            anchors.append((entry[0], entry[1]))
+            entry = entry[2]
+        anchors.reverse()
+
+        # Walk the anchors, growing each common run and recursing into the gaps
+        line1, line2 = lo1, lo2
+        index = 0
+        while True:
+            if index < len(anchors):
+                next1, next2 = anchors[index]
+                while next1 > line1 and next2 > line2 and a[next1 - 1] == b[next2 - 1]:
+                    next1 -= 1
+                    next2 -= 1
+            else:
+                next1, next2 = hi1, hi2
+            while line1 < next1 and line2 < next2 and a[line1] == b[line2]:
+                line1 += 1
+                line2 += 1
+
+            if next1 > line1 or next2 > line2:
+                stack.append((line1, next1, line2, next2))
+            if index >= len(anchors):
+                break
+
+            while (index + 1 < len(anchors)
+                   and anchors[index + 1] == (anchors[index][0] + 1, anchors[index][1] + 1)):
+                index += 1
+            line1, line2 = anchors[index][0] + 1, anchors[index][1] + 1
+            index += 1
+
+def _histogram_lcs(a, lo1, hi1, b, lo2, hi2):
+    """Longest common run around the rarest shared lines (find_lcs in xhistogram.c)
+
+    Returns (start_a, end_a, start_b, end_b), None when nothing is shared, or
+    False when every shared line is too common and Myers should take over.
+    """
+    records = {}
+    next_position = {}
+    for position in range(hi1 - 1, lo1 - 1, -1):
+        record = records.get(a[position])
+        if record is None:
+            records[a[position]] = [position, 1]
+            next_position[position] = None
+        else:
+            next_position[position] = record[0]
+            record[0] = position
+            record[1] += 1
+
+    best = None
+    best_span = 0
+    best_count = _HISTOGRAM_MAX_CHAIN + 1
+    has_common = False
+
+    b_position = lo2
+    while b_position < hi2:
+        b_next = b_position + 1
+        record = records.get(b[b_position])
+        if record is not None:
+            has_common = True
+            if record[1] <= best_count:
+                start_a = record[0]
+                while True:
+                    following = next_position[start_a]
+                    start_b = b_position
+                    end_a, end_b = start_a, start_b
+                    count = record[1]
+
+                    while lo1 < start_a and lo2 < start_b and a[start_a - 1] == b[start_b - 1]:
+                        start_a -= 1
+                        start_b -= 1
+                        if count > 1:
+                            count = min(count, records[a[start_a]][1])
+                    while end_a < hi1 - 1 and end_b < hi2 - 1 and a[end_a + 1] == b[end_b + 1]:
+                        end_a += 1
+                        end_b += 1
+                        if count > 1:
+                            count = min(count, records[a[end_a]][1])
+
+                    if b_next <= end_b:
+                        b_next = end_b + 1
+                    if best_span < end_a - start_a or count < best_count:
+                        best = (start_a, end_a + 1, start_b, end_b + 1)
+                        best_span = end_a - start_a
+                        best_count = count
+
+                    # Continue with the next occurrence past the run just found
+                    while following is not None and following <= end_a:
+                        following = next_position[following]
+                    if following is None:
+                        break
+                    start_a = following
+        b_position = b_next
+
+    if has_common and best_count > _HISTOGRAM_MAX_CHAIN:
+        return False
+    return best
+
+def histogram(a, a_lo, a_hi, b, b_lo, b_hi, changed_a, changed_b):
+    """Histogram diff (xhistogram.c): split on the rarest common run, Myers when lines are too common"""
+    stack = [(a_lo, a_hi, b_lo, b_hi)]
+    while stack:
+        lo1, hi1, lo2, hi2 = stack.pop()
+        if lo1 == hi1 or lo2 == hi2:
+            _mark_range(changed_a, lo1, hi1)
+            _mark_range(changed_b, lo2, hi2)
+            continue
+
+        run = _histogram_lcs(a, lo1, hi1, b, lo2, hi2)
+        if run is False:
+            myers(a, lo1, hi1, b, lo2, hi2, changed_a, changed_b)
+        elif run is None:
+            _mark_range(changed_a, lo1, hi1)
+            _mark_range(changed_b, lo2, hi2)
+        else:
+            start_a, end_a, start_b, end_b = run
+            stack.append((end_a, hi1, end_b, hi2))
+            stack.append((lo1, start_a, lo2, start_b))
+
+ALGORITHMS = {
+    'myers': myers,
+    'patience': patience,
+    'histogram': histogram,
+}
+
+def register_algorithm(name, function):
+    """Plug in another algorithm with the same (a, a_lo, a_hi, b, b_lo, b_hi, changed_a, changed_b) signature"""
+    ALGORITHMS[name] = function
+
+def diff_sequences(a, b, algorithm=DEFAULT_ALGORITHM, old=None, new=None):
+    """Diff two sequences of interned line IDs, returning the changed-line markers for each side
+
+    When the LineFiles are given, change groups are positioned with git's indent heuristic.
+    """
+    try:
+        run = ALGORITHMS[algorithm]
+    except KeyError:
+        raise ValueError(f"Unknown diff algorithm: {algorithm} (choose from {', '.join(sorted(ALGORITHMS))})")
+
+    changed_a = bytearray(len(a))
+    changed_b = bytearray(len(b))
+    run(a, 0, len(a), b, 0, len(b), changed_a, changed_b)
+
+    # xdiff keeps a zero sentinel on both ends of the change arrays
+    padded_a = bytearray(1) + changed_a + bytearray(1)
+    padded_b = bytearray(1) + changed_b + bytearray(1)
+    _compact_changes(a, padded_a, padded_b, old)
+    _compact_changes(b, padded_b, padded_a, new)
+    return padded_a[1:-1], padded_b[1:-1]
+
+# Group compaction (xdl_change_compact). Change arrays here are padded by one
+# zero on each side, so line i lives at index i + 1.
+
+class _Group:
+    __slots__ = ('start', 'end')
+
+    def __init__(self, changed):
+        self.start = self.end = 0
+        while changed[self.end + 1]:
+            self.end += 1
+
+    def next(self, changed, count):
+        if self.end == count:
+            return False
+        self.start = self.end + 1
+        self.end = self.start
+        while changed[self.end + 1]:
+            self.end += 1
+        return True
+
+    def previous(self, changed):
+        if self.start == 0:
+            return False
+        self.end = self.start - 1
+        self.start = self.end
+        while changed[self.start]:
+            self.start -= 1
+        return True
+
+    def slide_down(self, lines, changed):
+        if self.end < len(lines) and lines[self.start] == lines[self.end]:
+            changed[self.start + 1] = 0
+            changed[self.end + 1] = 1
+            self.start += 1
+            self.end += 1
+            while changed[self.end + 1]:
+                self.end += 1
+            return True
+        return False
+
+    def slide_up(self, lines, changed):
+        if self.start > 0 and lines[self.start - 1] == lines[self.end - 1]:
+            self.start -= 1
+            self.end -= 1
+            changed[self.start + 1] = 1
+            changed[self.end + 1] = 0
+            while changed[self.start]:
+                self.start -= 1
+            return True
+        return False
+
+# Indent heuristic weights from xdiffi.c
+_START_OF_FILE_PENALTY = 1
+_END_OF_FILE_PENALTY = 21
+_TOTAL_BLANK_WEIGHT = -30
+_POST_BLANK_WEIGHT = 6
+_RELATIVE_INDENT_PENALTY = -4
+_RELATIVE_INDENT_WITH_BLANK_PENALTY = 10
+_RELATIVE_OUTDENT_PENALTY = 24
+_RELATIVE_OUTDENT_WITH_BLANK_PENALTY = 17
+_RELATIVE_DEDENT_PENALTY = 23
+_RELATIVE_DEDENT_WITH_BLANK_PENALTY = 17
+_INDENT_WEIGHT = 60
+_INDENT_HEURISTIC_MAX_SLIDING = 100
+_MAX_INDENT = 200
+_MAX_BLANKS = 20
+
+def _get_indent(line):
+    """Indentation width of a line, or -1 if it is blank"""
+    indent = 0
+    for char in line:
+        if char not in b' \t\n\r\v\f':
+            return indent
+        if char == 0x20:
+            indent += 1
+        elif char == 0x09:
+            indent += 8 - indent % 8
+        if indent >= _MAX_INDENT:
+            return _MAX_INDENT
+    return -1
+
+def _split_score(line_file, count, split, score):
+    """Add the badness of splitting before line `split` to score = [effective_indent, penalty]"""
+    end_of_file = split >= count
+    indent = -1 if end_of_file else _get_indent(line_file.line(split))
+
+    pre_blank, pre_indent = 0, -1
+    for i in range(split - 1, -1, -1):
+        pre_indent = _get_indent(line_file.line(i))
+        if pre_indent != -1:
+            break
+        pre_blank += 1
+        if pre_blank == _MAX_BLANKS:
+            pre_indent = 0
+            break
+
+    post_blank, post_indent = 0, -1
+    for i in range(split + 1, count):
+        post_indent = _get_indent(line_file.line(i))
+        if post_indent != -1:
+            break
+        post_blank += 1
+        if post_blank == _MAX_BLANKS:
+            post_indent = 0
+            break
+
+    if pre_indent == -1 and pre_blank == 0:
+        score[1] += _START_OF_FILE_PENALTY
+    if end_of_file:
+        score[1] += _END_OF_FILE_PENALTY
+
+    post_blank = 1 + post_blank if indent == -1 else 0
+    total_blank = pre_blank + post_blank
+    score[1] += _TOTAL_BLANK_WEIGHT * total_blank
+    score[1] += _POST_BLANK_WEIGHT * post_blank
+
+    if indent == -1:
+        indent = post_indent
+    any_blanks = total_blank != 0
+    score[0] += indent
+
+    if indent == -1 or pre_indent == -1:
+        pass
+    elif indent > pre_indent:
+        score[1] += _RELATIVE_INDENT_WITH_BLANK_PENALTY if any_blanks else _RELATIVE_INDENT_PENALTY
+    elif indent == pre_indent:
+        pass
+    elif post_indent != -1 and post_indent > indent:
+        score[1] += _RELATIVE_OUTDENT_WITH_BLANK_PENALTY if any_blanks else _RELATIVE_OUTDENT_PENALTY
+    else:
+        score[1] += _RELATIVE_DEDENT_WITH_BLANK_PENALTY if any_blanks else _RELATIVE_DEDENT_PENALTY
+
+def _score_cmp(first, second):
+    indent_cmp = (first[0] > second[0]) - (first[0] < second[0])
+    return _INDENT_WEIGHT * indent_cmp + (first[1] - second[1])
+
+def _compact_changes(lines, changed, other_changed, line_file=None):
+    """Slide change groups to git's preferred position, merging groups that touch"""
+    count = len(lines)
+    other_count = len(other_changed) - 2
+    group = _Group(changed)
+    other = _Group(other_changed)
+
+    while True:
+        if group.end != group.start:
+            while True:
+                group_size = group.end - group.start
+                end_matching_other = -1
+
+                # Shift the group up as far as possible
+                while group.slide_up(lines, changed):
+                    other.previous(other_changed)
+                earliest_end = group.end
+                if other.end > other.start:
+                    end_matching_other = group.end
+
+                # Then down as far as possible
+                while group.slide_down(lines, changed):
+                    other.next(other_changed, other_count)
+                    if other.end > other.start:
+                        end_matching_other = group.end
+
+                if group_size == group.end - group.start:
+                    break
+
+            if group.end == earliest_end:
+                pass
+            elif end_matching_other != -1:
+                # Line the group up with the last change group in the other file
+                while other.end == other.start:
+                    group.slide_up(lines, changed)
+                    other.previous(other_changed)
+            elif line_file is not None:
+                shift = max(earliest_end, group.end - group_size - 1, group.end - _INDENT_HEURISTIC_MAX_SLIDING)
+                best_shift = -1
+                best_score = None
+                while shift <= group.end:
+                    score = [0, 0]
+                    _split_score(line_file, count, shift, score)
+                    _split_score(line_file, count, shift - group_size, score)
+                    if best_shift == -1 or _score_cmp(score, best_score) <= 0:
+                        best_score = score
+                        best_shift = shift
+                    shift += 1
+
+                while group.end > best_shift:
+                    group.slide_up(lines, changed)
+                    other.previous(other_changed)
+
+        if not group.next(changed, count):
+            break
+        other.next(other_changed, other_count)
+
+def _iter_changes(changed_a, changed_b):
+    """Yield (a_start, a_end, b_start, b_end) for each run of changed lines"""
+    i = j = 0
+    len_a, len_b = len(changed_a), len(changed_b)
+    while i < len_a or j < len_b:
+        if (i < len_a and changed_a[i]) or (j < len_b and changed_b[j]):
+            a_start, b_start = i, j
+            while i < len_a and changed_a[i]:
+                i += 1
+            while j < len_b and changed_b[j]:
+                j += 1
+            yield a_start, i, b_start, j
+        else:
+            i += 1
+            j += 1
+
+def _function_context(line_file, before, limit=-1):
+    """git's default funcname rule: nearest line above `before` starting with a letter, '_' or '$'
+
+    Lines at or above `limit` were already searched for the previous hunk, so
+    the scan stops there and returns None to mean "same as last time".
+    """
+    data, offsets = line_file.data, line_file.offsets
+    for index in range(before - 1, limit, -1):
+        first = data[offsets[index]:offsets[index] + 1]
+        if first.isalpha() or first in (b'_', b'$'):
+            return line_file.line(index)[:_FUNC_CONTEXT_MAX].rstrip().decode('utf-8', errors='replace')
+    return None
+
+def _range_header(start, count):
+    if count == 1:
+        return str(start + 1)
+    if count == 0:
+        return f'{start},0'
+    return f'{start + 1},{count}'
+
+def iter_unified_hunks(old, new, changed_a, changed_b, context=DEFAULT_CONTEXT):
+    """Yield unified diff lines (without trailing newlines) for two LineFiles"""
+    groups = list(_iter_changes(changed_a, changed_b))
+    function_line = ''
+    searched_to = -1
+    index = 0
+    while index < len(groups):
+        # Merge groups separated by at most 2 * context unchanged lines, as git does
+        last = index
+        while last + 1 < len(groups) and groups[last + 1][0] - groups[last][1] <= 2 * context:
+            last += 1
+
+        a_start = max(0, groups[index][0] - context)
+        b_start = max(0, groups[index][2] - context)
+        a_end = min(len(old), groups[last][1] + context)
+        b_end = min(len(new), groups[last][3] + context)
+
+        header = f'@@ -{_range_header(a_start, a_end - a_start)} +{_range_header(b_start, b_end - b_start)} @@'
+        found = _function_context(old, a_start, searched_to)
+        if found is not None:
+            function_line = found
+        searched_to = a_start - 1
+        yield f'{header} {function_line}' if function_line else header
+
+        i, j = a_start, b_start
+        for group in groups[index:last + 1] + [(a_end, a_end, b_end, b_end)]:
+            group_a_start, group_a_end, group_b_start, group_b_end = group
+            while i < group_a_start:
+                yield from _emit_line(' ', old, i)
+                i += 1
+                j += 1
+            for i in range(group_a_start, group_a_end):
+                yield from _emit_line('-', old, i)
+            for j in range(group_b_start, group_b_end):
+                yield from _emit_line('+', new, j)
+            i, j = group_a_end, group_b_end
+
+        index = last + 1
+
+def _emit_line(prefix, line_file, index):
+    raw = line_file.line(index)
+    if raw.endswith(b'\n'):
+        yield prefix + raw[:-1].decode('utf-8', errors='replace')
+    else:
+        yield prefix + raw.decode('utf-8', errors='replace')
+        yield '\\ No newline at end of file'
+
+def _git_path(path, prefix):
+    if path is None:
+        return '/dev/null'
+    return prefix + path.replace(os.sep, '/').lstrip('/')
+
+def unified_diff_files(old_path, new_path, algorithm=DEFAULT_ALGORITHM, context=DEFAULT_CONTEXT,
+                       old_name=None, new_name=None):
+    """Diff two files (None for a missing side) and return git-style unified diff text
+
+    old_name/new_name are the paths shown in the output (default: the file paths).
+    """
+    old_label = None if old_path is None else (old_name or old_path)
+    new_label = None if new_path is None else (new_name or new_path)
+    with LineFile(old_path) as old, LineFile(new_path) as new:
+        same_content = old.same_content(new)
+        if same_content and old.git_mode() == new.git_mode():
+            return ''
+
+        a_name = _git_path(old_label if old_label is not None else new_label, 'a/')
+        b_name = _git_path(new_label if new_label is not None else old_label, 'b/')
+        lines = [f'diff --git {a_name} {b_name}']
+
+        old_mode, new_mode = old.git_mode(), new.git_mode()
+        index_line = f'index {old.blob_id()[:7]}..{new.blob_id()[:7]}'
+        if old_mode is None:
+            lines.append(f'new file mode {new_mode}')
+        elif new_mode is None:
+            lines.append(f'deleted file mode {old_mode}')
+        elif old_mode != new_mode:
+            lines.append(f'old mode {old_mode}')
+            lines.append(f'new mode {new_mode}')
+        else:
+            index_line += f' {old_mode}'
+
+        if same_content:
+            # Mode-only change
+            return '\n'.join(lines) + '\n'
+        lines.append(index_line)
+
+        if old.is_binary() or new.is_binary():
+            lines.append(f"Binary files {_git_path(old_label, 'a/')} and {_git_path(new_label, 'b/')} differ")
+            return '\n'.join(lines) + '\n'
+
+        lines.append(f"--- {_git_path(old_label, 'a/')}")
+        lines.append(f"+++ {_git_path(new_label, 'b/')}")
+
+        old_ids, new_ids = intern_lines(old, new)
+        changed_a, changed_b = diff_sequences(old_ids, new_ids, algorithm, old, new)
+        lines.extend(iter_unified_hunks(old, new, changed_a, changed_b, context))
+        return '\n'.join(lines) + '\n'
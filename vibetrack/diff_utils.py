@@ -1,187 +1,906 @@
-import difflib
+import codecs
+import fnmatch
+import math
+import os
+import re
 import subprocess
+import tempfile
 from rich.text import Text
+from vibetrack.diff_engine import DEFAULT_ALGORITHM, unified_diff_files
+from vibetrack.git_objects import get_object_store
+from vibetrack.repo_context import find_git_dir, find_worktree_root, get_repo_context
+
+DEFAULT_EXTENSIONS = ['.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.h', '.cs', '.php', '.rb', '.go', '.rs', '.swift', '.kt', '.scala', '.md', '.txt', '.json', '.yaml', '.yml', '.xml', '.html', '.css', '.scss', '.sass', '.less']
+
+IGNORE_FILE = ".vibetrackignore"
+
+_GLOB_CHARS = re.compile(r'[*?\[]')
+
+def load_ignore_patterns(ignore_file=IGNORE_FILE):
+    """Read exclude globs from a .vibetrackignore file (gitignore-style, without negation)
+
+    The default file is the one at the top of the work tree, wherever below
+    it the command runs.
+    """
+    if ignore_file == IGNORE_FILE:
+        root = find_worktree_root()
+        if root is not None:
+            ignore_file = os.path.join(root, IGNORE_FILE)
+    if not ignore_file or not os.path.exists(ignore_file):
+        return []
+
+    patterns = []
+    with open(ignore_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('!'):
+                # Re-including files is not supported by git's exclude pathspecs
+                continue
+            patterns.append(line)
+    return patterns
+
+def _glob_to_pathspecs(pattern):
+    """Translate one gitignore-style glob into equivalent git pathspecs"""
+    anchored = pattern.startswith('/')
+    pattern = pattern.strip('/') if pattern.endswith('/') else pattern.lstrip('/')
+    if not pattern:
+        return []
+
+    # Like .gitignore, a pattern without a slash matches at any depth
+    if anchored or '/' in pattern:
+        return [pattern]
+    if pattern.startswith('*'):
+        # '*' already crosses directories in git's default pathspec matching
+        return [pattern]
+    return [pattern, f"*/{pattern}", f"*/{pattern}/*"]
+
+def _pathspec_regex(pathspec):
+    """Regex equivalent of git's default (non-glob) pathspec matching"""
+    if _GLOB_CHARS.search(pathspec):
+        # fnmatch without FNM_PATHNAME: '*' matches '/' too, as in git
+        return fnmatch.translate(pathspec)
+    # A literal pathspec matches the path itself or anything below it
+    return re.escape(pathspec) + r'(?:/.*)?\Z'
+
+class PathFilter:
+    """Include/exclude globs compiled once and shared by git pathspecs and in-process matching"""
+
+    def __init__(self, include=None, exclude=None, ignore_file=IGNORE_FILE):
+        if include is None:
+            include = ['*' + ext for ext in DEFAULT_EXTENSIONS]
+        exclude = list(exclude or []) + load_ignore_patterns(ignore_file)
+
+        self.include = [spec for glob in include for spec in _glob_to_pathspecs(glob)]
+        self.exclude = [spec for glob in exclude for spec in _glob_to_pathspecs(glob)]
+        self._include_re = self._compile(self.include)
+        self._exclude_re = self._compile(self.exclude)
+
+    @classmethod
+    def from_extensions(cls, allowed_extensions, ignore_file=IGNORE_FILE):
+        """Build a filter from the legacy list of allowed extensions"""
+        return cls(include=['*' + ext for ext in allowed_extensions], ignore_file=ignore_file)
+
+    @staticmethod
+    def _compile(pathspecs):
+        if not pathspecs:
+            return None
+        return re.compile('|'.join(f"(?:{_pathspec_regex(spec)})" for spec in pathspecs))
+
+    def matches(self, path):
+        """Check a repository-relative path against the filter"""
+        path = path.replace(os.sep, '/')
+        if path.startswith('./'):
+            path = path[2:]
+        if self._include_re is not None and not self._include_re.match(path):
+            return False
+        if self._exclude_re is not None and self._exclude_re.match(path):
+            return False
+        return True
+
+    def excludes_dir(self, path):
+        """Check whether an exclude rule covers everything below a directory, so a walk can skip it"""
+        if self._exclude_re is None:
+            return False
+        return self._exclude_re.match(path.replace(os.sep, '/') + '/\0') is not None
+
+    def pathspecs(self):
+        """Arguments that make git itself skip filtered-out files
+
+        The specs carry the 'top' magic, so they match repository paths (as
+        matches() does) from any directory of the work tree.
+        """
+        specs = [f":(top){spec}" for spec in self.include] if self.include else [':(top)']
+        specs += [f":(top,exclude){spec}" for spec in self.exclude]
+        return ['--'] + specs
+
+def _resolve_path_filter(path_filter, allowed_extensions):
+    if path_filter is not None:
+        return path_filter
+    if allowed_extensions is not None:
+        return PathFilter.from_extensions(allowed_extensions)
+    return PathFilter()
 
 # Normal mode: Compare two files
-def generate_diff(file_path_old, file_path_new):
-    with open(file_path_old, 'r') as f_old:
-        old_lines = f_old.readlines()
-
-    with open(file_path_new, 'r') as f_new:
-        new_lines = f_new.readlines()
-
-    diff = difflib.unified_diff(
-        old_lines,
-        new_lines,
-        fromfile=file_path_old,
-        tofile=file_path_new,
-        lineterm=''
-    )
+def generate_diff(file_path_old, file_path_new, path_filter=None, algorithm=DEFAULT_ALGORITHM):
+    """Get a git-style unified diff between two files (algorithm: myers, patience or histogram)"""
+    if path_filter is not None and not path_filter.matches(file_path_new):
+        return ''
+
+    return unified_diff_files(file_path_old, file_path_new, algorithm=algorithm)
+
+def _iter_git_lines(args):
+    """Yield decoded output lines of a git command as git produces them"""
+    cmd = ['git'] + list(args)
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for raw_line in process.stdout:
+            yield raw_line.decode('utf-8', errors='replace')
+
+        error_output = process.stderr.read()
+        returncode = process.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd, error_output.decode('utf-8', errors='replace'))
+    finally:
+        # The consumer may stop early; never leave git blocked on a full pipe
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+def _stream_file_diffs(git_args):
+    """Split the output of a diff-producing git command into per-file chunks"""
+    file_lines = []
+    for line in _iter_git_lines(git_args):
+        if line.startswith('diff --git') and file_lines:
+            yield ''.join(file_lines)
+            file_lines = []
+        file_lines.append(line)
+
+    if file_lines:
+        yield ''.join(file_lines)
 
-    return '\n'.join(diff)
+def stream_git_diff(diff_args, allowed_extensions=None, path_filter=None):
+    """Yield the diff of each relevant file, one file at a time, as git produces it"""
+    path_filter = _resolve_path_filter(path_filter, allowed_extensions)
+
+    # Filtering happens inside git through pathspecs, so excluded files are never generated
+    return _stream_file_diffs(['diff'] + list(diff_args) + path_filter.pathspecs())
+
+def stream_commit_diff(commit_hash="HEAD", path_filter=None):
+    """Yield the per-file diff a single commit introduced (against its first parent)"""
+    path_filter = _resolve_path_filter(path_filter, None)
+
+    # Unlike 'git diff <commit>~1 <commit>' this also works for root commits
+    return _stream_file_diffs(
+        ['log', '--no-walk', '--format=', '-p', '-m', '--first-parent', '--no-color', commit_hash]
+        + path_filter.pathspecs()
+    )
 
 # Git mode: Compare two commits
-def generate_git_diff(commit1="HEAD~1", commit2="HEAD", allowed_extensions=None):
-    if allowed_extensions is None:
-        allowed_extensions = ['.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.h', '.cs', '.php', '.rb', '.go', '.rs', '.swift', '.kt', '.scala', '.md', '.txt', '.json', '.yaml', '.yml', '.xml', '.html', '.css', '.scss', '.sass', '.less']
+def generate_git_diff(commit1="HEAD~1", commit2="HEAD", allowed_extensions=None, path_filter=None):
+    return ''.join(stream_git_diff([commit1, commit2], allowed_extensions, path_filter))
 
-    try:
-        diff_output = subprocess.check_output(
-            ['git', 'diff', commit1, commit2],
-            stderr=subprocess.STDOUT
-        ).decode('utf-8')
-    except subprocess.CalledProcessError as e:
-        raise subprocess.CalledProcessError(e.returncode, e.cmd, e.output.decode() if e.output else str(e))
-
-    # Filter only relevant files
-    filtered_diff = []
-    capture = False
-
-    for line in diff_output.splitlines():
-        if line.startswith('diff --git'):
-            capture = False
-            for ext in allowed_extensions:
-                if line.endswith(ext) or (ext + ' ') in line:
-                    capture = True
-                    break
-        if capture:
-            filtered_diff.append(line)
-
-    return '\n'.join(filtered_diff)
-
-def get_pending_changes(allowed_extensions=None):
+def get_pending_changes(allowed_extensions=None, path_filter=None):
     """Get all uncommitted changes (both staged and unstaged)"""
-    if allowed_extensions is None:
-        allowed_extensions = ['.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.h', '.cs', '.php', '.rb', '.go', '.rs', '.swift', '.kt', '.scala', '.md', '.txt', '.json', '.yaml', '.yml', '.xml', '.html', '.css', '.scss', '.sass', '.less']
+    return ''.join(stream_git_diff(['HEAD'], allowed_extensions, path_filter))
 
-    try:
-        # Get diff of all changes (staged + unstaged)
-        diff_output = subprocess.check_output(
-            ['git', 'diff', 'HEAD'],
-            stderr=subprocess.STDOUT
-        ).decode('utf-8')
-    except subprocess.CalledProcessError as e:
-        raise subprocess.CalledProcessError(e.returncode, e.cmd, e.output.decode() if e.output else str(e))
-
-    # Filter only relevant files
-    filtered_diff = []
-    capture = False
-
-    for line in diff_output.splitlines():
-        if line.startswith('diff --git'):
-            capture = False
-            for ext in allowed_extensions:
-                if line.endswith(ext) or (ext + ' ') in line:
-                    capture = True
-                    break
-        if capture:
-            filtered_diff.append(line)
-
-    return '\n'.join(filtered_diff)
-
-def get_staged_changes(allowed_extensions=None):
+def get_staged_changes(allowed_extensions=None, path_filter=None):
     """Get only staged changes"""
-    if allowed_extensions is None:
-        allowed_extensions = ['.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.h', '.cs', '.php', '.rb', '.go', '.rs', '.swift', '.kt', '.scala', '.md', '.txt', '.json', '.yaml', '.yml', '.xml', '.html', '.css', '.scss', '.sass', '.less']
+    return ''.join(stream_git_diff(['--cached'], allowed_extensions, path_filter))
+
+# Parsed diff model: built once, shared by display, reports and analysis
+
+_HUNK_HEADER = r'@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@'
+# Hunk body lines always start with ' ', '+', '-' or '\\', so these headers cannot be confused with content
+_GIT_DIFF_RE = re.compile(r'^(?:diff --git |' + _HUNK_HEADER + ')', re.M)
+# Plain unified diffs (difflib) start each file with a '---'/'+++' pair instead
+_PLAIN_DIFF_RE = re.compile(r'^(?:--- .*\n\+\+\+ |' + _HUNK_HEADER + ')', re.M)
+_GIT_HEADER_SEARCH = re.compile(r'^diff --git ', re.M)
+# Characters (bytes for a SpooledDiff) handed out at a time by iter_text
+TEXT_CHUNK_CHARS = 64 * 1024
+
+class DiffHunk:
+    """One '@@' hunk, stored as offsets into the ParsedDiff buffer"""
+    __slots__ = ('start', 'end', 'old_start', 'old_count', 'new_start', 'new_count', 'added', 'removed')
+
+    def __init__(self, start, end, old_start, old_count, new_start, new_count, added, removed):
+        self.start = start
+        self.end = end
+        self.old_start = old_start
+        self.old_count = old_count
+        self.new_start = new_start
+        self.new_count = new_count
+        self.added = added
+        self.removed = removed
+
+class DiffFile:
+    """One file section of a diff, stored as offsets into the ParsedDiff buffer"""
+    __slots__ = ('start', 'end', 'old_path', 'new_path', 'hunks', 'binary', 'cut')
+
+    def __init__(self, start, end, old_path, new_path, hunks, binary=False):
+        self.start = start
+        self.end = end
+        self.old_path = old_path
+        self.new_path = new_path
+        self.hunks = hunks
+        self.binary = binary
+        # (added, removed, UTF-8 size) of the whole file when the buffer holds only its start (see SpooledDiff)
+        self.cut = None
+
+    @property
+    def path(self):
+        return self.new_path if self.new_path != '/dev/null' else self.old_path
+
+    @property
+    def added(self):
+        if self.cut is not None:
+            return self.cut[0]
+        return sum(hunk.added for hunk in self.hunks)
+
+    @property
+    def removed(self):
+        if self.cut is not None:
+            return self.cut[1]
+        return sum(hunk.removed for hunk in self.hunks)
+
+class ParsedDiff:
+    """A diff parsed once into files and hunks that all point into a single text buffer"""
+    __slots__ = ('text', 'files')
+
+    def __init__(self, text, files):
+        self.text = text
+        self.files = files
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """Build the model from the per-file chunks produced by stream_git_diff
+
+        The model is one buffer that analysis, compaction and reports slice, so
+        the whole diff stays in memory, about twice over while the chunks are
+        joined. That suits one commit or a staged change; SpooledDiff keeps a
+        diff of any size on disk instead.
+        """
+        return parse_diff(''.join(chunks))
+
+    def __str__(self):
+        return self.text
+
+    def __len__(self):
+        return len(self.text)
+
+    def __bool__(self):
+        return bool(self.text.strip())
+
+    def file_text(self, diff_file):
+        return self.text[diff_file.start:diff_file.end]
+
+    def hunk_text(self, hunk):
+        return self.text[hunk.start:hunk.end]
+
+    def iter_file_texts(self):
+        for diff_file in self.files:
+            yield self.file_text(diff_file)
+
+    def iter_text(self, start=0, end=None, size=TEXT_CHUNK_CHARS):
+        """Slices of text[start:end], for writers that take the diff a piece at a time"""
+        end = len(self.text) if end is None else end
+        for offset in range(start, end, size):
+            yield self.text[offset:min(offset + size, end)]
+
+    @property
+    def file_count(self):
+        return len(self.files)
+
+    @property
+    def line_count(self):
+        if not self.text:
+            return 0
+        return self.text.count('\n') + (0 if self.text.endswith('\n') else 1)
+
+    @property
+    def added(self):
+        return sum(diff_file.added for diff_file in self.files)
+
+    @property
+    def removed(self):
+        return sum(diff_file.removed for diff_file in self.files)
+
+    def stats(self):
+        return {
+            "files_changed": self.file_count,
+            "lines": self.line_count,
+            "additions": self.added,
+            "deletions": self.removed
+        }
+
+def _strip_diff_path(path):
+    path = path.split('\t', 1)[0].strip()
+    if len(path) >= 2 and path[0] == '"' and path[-1] == '"':
+        path = path[1:-1]
+    if path.startswith(('a/', 'b/')):
+        path = path[2:]
+    return path
+
+def _parse_file_header(text, start, end):
+    """Read paths and the binary marker from the lines before the first hunk"""
+    old_path = new_path = None
+    binary = False
+    for line in text[start:end].splitlines():
+        if line.startswith('--- '):
+            old_path = _strip_diff_path(line[4:])
+        elif line.startswith('+++ '):
+            new_path = _strip_diff_path(line[4:])
+        elif line.startswith('rename from '):
+            old_path = line[len('rename from '):]
+        elif line.startswith('rename to '):
+            new_path = line[len('rename to '):]
+        elif line.startswith('Binary files ') or line.startswith('GIT binary patch'):
+            binary = True
+        elif line.startswith('diff --git ') and old_path is None:
+            # Fallback for mode-only or binary changes without ---/+++ lines
+            parts = line[len('diff --git '):].split(' b/', 1)
+            if len(parts) == 2:
+                old_path = _strip_diff_path(parts[0])
+                new_path = parts[1]
+    old_path = old_path or new_path or ''
+    new_path = new_path or old_path
+    return old_path, new_path, binary
+
+def parse_diff(text):
+    """Parse unified diff text into a ParsedDiff without copying the text"""
+    files = []
+    file_start = None
+    hunks = []
+    header_end = None
+
+    def close_file(end):
+        if file_start is None:
+            return
+        if hunks:
+            hunks[-1].end = end
+            _count_hunk_lines(text, hunks[-1])
+        old_path, new_path, binary = _parse_file_header(text, file_start, header_end if header_end is not None else end)
+        files.append(DiffFile(file_start, end, old_path, new_path, list(hunks), binary))
+
+    header_re = _GIT_DIFF_RE if _GIT_HEADER_SEARCH.search(text) else _PLAIN_DIFF_RE
+    for match in header_re.finditer(text):
+        position = match.start()
+        if match.group(0).startswith('@@'):
+            if file_start is None:
+                file_start = position
+            if header_end is None:
+                header_end = position
+            if hunks:
+                hunks[-1].end = position
+                _count_hunk_lines(text, hunks[-1])
+            hunks.append(DiffHunk(
+                position, len(text),
+                int(match.group(1)), int(match.group(2) or 1),
+                int(match.group(3)), int(match.group(4) or 1),
+                0, 0
+            ))
+        else:
+            close_file(position)
+            file_start = position
+            hunks = []
+            header_end = None
+
+    close_file(len(text))
+    return ParsedDiff(text, files)
+
+def _count_hunk_lines(text, hunk):
+    """Count added and removed lines of a hunk in C, without slicing the buffer"""
+    body_start = text.find('\n', hunk.start, hunk.end) + 1
+    if body_start <= 0:
+        return
+    # A line starts right after a newline, so search '\n+' / '\n-' from the header's newline
+    hunk.added = text.count('\n+', body_start - 1, hunk.end)
+    hunk.removed = text.count('\n-', body_start - 1, hunk.end)
+
+def as_parsed_diff(diff):
+    """Accept diff text, per-file chunks or an existing ParsedDiff (a SpooledDiff gives its model view)"""
+    if isinstance(diff, ParsedDiff):
+        return diff
+    if isinstance(diff, SpooledDiff):
+        return diff.view
+    if isinstance(diff, str):
+        return parse_diff(diff)
+    return ParsedDiff.from_chunks(diff)
+
+def filter_diff(diff, path_filter):
+    """The files of a diff that pass a PathFilter (by either path, as git's pathspecs do), as a new ParsedDiff"""
+    diff = as_parsed_diff(diff)
+    return parse_diff(''.join(diff.file_text(diff_file) for diff_file in diff.files
+                              if path_filter.matches(diff_file.new_path) or path_filter.matches(diff_file.old_path)))
+
+def read_git_diff(diff_args, path_filter=None):
+    """Stream a git diff straight into a ParsedDiff"""
+    return ParsedDiff.from_chunks(stream_git_diff(diff_args, path_filter=path_filter))
+
+def commit_needs_diff(commit_hash="HEAD", path_filter=None):
+    """False when the shared ObjectStore shows the commit changes no file the filter keeps
 
+    Outside a repository (or for an unknown commit) git is always asked.
+    """
+    if find_git_dir() is None:
+        return True
+    return get_object_store().commit_touches(commit_hash, _resolve_path_filter(path_filter, None)) is not False
+
+def read_commit_diff(commit_hash="HEAD", path_filter=None):
+    """Stream a single commit's diff straight into a ParsedDiff
+
+    Git is only started for commits that touch a file the filter keeps.
+    """
+    if not commit_needs_diff(commit_hash, path_filter):
+        return parse_diff('')
+    return ParsedDiff.from_chunks(stream_commit_diff(commit_hash, path_filter))
+
+# One record per commit in a single 'git log -p' stream: a record separator, the
+# metadata fields separated by unit separators, then the commit's patch
+LOG_RECORD_SEPARATOR = '\x1e'
+_LOG_FIELD = '\x1f'
+_LOG_FORMAT = '--format=%x1e%H%x1f%P%x1f%an%x1f%aI%x1f%B%x1f'
+
+def commit_log_args(revision_range, path_filter=None, max_count=None):
+    """git arguments listing every non-merge commit of a range, oldest first, with its patch"""
+    path_filter = _resolve_path_filter(path_filter, None)
+    args = ['log', '--reverse', '--no-merges', '-p', '--no-color', _LOG_FORMAT]
+    if max_count:
+        args.append(f'--max-count={max_count}')
+    return args + [revision_range] + path_filter.pathspecs()
+
+def parse_log_record(record):
+    """(commit info, ParsedDiff) from one record of a commit_log_args stream"""
+    commit_hash, parents, author, date, message, patch = record.lstrip(LOG_RECORD_SEPARATOR).split(_LOG_FIELD, 5)
+    info = {
+        'hash': commit_hash,
+        'parents': parents.split(),
+        'author': author,
+        'date': date,
+        'message': message.strip(),
+    }
+    return info, parse_diff(patch.lstrip('\n'))
+
+def split_log_records(lines):
+    """Group the lines of a commit_log_args stream into one text per commit"""
+    record = []
+    for line in lines:
+        if line.startswith(LOG_RECORD_SEPARATOR) and record:
+            yield ''.join(record)
+            record = []
+        record.append(line)
+    if record:
+        yield ''.join(record)
+
+def list_commits(revision="HEAD"):
+    """Full SHAs of the non-merge commits reachable from a revision (or in a range A..B), newest first"""
+    output = subprocess.check_output(['git', 'rev-list', '--no-merges', revision, '--'], stderr=subprocess.PIPE)
+    return output.decode('ascii').split()
+
+def stream_commit_log(revision_range, path_filter=None, max_count=None):
+    """Yield (commit info, ParsedDiff) for each commit of a range from one 'git log -p' process"""
+    for record in split_log_records(_iter_git_lines(commit_log_args(revision_range, path_filter, max_count))):
+        yield parse_log_record(record)
+
+# What goes to the model: lockfiles, vendored, generated, minified and binary-ish
+# files are replaced by a one-line summary, and the rest is trimmed to byte budgets
+
+def _env_int(name, default):
     try:
-        # Get diff of staged changes only
-        diff_output = subprocess.check_output(
-            ['git', 'diff', '--cached'],
-            stderr=subprocess.STDOUT
-        ).decode('utf-8')
-    except subprocess.CalledProcessError as e:
-        raise subprocess.CalledProcessError(e.returncode, e.cmd, e.output.decode() if e.output else str(e))
-
-    # Filter only relevant files
-    filtered_diff = []
-    capture = False
-
-    for line in diff_output.splitlines():
-        if line.startswith('diff --git'):
-            capture = False
-            for ext in allowed_extensions:
-                if line.endswith(ext) or (ext + ' ') in line:
-                    capture = True
-                    break
-        if capture:
-            filtered_diff.append(line)
-
-    return '\n'.join(filtered_diff)
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+# Budgets in UTF-8 bytes of diff text; 0 or less disables a budget
+MAX_FILE_BYTES = _env_int('VIBETRACK_MAX_FILE_BYTES', 12000)
+MAX_DIFF_BYTES = _env_int('VIBETRACK_MAX_DIFF_BYTES', 48000)
+# Bytes of file bodies a SpooledDiff keeps for the model: well above MAX_DIFF_BYTES and
+# what chunked analysis sends (VIBETRACK_CHUNK_TOKENS x VIBETRACK_MAX_CHUNKS tokens)
+MODEL_VIEW_BYTES = _env_int('VIBETRACK_MODEL_VIEW_BYTES', 1024 * 1024)
+
+LOCKFILE_NAMES = {
+    'package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml', 'bun.lockb',
+    'poetry.lock', 'Pipfile.lock', 'pdm.lock', 'uv.lock', 'Cargo.lock', 'Gemfile.lock',
+    'composer.lock', 'go.sum', 'mix.lock', 'pubspec.lock', 'Podfile.lock', 'flake.lock',
+    'packages.lock.json', 'gradle.lockfile',
+}
+VENDORED_DIRS = {'vendor', 'vendors', 'node_modules', 'bower_components', 'third_party', 'third-party', 'Pods'}
+_MINIFIED_SUFFIXES = ('.min.js', '.min.mjs', '.min.css', '-min.js', '.bundle.js', '.js.map', '.css.map')
+_GENERATED_SUFFIXES = ('_pb2.py', '_pb2_grpc.py', '.pb.go', '.pb.cc', '.pb.h', '.g.dart', '.freezed.dart',
+                       '.designer.cs', '.generated.cs', '.generated.ts')
+_GENERATED_MARKER = re.compile(r'@generated|do not edit|code generated by|auto-?generated|automatically generated', re.I)
+
+# Cheap content signals, computed on at most _SAMPLE_BYTES of changed lines per file
+_SAMPLE_BYTES = 16384
+_MINIFIED_AVERAGE_LINE = 300
+_MINIFIED_LONGEST_LINE = 2000
+_GENERATED_HEADER_LINES = 10
+_CONTROL_CHAR_RATIO = 0.01
+# Base64 and other packed data: near-random characters with hardly any spaces
+_PACKED_ENTROPY = 5.3
+_PACKED_SPACE_RATIO = 0.02
+
+def _entropy(sample):
+    """Shannon entropy of a string in bits per character"""
+    counts = {}
+    for char in sample:
+        counts[char] = counts.get(char, 0) + 1
+    total = len(sample)
+    return -sum(count / total * math.log2(count / total) for count in counts.values())
+
+def _changed_lines(diff, diff_file):
+    """Added lines (removed ones for a deletion) of a file, up to _SAMPLE_BYTES"""
+    added, removed = [], []
+    size = 0
+    for hunk in diff_file.hunks:
+        for line in diff.hunk_text(hunk).split('\n')[1:]:
+            if line.startswith('+'):
+                added.append(line[1:])
+            elif line.startswith('-'):
+                removed.append(line[1:])
+            else:
+                continue
+            size += len(line)
+            if size > _SAMPLE_BYTES:
+                return added or removed
+    return added or removed
+
+def _path_reason(diff_file):
+    """The part of classify_diff_file that needs only the file's header"""
+    if diff_file.binary:
+        return 'binary'
+
+    path = diff_file.path.replace(os.sep, '/')
+    parts = path.split('/')
+    name = parts[-1]
+    if name in LOCKFILE_NAMES or name.endswith('.lock'):
+        return 'lockfile'
+    if any(part in VENDORED_DIRS for part in parts[:-1]):
+        return 'vendored'
+    if name.endswith(_MINIFIED_SUFFIXES):
+        return 'minified'
+    if name.endswith(_GENERATED_SUFFIXES):
+        return 'generated'
+    return None
+
+def classify_diff_file(diff, diff_file):
+    """Tell why a file's diff is not worth sending to the model, or None if it is
+
+    Returns 'binary', 'lockfile', 'vendored', 'minified' or 'generated'.
+    """
+    reason = _path_reason(diff_file)
+    if reason is not None:
+        return reason
+
+    lines = _changed_lines(diff, diff_file)
+    if not lines:
+        return None
+    sample = '\n'.join(lines)
+
+    control = sum(1 for char in sample if (char < ' ' and char not in '\t\n\r') or char == '\ufffd')
+    if control > len(sample) * _CONTROL_CHAR_RATIO:
+        return 'binary'
+
+    longest = max(len(line) for line in lines)
+    if longest > _MINIFIED_LONGEST_LINE or len(sample) / len(lines) > _MINIFIED_AVERAGE_LINE:
+        return 'minified'
+
+    # Generated files announce themselves in their first lines
+    first_hunk = diff_file.hunks[0]
+    if first_hunk.new_start <= 1 or first_hunk.old_start <= 1:
+        header = diff.hunk_text(first_hunk).split('\n')[1:_GENERATED_HEADER_LINES + 1]
+        if _GENERATED_MARKER.search('\n'.join(header)):
+            return 'generated'
+
+    if len(sample) >= 256 and sample.count(' ') < len(sample) * _PACKED_SPACE_RATIO \
+            and _entropy(sample) > _PACKED_ENTROPY:
+        return 'binary'
+    return None
+
+def _utf8_size(text):
+    return len(text.encode('utf-8'))
+
+def _cut_to_bytes(text, limit):
+    """Longest run of whole lines of text that fits in limit bytes"""
+    cut = text.encode('utf-8')[:limit].decode('utf-8', errors='ignore')
+    newline = cut.rfind('\n')
+    return cut[:newline + 1] if newline >= 0 else ''
+
+class PreparedDiff:
+    """The diff text that is actually sent to the model, with what was left out"""
+    __slots__ = ('text', 'summarized', 'trimmed', 'original_bytes', 'compaction')
+
+    def __init__(self, text, summarized, trimmed, original_bytes, compaction=None):
+        self.text = text
+        # (path, reason) for every file replaced by a summary line
+        self.summarized = summarized
+        # paths of files cut down to the per-file budget
+        self.trimmed = trimmed
+        self.original_bytes = original_bytes
+        # compaction.CompactedDiff of the files that were sent, with the tokens it saved
+        self.compaction = compaction
+
+    def __str__(self):
+        return self.text
+
+    def __bool__(self):
+        return bool(self.text.strip())
+
+    @property
+    def sent_bytes(self):
+        return _utf8_size(self.text)
+
+def _summary_line(diff_file, reason, size):
+    return f"# vibetrack: contents omitted ({reason}): +{diff_file.added} -{diff_file.removed} lines, {size} bytes\n"
+
+def prepare_diff_for_model(diff, max_file_bytes=None, max_total_bytes=None, compact=True):
+    """Replace files the model should not read with summaries, compact the rest and trim it to the budgets"""
+    diff = as_parsed_diff(diff)
+    if max_file_bytes is None:
+        max_file_bytes = MAX_FILE_BYTES
+    if max_total_bytes is None:
+        max_total_bytes = MAX_DIFF_BYTES
+
+    # Classify on the untouched diff: compaction drops the context lines that announce generated files
+    reasons = [classify_diff_file(diff, diff_file) for diff_file in diff.files]
+    # A file cut off before its first hunk (see SpooledDiff) has nothing left to send
+    reasons = [reason or ('over budget' if diff_file.cut is not None and not diff_file.hunks else None)
+               for diff_file, reason in zip(diff.files, reasons)]
+    compaction = None
+    if compact:
+        from vibetrack.compaction import compact_files
+        compaction = compact_files(diff, [f for f, reason in zip(diff.files, reasons) if reason is None],
+                                   token_budget=max(max_total_bytes, 0) // 4)
+
+    parts = []
+    summarized = []
+    trimmed = []
+    total = 0
+    cut_bytes = 0
+    for diff_file, reason in zip(diff.files, reasons):
+        size = _utf8_size(diff.file_text(diff_file))
+        # Bytes the buffer never held, for files a SpooledDiff view cut short
+        not_shown = diff_file.cut[2] - size if diff_file.cut is not None else 0
+        size += not_shown
+        cut_bytes += not_shown
+        if reason is None and compaction is not None:
+            header, body = compaction.parts[diff_file]
+        else:
+            header_end = diff_file.hunks[0].start if diff_file.hunks else diff_file.end
+            header, body = diff.text[diff_file.start:header_end], diff.text[header_end:diff_file.end]
+        file_text = header + body
+
+        if reason is None and 0 < max_file_bytes < _utf8_size(file_text):
+            body = _cut_to_bytes(file_text[len(header):], max(max_file_bytes - _utf8_size(header), 0))
+            not_shown += _utf8_size(file_text) - _utf8_size(header) - _utf8_size(body)
+            file_text = header + body
+        if reason is None and not_shown:
+            file_text += f"# vibetrack: diff trimmed to {_utf8_size(file_text)} bytes ({not_shown} bytes not shown)\n"
+            trimmed.append(diff_file.path)
+        if reason is None and 0 < max_total_bytes < total + _utf8_size(file_text):
+            reason = 'over budget'
+        if reason is not None:
+            file_text = header + _summary_line(diff_file, reason, size)
+            summarized.append((diff_file.path, reason))
+            if diff_file.path in trimmed:
+                trimmed.remove(diff_file.path)
+
+        parts.append(file_text)
+        total += _utf8_size(file_text)
+
+    if not diff.files:
+        parts.append(diff.text)
+    return PreparedDiff(''.join(parts), summarized, trimmed, _utf8_size(diff.text) + cut_bytes, compaction)
+
+# Diffs of any size: the text goes to a temporary file as git produces it, and
+# only what the model can be sent stays in memory
+
+class SpooledFile:
+    """One file of a SpooledDiff: where its text is in the spool (in bytes) and its line counts"""
+    __slots__ = ('start', 'end', 'old_path', 'new_path', 'added', 'removed')
+
+    def __init__(self, start, end, old_path, new_path, added, removed):
+        self.start = start
+        self.end = end
+        self.old_path = old_path
+        self.new_path = new_path
+        self.added = added
+        self.removed = removed
+
+    @property
+    def path(self):
+        return self.new_path if self.new_path != '/dev/null' else self.old_path
+
+class SpooledDiff:
+    """A diff kept in a temporary file, with a bounded ParsedDiff of it for the model
+
+    Files are added one at a time as they stream in, and reports read them
+    back with iter_text(). `view` holds the files' text up to view_bytes in
+    all; a file past that keeps its header and as much of its body as
+    fits, with its real counts and size in DiffFile.cut, and
+    prepare_diff_for_model trims or summarizes it. Lockfiles and other files
+    summarized by their path keep only their header. Memory grows with the
+    number of files, not with the size of their diffs.
+    """
+
+    def __init__(self, chunks=(), view_bytes=None):
+        self.view_bytes = MODEL_VIEW_BYTES if view_bytes is None else view_bytes
+        self.files = []
+        self._spool = tempfile.TemporaryFile(prefix='vibetrack-diff-')
+        self._size = 0
+        self._chars = 0
+        self._newlines = 0
+        self._ends_with_newline = True
+        self._blank = True
+        self._view_texts = []
+        self._view_files = []
+        self._view_chars = 0
+        self._view_bytes_used = 0
+        self._view = None
+        for chunk in chunks:
+            self.add(chunk)
+
+    def close(self):
+        self._spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._chars
+
+    def __bool__(self):
+        return not self._blank
+
+    def add(self, chunk):
+        """Append the diff of one file, as stream_git_diff yields it"""
+        if not chunk:
+            return
+        data = chunk.encode('utf-8')
+        base = self._size
+        # Readers seek around the spool, so always write at its end
+        self._spool.seek(base)
+        self._spool.write(data)
+        self._size += len(data)
+        self._chars += len(chunk)
+        self._newlines += chunk.count('\n')
+        self._ends_with_newline = chunk.endswith('\n')
+        self._blank = self._blank and chunk.isspace()
+
+        def position(offset):
+            return 0 if offset == 0 else len(data) if offset == len(chunk) else _utf8_size(chunk[:offset])
+
+        parsed = parse_diff(chunk)
+        if not parsed.files:
+            self._keep(_cut_to_bytes(chunk[:self._view_room()], self._view_room()), None)
+        for diff_file in parsed.files:
+            start, end = position(diff_file.start), position(diff_file.end)
+            self.files.append(SpooledFile(base + start, base + end, diff_file.old_path, diff_file.new_path,
+                                          diff_file.added, diff_file.removed))
+            size = end - start
+            if _path_reason(diff_file) is None and size <= self._view_room():
+                self._keep(chunk[diff_file.start:diff_file.end], None)
+                continue
+            header_end = diff_file.hunks[0].start if diff_file.hunks else diff_file.end
+            header = chunk[diff_file.start:header_end]
+            room = 0 if _path_reason(diff_file) else max(self._view_room() - _utf8_size(header), 0)
+            body = _cut_to_bytes(chunk[header_end:min(header_end + room, diff_file.end)], room) if room else ''
+            self._keep(header + body, (diff_file.added, diff_file.removed, size))
+
+    def _view_room(self):
+        return max(self.view_bytes - self._view_bytes_used, 0)
+
+    def _keep(self, text, cut):
+        """Add text to the model view, its offsets moved to where it lands in the view's buffer"""
+        piece = parse_diff(text)
+        for diff_file in piece.files:
+            diff_file.start += self._view_chars
+            diff_file.end += self._view_chars
+            for hunk in diff_file.hunks:
+                hunk.start += self._view_chars
+                hunk.end += self._view_chars
+        if cut is not None and piece.files:
+            piece.files[0].cut = cut
+        self._view_texts.append(text)
+        self._view_files.extend(piece.files)
+        self._view_chars += len(text)
+        self._view_bytes_used += _utf8_size(text)
+        self._view = None
+
+    @property
+    def view(self):
+        """The ParsedDiff prepare_diff_for_model and chunked analysis work from"""
+        if self._view is None:
+            self._view = ParsedDiff(''.join(self._view_texts), list(self._view_files))
+        return self._view
+
+    def iter_text(self, start=0, end=None, size=TEXT_CHUNK_CHARS):
+        """The spooled text from byte start to end, read and decoded size bytes at a time"""
+        end = self._size if end is None else end
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        while start < end:
+            self._spool.seek(start)
+            data = self._spool.read(min(size, end - start))
+            if not data:
+                break
+            start += len(data)
+            text = decoder.decode(data)
+            if text:
+                yield text
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+    @property
+    def added(self):
+        return sum(spooled_file.added for spooled_file in self.files)
+
+    @property
+    def removed(self):
+        return sum(spooled_file.removed for spooled_file in self.files)
+
+    def stats(self):
+        return {
+            "files_changed": len(self.files),
+            "lines": self._newlines + (0 if self._ends_with_newline else 1),
+            "additions": self.added,
+            "deletions": self.removed
+        }
 
 def get_git_status():
     """Get current Git status"""
     try:
-        status_output = subprocess.check_output(
-            ['git', 'status', '--porcelain'],
-            stderr=subprocess.STDOUT
-        ).decode('utf-8')
-        
-        if not status_output.strip():
-            return None
-            
-        # Parse status output
-        status_lines = []
-        for line in status_output.strip().split('\n'):
-            if line:
-                status = line[:2]
-                filename = line[3:]
-                
-                if status == '??':
-                    status_lines.append(f"🆕 [red]New file:[/red] {filename}")
-                elif status[0] == 'M':
-                    status_lines.append(f"📝 [yellow]Modified (staged):[/yellow] {filename}")
-                elif status[1] == 'M':
-                    status_lines.append(f"📝 [blue]Modified (unstaged):[/blue] {filename}")
-                elif status[0] == 'A':
-                    status_lines.append(f"➕ [green]Added:[/green] {filename}")
-                elif status[0] == 'D':
-                    status_lines.append(f"❌ [red]Deleted:[/red] {filename}")
-                elif status[0] == 'R':
-                    status_lines.append(f"🔄 [cyan]Renamed:[/cyan] {filename}")
-                else:
-                    status_lines.append(f"❓ [dim]Unknown status ({status}):[/dim] {filename}")
-        
-        return '\n'.join(status_lines)
-        
+        entries = get_repo_context().entries
     except subprocess.CalledProcessError:
         return "❌ Error getting Git status"
 
+    if not entries:
+        return None
+
+    status_lines = []
+    for entry in entries:
+        status = entry.code
+        filename = entry.display_path
+
+        if status == '??':
+            status_lines.append(f"🆕 [red]New file:[/red] {filename}")
+        elif status[0] == 'M':
+            status_lines.append(f"📝 [yellow]Modified (staged):[/yellow] {filename}")
+        elif status[1] == 'M':
+            status_lines.append(f"📝 [blue]Modified (unstaged):[/blue] {filename}")
+        elif status[0] == 'A':
+            status_lines.append(f"➕ [green]Added:[/green] {filename}")
+        elif status[0] == 'D':
+            status_lines.append(f"❌ [red]Deleted:[/red] {filename}")
+        elif status[0] == 'R':
+            status_lines.append(f"🔄 [cyan]Renamed:[/cyan] {filename}")
+        else:
+            status_lines.append(f"❓ [dim]Unknown status ({status}):[/dim] {filename}")
+
+    return '\n'.join(status_lines)
+
 def get_current_branch():
     """Get current Git branch"""
     try:
-        branch_output = subprocess.check_output(
-            ['git', 'branch', '--show-current'],
-            stderr=subprocess.STDOUT
-        ).decode('utf-8').strip()
-        
-        return branch_output if branch_output else "unknown"
-        
+        return get_repo_context().branch
     except subprocess.CalledProcessError:
         return "unknown"
 
 def get_recent_commits(count=5):
     """Get recent commits"""
     try:
-        commits_output = subprocess.check_output(
-            ['git', 'log', f'--oneline', f'-{count}'],
-            stderr=subprocess.STDOUT
-        ).decode('utf-8')
-        
-        if not commits_output.strip():
-            return None
-            
-        # Format commits
-        commit_lines = []
-        for line in commits_output.strip().split('\n'):
-            if line:
-                parts = line.split(' ', 1)
-                if len(parts) >= 2:
-                    commit_hash = parts[0]
-                    commit_message = parts[1]
-                    commit_lines.append(f"📝 [cyan]{commit_hash}[/cyan] {commit_message}")
-        
-        return '\n'.join(commit_lines)
-        
+        commits = get_repo_context(count).recent_commits(count)
     except subprocess.CalledProcessError:
         return "❌ Error getting commits"
+
+    if not commits:
+        return None
+
+    # Format commits
+    return '\n'.join(f"📝 [cyan]{commit_hash}[/cyan] {commit_message}" for commit_hash, commit_message in commits)
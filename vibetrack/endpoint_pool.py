@@ -0,0 +1,195 @@
+"""
+Several OpenAI-compatible servers behind one client.
+
+VIBETRACK_API_URL may list more than one chat completions URL, separated by
+commas. Every request goes to the endpoint with the fewest requests in flight
+(VIBETRACK_BALANCE=least-outstanding, the default) or with the lowest expected
+wait, i.e. its observed latency times its queue (VIBETRACK_BALANCE=latency).
+An endpoint that fails twice in a row is ejected, and a background thread
+probes every endpoint's /models route each VIBETRACK_HEALTH_INTERVAL seconds,
+ejecting the ones that stop answering and re-admitting the ones that recover.
+"""
+
+import os
+import threading
+import time
+
+import requests
+
+STRATEGIES = ('least-outstanding', 'latency')
+# Consecutive failed requests before an endpoint is taken out of rotation
+EJECT_AFTER = 2
+# Weight of the newest sample in the latency average
+LATENCY_SMOOTHING = 0.3
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+HEALTH_INTERVAL = _env_float('VIBETRACK_HEALTH_INTERVAL', 10)
+HEALTH_TIMEOUT = _env_float('VIBETRACK_HEALTH_TIMEOUT', 3)
+
+def split_urls(urls):
+    """A list of URLs from a comma-separated string (or a list, unchanged)"""
+    if isinstance(urls, str):
+        urls = urls.split(',')
+    return [url.strip() for url in urls if url and url.strip()]
+
+def health_url(api_url):
+    """The /models route next to a chat completions URL, which every OpenAI-compatible server answers cheaply"""
+    if api_url.rstrip('/').endswith('/chat/completions'):
+        return api_url.rstrip('/')[:-len('/chat/completions')] + '/models'
+    return api_url
+
+class Endpoint:
+    """One server and what has been seen of it"""
+
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.latency = None
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.healthy = True
+        self.ejected_at = None
+
+    def expected_wait(self):
+        # Unmeasured endpoints look fast so that they get tried
+        return (self.latency or 0.0) * (self.outstanding + 1)
+
+    def __repr__(self):
+        state = 'up' if self.healthy else 'ejected'
+        return f'Endpoint({self.url!r}, {state}, outstanding={self.outstanding})'
+
+class EndpointPool:
+    """Routing, passive ejection and active health checks over a set of Endpoints; thread-safe"""
+
+    def __init__(self, urls, strategy=None, health_interval=None, health_timeout=None):
+        urls = split_urls(urls)
+        if not urls:
+            raise ValueError('No model server URL configured')
+        self.endpoints = [Endpoint(url) for url in urls]
+        if strategy is None:
+            # A mistyped setting falls back to the default rather than breaking every request
+            strategy = os.environ.get('VIBETRACK_BALANCE', STRATEGIES[0])
+            strategy = strategy if strategy in STRATEGIES else STRATEGIES[0]
+        self.strategy = strategy
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"Unknown balancing strategy {self.strategy!r}; use one of: {', '.join(STRATEGIES)}")
+        self.health_interval = health_interval if health_interval is not None else HEALTH_INTERVAL
+        self.health_timeout = health_timeout if health_timeout is not None else HEALTH_TIMEOUT
+        self._lock = threading.Lock()
+        self._turn = 0
+        self._stop = threading.Event()
+        self._checker = None
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def _score(self, endpoint):
+        if self.strategy == 'latency':
+            return (endpoint.expected_wait(), endpoint.outstanding)
+        return (endpoint.outstanding, endpoint.latency or 0.0)
+
+    def acquire(self, exclude=()):
+        """Pick an endpoint for one request and count it as in flight
+
+        Endpoints in `exclude` (already tried by this request) and ejected ones
+        are avoided while any other is left. When every endpoint is ejected the
+        request still goes out, to the one ejected longest ago, rather than
+        failing without trying.
+        """
+        if len(self.endpoints) > 1:
+            self._start_checker()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.healthy and e not in exclude]
+            if not candidates:
+                candidates = [e for e in self.endpoints if e.healthy] or \
+                    [min(self.endpoints, key=lambda e: e.ejected_at or 0)]
+            best = min(self._score(e) for e in candidates)
+            tied = [e for e in candidates if self._score(e) == best]
+            # Round-robin between equals, so an idle pool still spreads the load
+            self._turn += 1
+            endpoint = tied[self._turn % len(tied)]
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint, latency=None, failed=False):
+        """End a request on `endpoint`; `latency` (seconds) feeds the latency average"""
+        with self._lock:
+            endpoint.outstanding = max(endpoint.outstanding - 1, 0)
+            if failed:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= EJECT_AFTER and len(self.endpoints) > 1:
+                    self._eject(endpoint)
+                return
+            endpoint.consecutive_failures = 0
+            if latency is not None:
+                if endpoint.latency is None:
+                    endpoint.latency = latency
+                else:
+                    endpoint.latency += LATENCY_SMOOTHING * (latency - endpoint.latency)
+
+    def _eject(self, endpoint):
+        if endpoint.healthy:
+            endpoint.healthy = False
+            endpoint.ejected_at = time.monotonic()
+
+    def _admit(self, endpoint):
+        endpoint.healthy = True
+        endpoint.ejected_at = None
+        endpoint.consecutive_failures = 0
+
+    def check(self, endpoint):
+        """Probe one endpoint now; True when it answers (any status below 500)"""
+        try:
+            response = requests.get(health_url(endpoint.url), timeout=self.health_timeout)
+            alive = response.status_code < 500
+            response.close()
+        except requests.exceptions.RequestException:
+            alive = False
+        with self._lock:
+            if alive:
+                self._admit(endpoint)
+            else:
+                self._eject(endpoint)
+        return alive
+
+    def check_all(self):
+        """Probe every endpoint; returns how many are healthy"""
+        return sum(self.check(endpoint) for endpoint in self.endpoints)
+
+    def _run_checker(self):
+        while not self._stop.wait(self.health_interval):
+            for endpoint in self.endpoints:
+                if self._stop.is_set():
+                    return
+                self.check(endpoint)
+
+    def _start_checker(self):
+        if self._checker is not None or self.health_interval <= 0:
+            return
+        with self._lock:
+            if self._checker is None:
+                self._checker = threading.Thread(target=self._run_checker, name='vibetrack-health', daemon=True)
+                self._checker.start()
+
+    def close(self):
+        self._stop.set()
+
+    def snapshot(self):
+        """Per-endpoint state for display: url, healthy, outstanding, requests, failures, latency"""
+        with self._lock:
+            return [{
+                'url': e.url,
+                'healthy': e.healthy,
+                'outstanding': e.outstanding,
+                'requests': e.requests,
+                'failures': e.failures,
+                'latency': e.latency,
+            } for e in self.endpoints]
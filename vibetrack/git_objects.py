@@ -0,0 +1,326 @@
+"""
+Read git objects through long-lived `git cat-file` processes.
+
+Spawning git for every question (one `git log` for a message, one
+`git diff-tree` for the changed files...) costs a process start each time,
+which dominates when thousands of commits are analyzed. ObjectStore keeps one
+`git cat-file --batch-check` and one `git cat-file --batch` running and talks
+to them over pipes; commits and trees are parsed here and trees are compared
+in-process, skipping every subtree whose id did not change.
+"""
+
+import atexit
+import codecs
+import subprocess
+import threading
+
+from vibetrack.repo_context import find_git_dir
+
+TREE_MODE = '040000'
+
+_stores = {}
+
+class Commit:
+    """A parsed commit object"""
+    __slots__ = ('oid', 'tree', 'parents', 'author', 'author_time', 'committer', 'commit_time', 'message')
+
+    def __init__(self, oid, tree, parents, author, author_time, committer, commit_time, message):
+        self.oid = oid
+        self.tree = tree
+        self.parents = parents
+        self.author = author
+        self.author_time = author_time
+        self.committer = committer
+        self.commit_time = commit_time
+        self.message = message
+
+    @property
+    def subject(self):
+        return self.message.strip().split('\n', 1)[0]
+
+class TreeChange:
+    """One changed path between two trees, with git's A/D/M/T status letters"""
+    __slots__ = ('status', 'old_path', 'new_path', 'old_mode', 'new_mode', 'old_oid', 'new_oid')
+
+    def __init__(self, status, old_path, new_path, old_mode, new_mode, old_oid, new_oid):
+        self.status = status
+        self.old_path = old_path
+        self.new_path = new_path
+        self.old_mode = old_mode
+        self.new_mode = new_mode
+        self.old_oid = old_oid
+        self.new_oid = new_oid
+
+    @property
+    def path(self):
+        return self.new_path if self.new_path is not None else self.old_path
+
+    def __repr__(self):
+        return f'TreeChange({self.status} {self.path})'
+
+def _split_signature(value):
+    """'Name <email> 1700000000 +0100' -> ('Name <email>', 1700000000)"""
+    identity, _, rest = value.rpartition('> ')
+    timestamp = rest.split(' ', 1)[0]
+    try:
+        return identity + '>', int(timestamp)
+    except ValueError:
+        return value, 0
+
+def parse_commit(oid, raw):
+    """Parse the body of a commit object"""
+    header, _, message = raw.partition(b'\n\n')
+    fields = {}
+    parents = []
+    key = None
+    for line in header.split(b'\n'):
+        if line.startswith(b' ') and key is not None:
+            # Continuation of a multi-line header such as gpgsig
+            continue
+        key, _, value = line.partition(b' ')
+        if key == b'parent':
+            parents.append(value.decode('ascii'))
+        elif key not in fields:
+            fields[key] = value
+
+    encoding = fields.get(b'encoding', b'utf-8').decode('ascii', errors='replace')
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding = 'utf-8'
+
+    author, author_time = _split_signature(fields.get(b'author', b'').decode(encoding, errors='replace'))
+    committer, commit_time = _split_signature(fields.get(b'committer', b'').decode(encoding, errors='replace'))
+    return Commit(oid, fields.get(b'tree', b'').decode('ascii'), parents,
+                  author, author_time, committer, commit_time, message.decode(encoding, errors='replace'))
+
+def parse_tree(raw, oid_bytes=20):
+    """Parse a tree object into (mode, name, oid) tuples in git's order"""
+    entries = []
+    position = 0
+    size = len(raw)
+    while position < size:
+        space = raw.index(b' ', position)
+        nul = raw.index(b'\0', space)
+        mode = raw[position:space].decode('ascii').rjust(6, '0')
+        name = raw[space + 1:nul].decode('utf-8', errors='surrogateescape')
+        oid = raw[nul + 1:nul + 1 + oid_bytes].hex()
+        entries.append((mode, name, oid))
+        position = nul + 1 + oid_bytes
+    return entries
+
+def _is_tree(mode):
+    return mode == TREE_MODE
+
+def _sort_key(name, mode):
+    # git orders tree entries as if directory names ended with '/'
+    return name + '/' if _is_tree(mode) else name
+
+class ObjectStore:
+    """Commits, trees and blobs of one repository, served by persistent cat-file processes"""
+
+    def __init__(self, cwd=None):
+        self.cwd = cwd
+        self._batch = None
+        self._check = None
+        self._lock = threading.Lock()
+        self._trees = {}
+        self.requests = 0
+
+    # Process management
+
+    def _start(self, option):
+        return subprocess.Popen(['git', 'cat-file', option], cwd=self.cwd,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def _ask(self, process, rev):
+        if '\n' in rev:
+            raise ValueError(f'Invalid revision: {rev!r}')
+        try:
+            process.stdin.write(rev.encode('utf-8') + b'\n')
+            process.stdin.flush()
+            header = process.stdout.readline()
+        except (BrokenPipeError, OSError):
+            header = b''
+        if not header:
+            returncode = process.poll()
+            raise subprocess.CalledProcessError(returncode if returncode is not None else 1, process.args)
+        self.requests += 1
+        parts = header.split()
+        if len(parts) != 3 or parts[1] in (b'missing', b'ambiguous'):
+            return None
+        return parts[0].decode('ascii'), parts[1].decode('ascii'), int(parts[2])
+
+    def close(self):
+        """Stop the cat-file processes (they are restarted on the next request)"""
+        with self._lock:
+            for process in (self._batch, self._check):
+                if process is not None and process.poll() is None:
+                    process.stdin.close()
+                    process.wait()
+            self._batch = self._check = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Raw access
+
+    def info(self, rev):
+        """(oid, type, size) for a revision expression, or None if it does not exist"""
+        with self._lock:
+            if self._check is None or self._check.poll() is not None:
+                self._check = self._start('--batch-check')
+            return self._ask(self._check, rev)
+
+    def resolve(self, rev):
+        found = self.info(rev)
+        return found[0] if found else None
+
+    def read(self, rev):
+        """(oid, type, content bytes) for a revision expression, or None if it does not exist"""
+        with self._lock:
+            if self._batch is None or self._batch.poll() is not None:
+                self._batch = self._start('--batch')
+            found = self._ask(self._batch, rev)
+            if found is None:
+                return None
+            oid, kind, size = found
+            content = self._batch.stdout.read(size)
+            self._batch.stdout.read(1)  # trailing LF
+            return oid, kind, content
+
+    # Typed access
+
+    def read_commit(self, rev='HEAD'):
+        """The parsed commit for a revision expression, or None"""
+        found = self.read(f'{rev}^{{commit}}')
+        if found is None:
+            return None
+        return parse_commit(found[0], found[2])
+
+    def commit_message(self, rev='HEAD'):
+        """Same text as `git log --format=%B -n 1 <rev>`, stripped"""
+        commit = self.read_commit(rev)
+        return commit.message.strip() if commit is not None else None
+
+    def read_tree(self, rev):
+        """Tree entries for a tree id or any revision that peels to a tree"""
+        with self._lock:
+            entries = self._trees.get(rev)
+        if entries is None:
+            found = self.read(rev if _looks_like_oid(rev) else f'{rev}^{{tree}}')
+            if found is None:
+                return None
+            oid, kind, content = found
+            if kind != 'tree':
+                found = self.read(f'{oid}^{{tree}}')
+                if found is None:
+                    return None
+                oid, kind, content = found
+            entries = parse_tree(content, len(oid) // 2)
+            # Trees are immutable, so cache by id (bounded to keep long runs flat)
+            with self._lock:
+                if len(self._trees) > 4096:
+                    self._trees.clear()
+                self._trees[oid] = entries
+        return entries
+
+    def read_blob(self, oid):
+        found = self.read(oid)
+        return found[2] if found is not None else None
+
+    # Tree diff
+
+    def diff_trees(self, old_tree, new_tree, path_filter=None):
+        """Yield TreeChanges between two trees (None for an empty side), recursing only into changed subtrees"""
+        yield from self._diff_level(old_tree, new_tree, '', path_filter)
+
+    def _diff_level(self, old_tree, new_tree, prefix, path_filter):
+        if old_tree == new_tree:
+            return
+        old_entries = {name: (mode, oid) for mode, name, oid in (self.read_tree(old_tree) or [])} if old_tree else {}
+        new_entries = {name: (mode, oid) for mode, name, oid in (self.read_tree(new_tree) or [])} if new_tree else {}
+
+        keys = {}
+        for entries in (old_entries, new_entries):
+            for name, (mode, _) in entries.items():
+                keys.setdefault(name, _sort_key(name, mode))
+
+        for name in sorted(keys, key=keys.get):
+            old, new = old_entries.get(name), new_entries.get(name)
+            if old == new:
+                continue
+            path = prefix + name
+            old_is_tree = old is not None and _is_tree(old[0])
+            new_is_tree = new is not None and _is_tree(new[0])
+
+            if old_is_tree or new_is_tree:
+                # A tree on either side: recurse, and report a blob on the other side on its own
+                if old is not None and not old_is_tree:
+                    yield from self._blob_change('D', path, old, None, path_filter)
+                if new is not None and not new_is_tree:
+                    yield from self._blob_change('A', path, None, new, path_filter)
+                yield from self._diff_level(old[1] if old_is_tree else None,
+                                            new[1] if new_is_tree else None,
+                                            path + '/', path_filter)
+            elif old is None:
+                yield from self._blob_change('A', path, None, new, path_filter)
+            elif new is None:
+                yield from self._blob_change('D', path, old, None, path_filter)
+            else:
+                # Same kind of object (file, symlink, submodule)? Then it is a modification
+                status = 'M' if old[0][:2] == new[0][:2] else 'T'
+                yield from self._blob_change(status, path, old, new, path_filter)
+
+    @staticmethod
+    def _blob_change(status, path, old, new, path_filter):
+        if path_filter is not None and not path_filter.matches(path):
+            return
+        yield TreeChange(status,
+                         path if old is not None else None, path if new is not None else None,
+                         old[0] if old else None, new[0] if new else None,
+                         old[1] if old else None, new[1] if new else None)
+
+    def _commit_trees(self, rev):
+        commit = self.read_commit(rev)
+        if commit is None:
+            return None
+        parent_tree = None
+        if commit.parents:
+            parent = self.read_commit(commit.parents[0])
+            parent_tree = parent.tree if parent is not None else None
+        return parent_tree, commit.tree
+
+    def commit_changes(self, rev='HEAD', path_filter=None):
+        """Files changed by a commit against its first parent (everything for a root commit)"""
+        trees = self._commit_trees(rev)
+        if trees is None:
+            return None
+        return list(self.diff_trees(*trees, path_filter))
+
+    def commit_touches(self, rev='HEAD', path_filter=None):
+        """Whether a commit changes any file the filter keeps (stops at the first), None if rev is unknown"""
+        trees = self._commit_trees(rev)
+        if trees is None:
+            return None
+        return next(self.diff_trees(*trees, path_filter), None) is not None
+
+def _looks_like_oid(rev):
+    return len(rev) in (40, 64) and all(c in '0123456789abcdef' for c in rev)
+
+def get_object_store():
+    """Get the shared ObjectStore of the current repository"""
+    git_dir = find_git_dir()
+    store = _stores.get(git_dir)
+    if store is None:
+        store = ObjectStore()
+        _stores[git_dir] = store
+    return store
+
+@atexit.register
+def _close_stores():
+    for store in _stores.values():
+        store.close()
@@ -0,0 +1,330 @@
+"""
+Analysis history: every saved analysis is a row of one SQLite database
+instead of a file in history/.
+
+Rows are only ever appended; `gc()` is the one way out. Each row holds the report itself (JSON) and the
+columns it is looked up by: when it was made, repository, branch, analysis
+type and commit SHA, all indexed. A `vibetrack log` run adds one row per
+commit, sharing a batch ID. Writers append in one transaction per batch, and
+WAL mode lets concurrent CI jobs append while others read. Markdown, HTML
+and JSON files are exported from a row on demand (`vibetrack history export`).
+The database is VIBETRACK_HISTORY or $XDG_DATA_HOME/vibetrack/history.sqlite
+(~/.local/share by default).
+
+Diffs are kept apart from the reports, in the blobs table: compressed and
+keyed by the SHA-256 of the diff text, so analyzing the same changes again
+stores nothing new. The codec is VIBETRACK_HISTORY_CODEC: zstd when the
+zstandard package is installed (`pip install vibetrack[zstd]`), else zlib;
+lzma packs tighter but writes slower. `gc()` drops old reports and the blobs
+no report refers to any more.
+"""
+
+import hashlib
+import json
+import lzma
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib and lzma come with Python
+    zstandard = None
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS reports (
+        id TEXT PRIMARY KEY,
+        batch TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        repo TEXT NOT NULL,
+        branch TEXT,
+        analysis_type TEXT NOT NULL,
+        commit_hash TEXT,
+        files_changed INTEGER,
+        additions INTEGER,
+        deletions INTEGER,
+        summary TEXT,
+        data TEXT NOT NULL,
+        diff_blob TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS blobs (
+        hash TEXT PRIMARY KEY,
+        codec TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        data BLOB NOT NULL
+    ) WITHOUT ROWID
+    """,
+    'CREATE INDEX IF NOT EXISTS reports_created ON reports (created_at)',
+    'CREATE INDEX IF NOT EXISTS reports_repo_branch ON reports (repo, branch, created_at)',
+    'CREATE INDEX IF NOT EXISTS reports_type ON reports (analysis_type, created_at)',
+    'CREATE INDEX IF NOT EXISTS reports_commit ON reports (commit_hash)',
+    'CREATE INDEX IF NOT EXISTS reports_batch ON reports (batch)',
+]
+# Created after the diff_blob column, which databases from before blobs get added
+_BLOB_INDEX = 'CREATE INDEX IF NOT EXISTS reports_blob ON reports (diff_blob)'
+COLUMNS = ('id', 'batch', 'created_at', 'repo', 'branch', 'analysis_type', 'commit_hash',
+           'files_changed', 'additions', 'deletions', 'summary')
+_RELATIVE_RE = re.compile(r'^(\d+)\s*([mhdw])$')
+_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+# Codec name: (new streaming compressor, decompress); 'none' is used when compressing does not pay
+_CODECS = {
+    'none': (None, bytes),
+    'zlib': (lambda: zlib.compressobj(6), zlib.decompress),
+    'lzma': (lambda: lzma.LZMACompressor(preset=6), lzma.decompress),
+}
+if zstandard is not None:
+    _CODECS['zstd'] = (lambda: zstandard.ZstdCompressor(level=6).compressobj(),
+                       lambda data: zstandard.ZstdDecompressor().decompress(data))
+# Characters of diff encoded, hashed and compressed at a time
+_CHUNK_CHARS = 64 * 1024
+DEFAULT_CODEC = 'zstd' if zstandard is not None else 'zlib'
+
+def default_history_path():
+    """VIBETRACK_HISTORY, else $XDG_DATA_HOME/vibetrack/history.sqlite (~/.local/share by default)"""
+    configured = os.environ.get('VIBETRACK_HISTORY')
+    if configured:
+        return configured
+    base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'vibetrack', 'history.sqlite')
+
+def default_codec():
+    """VIBETRACK_HISTORY_CODEC if it names an available codec, else zstd when installed, else zlib"""
+    configured = os.environ.get('VIBETRACK_HISTORY_CODEC', '').strip().lower()
+    return configured if configured in _CODECS else DEFAULT_CODEC
+
+def _encoded_chunks(diff):
+    """UTF-8 slices of a diff: a str, or a ParsedDiff or SpooledDiff read through its iter_text()"""
+    if isinstance(diff, str):
+        chunks = (diff[start:start + _CHUNK_CHARS] for start in range(0, len(diff), _CHUNK_CHARS))
+    else:
+        chunks = diff.iter_text()
+    for chunk in chunks:
+        yield chunk.encode('utf-8')
+
+def blob_hash(diff):
+    digest = hashlib.sha256()
+    for chunk in _encoded_chunks(diff):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def pack(diff, codec):
+    """(size in bytes, codec actually used, compressed bytes) for a diff, compressed a slice at a time"""
+    if codec == 'none':
+        raw = b''.join(_encoded_chunks(diff))
+        return len(raw), 'none', raw
+    compressor = _CODECS[codec][0]()
+    size = 0
+    parts = []
+    for chunk in _encoded_chunks(diff):
+        size += len(chunk)
+        parts.append(compressor.compress(chunk))
+    parts.append(compressor.flush())
+    packed = b''.join(parts)
+    if len(packed) >= size:
+        raw = b''.join(_encoded_chunks(diff))
+        return len(raw), 'none', raw
+    return size, codec, packed
+
+def unpack(codec, data):
+    if codec not in _CODECS:
+        raise ValueError(f'This history entry is compressed with {codec}; install zstandard to read it')
+    return _CODECS[codec][1](bytes(data)).decode('utf-8')
+
+def parse_time(value):
+    """ISO date/time, or a span back from now ('90m', '12h', '7d', '2w'), as an ISO string"""
+    match = _RELATIVE_RE.match(value.strip())
+    if match:
+        amount, unit = match.groups()
+        return (datetime.now() - timedelta(**{_UNITS[unit]: int(amount)})).isoformat()
+    try:
+        return datetime.fromisoformat(value.strip()).isoformat()
+    except ValueError:
+        raise ValueError(f'{value!r} is neither a date (2024-05-01, 2024-05-01T14:30) nor a span like 12h, 7d or 2w')
+
+class HistoryStore:
+    """Saved analyses, appended by any number of threads and processes"""
+
+    def __init__(self, path=None, codec=None):
+        self.path = path or default_history_path()
+        self.codec = codec or default_codec()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+            columns = {row[1] for row in self._db.execute('PRAGMA table_info(reports)')}
+            if 'diff_blob' not in columns:
+                self._db.execute('ALTER TABLE reports ADD COLUMN diff_blob TEXT')
+            self._db.execute(_BLOB_INDEX)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, row):
+        """Add one analysis (a dict with the COLUMNS and 'data')"""
+        self.append_many([row])
+
+    def append_many(self, rows):
+        """Add analyses in one transaction; the write lock is taken up front so concurrent writers queue
+
+        A report's diff (data['analysis']['diff']) goes to the blobs table, once
+        per distinct diff, and the report keeps its hash. The diff may be text
+        or anything with iter_text(), such as a SpooledDiff, which is then read
+        a slice at a time.
+        """
+        values = []
+        blobs = {}
+        for row in rows:
+            data = row['data']
+            diff = (data.get('analysis') or {}).get('diff')
+            digest = None
+            if diff is not None and len(diff):
+                digest = blob_hash(diff)
+                blobs.setdefault(digest, diff)
+                data = dict(data, analysis=dict(data['analysis'], diff=None))
+            values.append(tuple(row.get(column) for column in COLUMNS)
+                          + (json.dumps(data, ensure_ascii=False, default=str), digest))
+        if not values:
+            return 0
+        with self._lock:
+            known = self._known_blobs(list(blobs))
+            # Compressed outside the transaction, so other writers only wait for the inserts
+            packed = [(digest,) + pack(text, self.codec) for digest, text in blobs.items() if digest not in known]
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                # A gc() that ran since the lookup may have taken diffs we counted on
+                for digest in known - self._known_blobs(list(known)):
+                    packed.append((digest,) + pack(blobs[digest], self.codec))
+                self._db.executemany('INSERT OR IGNORE INTO blobs (hash, size, codec, data) VALUES (?, ?, ?, ?)',
+                                     packed)
+                self._db.executemany(
+                    f"INSERT INTO reports ({', '.join(COLUMNS)}, data, diff_blob) "
+                    f"VALUES ({', '.join('?' * (len(COLUMNS) + 2))})",
+                    values)
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+        return len(values)
+
+    def _known_blobs(self, hashes):
+        known = set()
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            rows = self._db.execute(f"SELECT hash FROM blobs WHERE hash IN ({', '.join('?' * len(batch))})", batch)
+            known.update(row[0] for row in rows)
+        return known
+
+    def blob(self, digest):
+        """The diff text stored under this hash"""
+        with self._lock:
+            row = self._db.execute('SELECT codec, data FROM blobs WHERE hash = ?', (digest,)).fetchone()
+        if row is None:
+            raise KeyError(f'diff {digest} is not in the history (removed by gc?)')
+        return unpack(row[0], row[1])
+
+    def query(self, repo=None, branch=None, analysis_type=None, commit=None, since=None, until=None, limit=50):
+        """Matching analyses, newest first, without their report data"""
+        conditions, parameters = [], []
+        for column, value in (('repo', repo), ('branch', branch), ('analysis_type', analysis_type)):
+            if value:
+                conditions.append(f'{column} = ?')
+                parameters.append(value)
+        if commit:
+            # A range on the indexed column instead of LIKE, which SQLite cannot serve from the index here
+            conditions.append('commit_hash >= ? AND commit_hash < ?')
+            parameters += [commit.lower(), commit.lower() + '~']
+        if since:
+            conditions.append('created_at >= ?')
+            parameters.append(parse_time(since))
+        if until:
+            conditions.append('created_at < ?')
+            parameters.append(parse_time(until))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        limit_clause = f'LIMIT {int(limit)}' if limit else ''
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM reports {where} ORDER BY created_at DESC, id DESC {limit_clause}",
+                parameters).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, report_id):
+        """Every row of the analysis or `vibetrack log` run with this ID (or ID prefix), data included"""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)}, data, diff_blob FROM reports WHERE id = ? OR batch = ? ORDER BY id",
+                (report_id, report_id)).fetchall()
+            if not rows:
+                rows = self._db.execute(
+                    f"SELECT {', '.join(COLUMNS)}, data, diff_blob FROM reports WHERE id >= ? AND id < ? ORDER BY id",
+                    (report_id, report_id + '\uffff')).fetchall()
+                batches = {row['batch'] for row in rows}
+                if len(batches) > 1:
+                    raise ValueError(f'{report_id!r} matches {len(batches)} analyses; give more of the ID')
+        found = []
+        for row in rows:
+            entry = dict(row)
+            entry['data'] = json.loads(entry['data'])
+            digest = entry.pop('diff_blob')
+            if digest:
+                entry['data']['analysis']['diff'] = self.blob(digest)
+            found.append(entry)
+        return found
+
+    def usage(self):
+        """Reports, blobs, diff bytes before and after compression, and the database file's size"""
+        with self._lock:
+            reports = self._db.execute('SELECT COUNT(*) FROM reports').fetchone()[0]
+            blobs, raw, stored = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blobs').fetchone()
+            page_count = self._db.execute('PRAGMA page_count').fetchone()[0]
+            page_size = self._db.execute('PRAGMA page_size').fetchone()[0]
+        return {'reports': reports, 'blobs': blobs, 'diff_bytes': raw, 'stored_bytes': stored,
+                'file_bytes': page_count * page_size}
+
+    def gc(self, before=None, vacuum=True):
+        """Drop reports made before `before` (a date or span, see parse_time), then every diff no report
+        refers to; returns (reports removed, blobs removed)"""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                reports = 0
+                if before:
+                    reports = self._db.execute('DELETE FROM reports WHERE created_at < ?',
+                                               (parse_time(before),)).rowcount
+                blobs = self._db.execute(
+                    'DELETE FROM blobs WHERE NOT EXISTS (SELECT 1 FROM reports WHERE diff_blob = blobs.hash)').rowcount
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+            if vacuum and (reports or blobs):
+                # Give the freed pages back to the file system
+                self._db.execute('VACUUM')
+        return reports, blobs
+
+    def counts(self):
+        """{(repo, analysis type): analyses} for display"""
+        with self._lock:
+            rows = self._db.execute('SELECT repo, analysis_type, COUNT(*) FROM reports GROUP BY repo, analysis_type')
+            return {(repo, analysis_type): count for repo, analysis_type, count in rows}
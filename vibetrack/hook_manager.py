@@ -0,0 +1,734 @@
+"""
+Git hooks backed by a warm background analyzer.
+
+`vibetrack hooks install` writes pre-commit, commit-msg and pre-push hooks
+that run `python -m vibetrack.hook_manager run <hook>`. That client imports
+nothing but the standard library; it hands the hook to a background process
+(one per repository) over a local socket and prints the answer. The
+background process keeps Python, the model client and its connections warm,
+watches .git/index and starts explaining the staged changes as soon as files
+are staged, so by the time `git commit` runs the answer is usually ready.
+
+Every hook has a hard latency budget (VIBETRACK_HOOK_BUDGET, or per hook
+VIBETRACK_HOOK_BUDGET_PRE_COMMIT etc.). When it runs out the hook prints
+what is ready, such as a cached answer, the part streamed so far or the
+local pre-screen, and exits. The analysis finishes in the background, and
+the next hook or `vibetrack hooks status` shows it. The hooks are advisory:
+they never stop a commit or a push. The background process exits after
+VIBETRACK_HOOK_IDLE seconds (30 minutes) without activity.
+"""
+
+import hashlib
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+HOOKS = ('pre-commit', 'commit-msg', 'pre-push')
+# Seconds a hook may take, from the moment git starts it
+BUDGETS = {'pre-commit': 1.0, 'commit-msg': 0.5, 'pre-push': 2.0}
+POLL_INTERVAL = _env_float('VIBETRACK_HOOK_POLL', 0.5)
+IDLE_TIMEOUT = _env_float('VIBETRACK_HOOK_IDLE', 1800)
+# Hook answers are read in a second or two, so they are kept short
+HOOK_MAX_TOKENS = 200
+# A push of more commits is summarized from the pre-screen and the index only
+PUSH_MAX_COMMITS = 50
+# Finished analyses kept in memory for the next hook and `vibetrack hooks status`
+KEEP_JOBS = 32
+
+MARKER = '# vibetrack-hook'
+CHAINED_SUFFIX = '.pre-vibetrack'
+_ZERO_SHA = '0' * 40
+# Time the answer needs to travel back to the hook
+_REPLY_MARGIN = 0.05
+
+def hook_budget(hook):
+    """The hook's latency budget in seconds"""
+    default = _env_float('VIBETRACK_HOOK_BUDGET', BUDGETS.get(hook, 1.0))
+    return _env_float('VIBETRACK_HOOK_BUDGET_' + hook.upper().replace('-', '_'), default)
+
+def _git(*args, cwd=None):
+    return subprocess.run(['git'] + list(args), cwd=cwd, check=True, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE).stdout.decode('utf-8', errors='replace')
+
+def find_repository(cwd=None):
+    """(absolute git dir, worktree root) of the repository at cwd"""
+    git_dir, root = _git('rev-parse', '--absolute-git-dir', '--show-toplevel', cwd=cwd).splitlines()[:2]
+    return git_dir, root
+
+def state_dir(git_dir):
+    return os.path.join(git_dir, 'vibetrack')
+
+def _address(git_dir):
+    """Where the background process listens: a Unix socket path, or a localhost port where there is none"""
+    if hasattr(socket, 'AF_UNIX'):
+        path = os.path.join(state_dir(git_dir), 'hookd.sock')
+        if len(path.encode('utf-8')) < 100:
+            return path
+        # Socket paths are limited to about a hundred bytes
+        import tempfile
+        digest = hashlib.sha1(git_dir.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(tempfile.gettempdir(), f'vibetrack-{os.getuid()}-{digest}.sock')
+    try:
+        with open(os.path.join(state_dir(git_dir), 'hookd.port'), 'r') as f:
+            return ('127.0.0.1', int(f.read().strip()))
+    except (OSError, ValueError):
+        return None
+
+def _connect(git_dir, timeout):
+    address = _address(git_dir)
+    if address is None:
+        raise ConnectionRefusedError('The analyzer is not running')
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.settimeout(max(timeout, 0.01))
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def request(git_dir, message, timeout):
+    """Send one request to the background process and wait at most `timeout` seconds for the reply"""
+    deadline = time.monotonic() + timeout
+    with _connect(git_dir, timeout) as sock:
+        sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        data = b''
+        while not data.endswith(b'\n'):
+            sock.settimeout(max(deadline - time.monotonic(), 0.01))
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data.decode('utf-8'))
+
+def is_running(git_dir):
+    try:
+        return request(git_dir, {'op': 'ping'}, 0.5).get('ok', False)
+    except (OSError, ValueError):
+        return False
+
+def start_daemon(git_dir, root):
+    """Start the background process for a repository, detached from the hook that asked for it"""
+    os.makedirs(state_dir(git_dir), exist_ok=True)
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_parent, env.get('PYTHONPATH')]))
+    # A commit in progress points git at a temporary index; the daemon follows the real one
+    env.pop('GIT_INDEX_FILE', None)
+    with open(os.path.join(state_dir(git_dir), 'hookd.log'), 'ab') as log:
+        subprocess.Popen([sys.executable, '-m', 'vibetrack.hook_manager', 'daemon', git_dir], cwd=root, env=env,
+                         stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, close_fds=True,
+                         start_new_session=True,
+                         creationflags=getattr(subprocess, 'DETACHED_PROCESS', 0) if os.name == 'nt' else 0)
+
+def stop_daemon(git_dir):
+    """Ask the background process to exit; False when none was running"""
+    try:
+        request(git_dir, {'op': 'stop'}, 2)
+        return True
+    except (OSError, ValueError):
+        return False
+
+def daemon_status(git_dir):
+    """The background process's state and recent analyses, or None when it is not running"""
+    try:
+        return request(git_dir, {'op': 'status'}, 2)
+    except (OSError, ValueError):
+        return None
+
+# The hook side: runs in the short-lived process git starts, on the standard library alone
+
+def _strip_message(text):
+    # What git keeps with the default cleanup: no comment lines, no trailing blank lines
+    return '\n'.join(line for line in text.splitlines() if not line.startswith('#')).strip()
+
+def run_hook(hook, args, stdin_text=''):
+    """Run one hook within its budget; always returns 0 (the hooks are advisory)"""
+    started = time.monotonic()
+    deadline = started + hook_budget(hook)
+    try:
+        git_dir, root = find_repository()
+    except (OSError, subprocess.CalledProcessError):
+        return 0
+    message = {'op': 'hook', 'hook': hook, 'args': list(args), 'stdin': stdin_text,
+               'index_file': os.environ.get('GIT_INDEX_FILE')}
+    if hook == 'commit-msg' and args:
+        try:
+            with open(args[0], 'r', encoding='utf-8', errors='replace') as f:
+                message['message'] = _strip_message(f.read())
+        except OSError:
+            return 0
+
+    started_daemon = False
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            sys.stderr.write('vibetrack: the analyzer is starting in the background; '
+                             'the next commit gets its answer\n')
+            return 0
+        try:
+            message['budget'] = max(remaining - _REPLY_MARGIN, 0.0)
+            reply = request(git_dir, message, remaining)
+            break
+        except socket.timeout:
+            sys.stderr.write('vibetrack: out of time; the analysis goes on in the background '
+                             '(see `vibetrack hooks status`)\n')
+            return 0
+        except (OSError, ValueError):
+            if not started_daemon:
+                start_daemon(git_dir, root)
+                started_daemon = True
+            time.sleep(0.05)
+
+    for line in reply.get('lines', []):
+        sys.stderr.write(line + '\n')
+    return 0
+
+# Installing and removing the hook scripts
+
+_SCRIPT = """#!/bin/sh
+{marker} {hook}: installed by `vibetrack hooks install`, removed by `vibetrack hooks uninstall`.
+# Advisory only: it never stops a commit or a push. See VIBETRACK_HOOK_BUDGET for its time limit.
+PYTHONPATH={package_parent}${{PYTHONPATH:+:$PYTHONPATH}}
+export PYTHONPATH
+{body}
+"""
+_BODY = """if [ -x "$0{chained}" ]; then "$0{chained}" "$@" || exit $?; fi
+{python} -m vibetrack.hook_manager run {hook} "$@" || true"""
+# pre-push gets the refs being pushed on stdin, which both hooks need
+_BODY_WITH_STDIN = """input=$(cat)
+if [ -x "$0{chained}" ]; then printf '%s\\n' "$input" | "$0{chained}" "$@" || exit $?; fi
+printf '%s\\n' "$input" | {python} -m vibetrack.hook_manager run {hook} "$@" || true"""
+
+def hooks_dir(cwd=None):
+    """The repository's hooks directory (core.hooksPath when set)"""
+    path = _git('rev-parse', '--git-path', 'hooks', cwd=cwd).strip()
+    return os.path.abspath(os.path.join(cwd or os.getcwd(), path))
+
+def hook_script(hook):
+    body = _BODY_WITH_STDIN if hook == 'pre-push' else _BODY
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return _SCRIPT.format(marker=MARKER, hook=hook, package_parent=shlex.quote(package_parent),
+                          body=body.format(chained=CHAINED_SUFFIX, python=shlex.quote(sys.executable), hook=hook))
+
+def _is_ours(path):
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return MARKER in f.read(4096)
+    except OSError:
+        return False
+
+def install_hooks(hooks=HOOKS, force=False, cwd=None):
+    """Write the hook scripts; returns {hook: 'installed' | 'updated' | 'chained' | 'skipped'}
+
+    An existing hook of someone else's is left alone, unless force is set: it
+    is then renamed to <hook>.pre-vibetrack and run first by ours.
+    """
+    directory = hooks_dir(cwd)
+    os.makedirs(directory, exist_ok=True)
+    outcome = {}
+    for hook in hooks:
+        if hook not in HOOKS:
+            raise ValueError(f"Unknown hook {hook!r}; use one of: {', '.join(HOOKS)}")
+        path = os.path.join(directory, hook)
+        action = 'installed'
+        if os.path.exists(path):
+            if _is_ours(path):
+                action = 'updated'
+            elif force:
+                os.replace(path, path + CHAINED_SUFFIX)
+                action = 'chained'
+            else:
+                outcome[hook] = 'skipped'
+                continue
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(hook_script(hook))
+        os.chmod(path, 0o755)
+        outcome[hook] = action
+    return outcome
+
+def uninstall_hooks(hooks=HOOKS, cwd=None):
+    """Remove our hook scripts and put back the hooks they chained; returns {hook: 'removed' | 'restored' | 'absent'}"""
+    directory = hooks_dir(cwd)
+    outcome = {}
+    for hook in hooks:
+        path = os.path.join(directory, hook)
+        if not _is_ours(path):
+            outcome[hook] = 'absent'
+            continue
+        os.remove(path)
+        outcome[hook] = 'removed'
+        if os.path.exists(path + CHAINED_SUFFIX):
+            os.replace(path + CHAINED_SUFFIX, path)
+            outcome[hook] = 'restored'
+    return outcome
+
+def installed_hooks(cwd=None):
+    """{hook: True when our script is installed}"""
+    directory = hooks_dir(cwd)
+    return {hook: _is_ours(os.path.join(directory, hook)) for hook in HOOKS}
+
+# The background process
+
+def staged_messages(diff_text):
+    """Prompt for the pre-commit hook: what the staged changes do, and anything that looks unfinished"""
+    return [
+        {'role': 'system', 'content': 'You are a senior code reviewer giving feedback in a git hook. Be very brief.'},
+        {'role': 'user', 'content': f"""Staged changes:
+
+{diff_text}
+
+In at most three short sentences, say what these changes do. Then list anything that looks unfinished or
+risky (debug output, TODOs, commented-out code, credentials), or say "Nothing stands out." """}
+    ]
+
+class Job:
+    """One analysis running (or done) in the background process"""
+
+    def __init__(self, key, kind, label):
+        self.key = key
+        self.kind = kind
+        self.label = label
+        self.started = time.time()
+        self.finished = None
+        self.pieces = []
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+    @property
+    def text(self):
+        return ''.join(self.pieces).strip()
+
+    @property
+    def state(self):
+        if not self.done.is_set():
+            return 'running'
+        if self.cancelled:
+            return 'cancelled'
+        return 'failed' if self.error else 'done'
+
+    def as_dict(self):
+        return {'label': self.label, 'kind': self.kind, 'state': self.state,
+                'seconds': (self.finished or time.time()) - self.started,
+                'text': self.error or self.text}
+
+class HookDaemon:
+    """Warm analyzer for one repository, serving hook requests on a local socket"""
+
+    def __init__(self, git_dir):
+        from concurrent.futures import ThreadPoolExecutor
+        from vibetrack.analysis_index import AnalysisIndex
+        from vibetrack.local_client import get_client
+
+        self.git_dir = git_dir
+        self.client = get_client()
+        self.index = AnalysisIndex()
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='vibetrack-hookd')
+        # git reads a hook waits for run apart from the model requests, so they never queue behind them
+        self.readers = ThreadPoolExecutor(max_workers=2, thread_name_prefix='vibetrack-hookd-git')
+        self._staged = None
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.started = time.time()
+        self.last_activity = time.monotonic()
+        self.requests = 0
+        self.server = None
+
+    # Analyses
+
+    def submit(self, key, kind, label, work):
+        """Start `work(job)` unless the same analysis is running or done"""
+        with self._lock:
+            job = self.jobs.get(key)
+            if job is not None and job.state in ('running', 'done'):
+                return job
+            job = Job(key, kind, label)
+            self.jobs[key] = job
+            finished = [k for k, j in self.jobs.items() if j.done.is_set()]
+            for old in finished[:max(len(self.jobs) - KEEP_JOBS, 0)]:
+                del self.jobs[old]
+
+        def run():
+            try:
+                job.result = work(job)
+            except Exception as e:
+                job.error = str(e)
+            finally:
+                job.finished = time.time()
+                job.done.set()
+        self.executor.submit(run)
+        return job
+
+    def _stream(self, job, messages, max_tokens):
+        stream = self.client.stream_chat(messages, temperature=0.3, max_tokens=max_tokens)
+        for piece in stream:
+            job.pieces.append(piece)
+            if job.cancelled:
+                break
+        return job.text
+
+    def staged_diffs(self, index_file=None):
+        """(source files, every file) of the staged changes, from one `git diff --cached`
+
+        The result is kept until the index file changes, so pre-commit and
+        commit-msg of one commit read the staged changes once.
+        """
+        from vibetrack.diff_utils import PathFilter, filter_diff, parse_diff
+
+        path = index_file or os.path.join(self.git_dir, 'index')
+        try:
+            info = os.stat(path)
+            state = (path, info.st_mtime_ns, info.st_size)
+        except OSError:
+            state = None
+        with self._lock:
+            cached = self._staged
+        if state is not None and cached is not None and cached[0] == state:
+            return cached[1]
+
+        env = dict(os.environ, GIT_INDEX_FILE=index_file) if index_file else None
+        output = subprocess.run(['git', 'diff', '--cached', '--no-color'] + PathFilter(include=[]).pathspecs(),
+                                env=env, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout
+        everything = parse_diff(output.decode('utf-8', errors='replace'))
+        diffs = (filter_diff(everything, PathFilter()), everything)
+        if state is not None:
+            with self._lock:
+                self._staged = (state, diffs)
+        return diffs
+
+    def staged_diff(self, index_file=None):
+        """The staged changes as a ParsedDiff (from a temporary index while a commit runs)"""
+        return self.staged_diffs(index_file)[0]
+
+    def _within(self, deadline, function, *args):
+        """function(*args) on a reader thread; raises TimeoutError when it is not done by the deadline
+
+        The work goes on after the deadline, so its result (a started analysis,
+        the cached staged diff) is there for the next hook.
+        """
+        from concurrent.futures import TimeoutError as FutureTimeout
+
+        future = self.readers.submit(function, *args)
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            raise TimeoutError from None
+
+    def analyze_staged(self, index_file=None):
+        """Start explaining the staged changes; None when nothing is staged"""
+        from vibetrack.diff_utils import prepare_diff_for_model
+
+        diff = self.staged_diff(index_file)
+        if not diff:
+            return None
+        key = 'staged:' + hashlib.sha256(diff.text.encode('utf-8')).hexdigest()
+        stats = diff.stats()
+        label = f"staged changes ({stats['files_changed']} files, +{stats['additions']} -{stats['deletions']})"
+        with self._lock:
+            # Only the newest staged state is worth finishing
+            for job in self.jobs.values():
+                if job.kind == 'staged' and job.key != key and not job.done.is_set():
+                    job.cancelled = True
+        return self.submit(key, 'staged', label,
+                           lambda job: self._stream(job, staged_messages(prepare_diff_for_model(diff).text),
+                                                    HOOK_MAX_TOKENS))
+
+    def check_message(self, message, diff):
+        """Start checking a commit message against its changes with the model"""
+        from vibetrack.commit_analyzer import RANGE_MAX_TOKENS, parse_verdict, range_messages
+        from vibetrack.diff_utils import prepare_diff_for_model
+
+        key = 'message:' + hashlib.sha256((message + '\0' + diff.text).encode('utf-8')).hexdigest()
+        subject = message.splitlines()[0] if message else ''
+
+        def work(job):
+            answer = self._stream(job, range_messages(message, prepare_diff_for_model(diff).text), RANGE_MAX_TOKENS)
+            return parse_verdict(answer)
+        return self.submit(key, 'message', f'message: {subject[:60]}', work)
+
+    def check_commit(self, commit_hash, message, diff):
+        """Start checking a commit with the model, recording the verdict in the analysis index like `vibetrack log`"""
+        from vibetrack.commit_analyzer import RANGE_MAX_TOKENS, RANGE_PROMPT_VERSION, _range_kind, parse_verdict, \
+            range_messages
+        from vibetrack.diff_utils import prepare_diff_for_model
+
+        subject = message.splitlines()[0] if message else ''
+
+        def work(job):
+            answer = self._stream(job, range_messages(message, prepare_diff_for_model(diff).text), RANGE_MAX_TOKENS)
+            verdict, analysis = parse_verdict(answer)
+            self.index.record(commit_hash, _range_kind(False), RANGE_PROMPT_VERSION, self.client.model,
+                              {'verdict': verdict, 'analysis': analysis})
+            return verdict, analysis
+        return self.submit('commit:' + commit_hash, 'commit', f'{commit_hash[:8]} {subject[:60]}', work)
+
+    # Hooks
+
+    def pre_commit(self, request, deadline):
+        try:
+            job = self._within(deadline, self.analyze_staged, request.get('index_file'))
+        except TimeoutError:
+            return ['⏳ vibetrack: still reading the staged changes; `vibetrack hooks status` shows the answer']
+        if job is None:
+            return []
+        job.done.wait(max(deadline - time.monotonic(), 0))
+        if job.state == 'done':
+            return ['🔍 vibetrack: ' + line if number == 0 else '   ' + line
+                    for number, line in enumerate(job.text.splitlines() or ['(no answer)'])]
+        if job.state == 'failed':
+            return [f'⚠️  vibetrack: the model could not be reached ({job.error})']
+        partial = ' '.join(job.text.split())
+        lines = [f'🔍 vibetrack: {partial} …'] if partial else []
+        return lines + ['⏳ vibetrack: still analyzing the staged changes; `vibetrack hooks status` shows the answer']
+
+    def commit_msg(self, request, deadline):
+        from vibetrack.prescreen import prescreen
+
+        message = request.get('message') or ''
+        if not message:
+            return []
+        try:
+            diff, everything = self._within(deadline, self.staged_diffs, request.get('index_file'))
+        except TimeoutError:
+            return ['⏳ vibetrack: out of time reading the staged changes; the message was not checked']
+        # Commits that only touch non-source files (a version bump) are screened on all of their files
+        screened = diff if diff else everything
+        if not screened:
+            return []
+        screen = prescreen(message, screened)
+        if screen.confident:
+            return [self._verdict_line(screen.verdict, f'{screen.summary} (local pre-screen)')]
+        if not diff:
+            return []
+        job = self.check_message(message, diff)
+        job.done.wait(max(deadline - time.monotonic(), 0))
+        if job.state == 'done':
+            verdict, analysis = job.result
+            return [self._verdict_line(verdict, ' '.join((analysis or '').split()))]
+        return [f'⏳ vibetrack: pre-screen {screen.score:.2f} is inconclusive; the model is still checking '
+                'the message (`vibetrack hooks status`)']
+
+    def screen_commit(self, commit_hash, message):
+        """(verdict, analysis) from the pre-screen, or the model check it started, or neither for an empty diff
+
+        The commit's diff is read once, with every file; the model sees its source files only.
+        """
+        from vibetrack.diff_utils import PathFilter, filter_diff, read_commit_diff
+        from vibetrack.prescreen import prescreen
+
+        everything = read_commit_diff(commit_hash, PathFilter(include=[]))
+        diff = filter_diff(everything, PathFilter())
+        screen = prescreen(message, diff if diff else everything)
+        if screen.confident:
+            return (screen.verdict, f'{screen.summary} (local pre-screen)'), None
+        if diff:
+            return None, self.check_commit(commit_hash, message, diff)
+        return None, None
+
+    def pre_push(self, request, deadline):
+        from vibetrack.commit_analyzer import RANGE_PROMPT_VERSION, _range_kind
+        from vibetrack.git_objects import get_object_store
+
+        commits = []
+        for line in (request.get('stdin') or '').splitlines():
+            parts = line.split()
+            if len(parts) != 4 or parts[1] == _ZERO_SHA:
+                continue
+            local_sha, remote_sha = parts[1], parts[3]
+            revisions = [local_sha, '--not', '--remotes'] if remote_sha == _ZERO_SHA else [f'{remote_sha}..{local_sha}']
+            for commit_hash in _git('rev-list', '--no-merges', *revisions, '--').split():
+                if commit_hash not in commits:
+                    commits.append(commit_hash)
+        if not commits:
+            return []
+
+        store = get_object_store()
+        stored = self.index.results(commits, _range_kind(False), RANGE_PROMPT_VERSION, self.client.model)
+        verdicts = {}
+        jobs = {}
+        subjects = {}
+        left = []
+        for commit_hash in commits[:PUSH_MAX_COMMITS]:
+            message = store.commit_message(commit_hash)
+            subjects[commit_hash] = message.splitlines()[0] if message else ''
+            if commit_hash in stored:
+                verdicts[commit_hash] = (stored[commit_hash]['verdict'], stored[commit_hash]['analysis'])
+            elif time.monotonic() >= deadline:
+                left.append((commit_hash, message))
+            else:
+                verdict, job = self.screen_commit(commit_hash, message)
+                if verdict is not None:
+                    verdicts[commit_hash] = verdict
+                elif job is not None:
+                    jobs[commit_hash] = job
+        if left:
+            # Out of time: the rest is screened in the background, and the model checks it starts are indexed
+            key = 'push:' + hashlib.sha256(''.join(commit_hash for commit_hash, _ in left).encode('ascii')).hexdigest()
+            self.submit(key, 'push', f'{len(left)} more commits to push',
+                        lambda job: [self.screen_commit(commit_hash, message) for commit_hash, message in left])
+        for commit_hash, job in jobs.items():
+            if job.done.wait(max(deadline - time.monotonic(), 0)) and job.state == 'done':
+                verdicts[commit_hash] = job.result
+
+        counts = {}
+        for verdict, _ in verdicts.values():
+            counts[verdict or 'UNCLEAR'] = counts.get(verdict or 'UNCLEAR', 0) + 1
+        pending = len(commits) - len(verdicts)
+        summary = ', '.join(f'{count} {verdict.lower()}' for verdict, count in sorted(counts.items()))
+        if pending:
+            summary += f"{', ' if summary else ''}{pending} still being checked (`vibetrack log` will reuse them)"
+        lines = [f'📜 vibetrack: {len(commits)} commits to push: {summary}']
+        for commit_hash, (verdict, analysis) in verdicts.items():
+            if verdict in ('MISMATCH', 'PARTIAL'):
+                lines.append(f"   {'❌' if verdict == 'MISMATCH' else '⚠️ '} {commit_hash[:8]} {subjects[commit_hash]}: "
+                             f"{' '.join((analysis or '').split())[:160]}")
+        return lines
+
+    @staticmethod
+    def _verdict_line(verdict, summary):
+        if verdict == 'MATCH':
+            return f'✅ vibetrack: the message fits the changes. {summary}'
+        if verdict == 'MISMATCH':
+            return f'❌ vibetrack: the message does not fit the changes. {summary}'
+        return f'⚠️  vibetrack: the message only partly fits the changes. {summary}'
+
+    def handle(self, request):
+        """Answer one request from a hook or from `vibetrack hooks`"""
+        received = time.monotonic()
+        self.last_activity = received
+        self.requests += 1
+        op = request.get('op')
+        if op == 'ping':
+            return {'ok': True}
+        if op == 'stop':
+            self._stop.set()
+            return {'ok': True}
+        if op == 'status':
+            with self._lock:
+                jobs = sorted(self.jobs.values(), key=lambda job: job.started, reverse=True)
+            return {'ok': True, 'pid': os.getpid(), 'uptime': time.time() - self.started, 'requests': self.requests,
+                    'model': self.client.model, 'jobs': [job.as_dict() for job in jobs]}
+        if op == 'hook':
+            deadline = received + float(request.get('budget', 1.0))
+            handler = {'pre-commit': self.pre_commit, 'commit-msg': self.commit_msg,
+                       'pre-push': self.pre_push}.get(request.get('hook'))
+            if handler is None:
+                return {'ok': False, 'lines': []}
+            try:
+                return {'ok': True, 'lines': handler(request, deadline)}
+            except Exception as e:
+                return {'ok': False, 'lines': [f'⚠️  vibetrack: {e}']}
+        return {'ok': False, 'lines': []}
+
+    # Serving
+
+    def _watch_index(self):
+        """Start on the staged changes as soon as they change, before any hook asks"""
+        path = os.path.join(self.git_dir, 'index')
+        seen = None
+        while not self._stop.wait(POLL_INTERVAL):
+            try:
+                info = os.stat(path)
+                current = (info.st_mtime_ns, info.st_size)
+            except OSError:
+                continue
+            if current != seen:
+                seen = current
+                self.last_activity = time.monotonic()
+                try:
+                    self.analyze_staged()
+                except Exception as e:
+                    print(f'vibetrack-hookd: could not read the staged changes: {e}', flush=True)
+
+    def _serve(self):
+        import socketserver
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                try:
+                    reply = daemon.handle(json.loads(line.decode('utf-8')))
+                except ValueError:
+                    reply = {'ok': False, 'lines': []}
+                try:
+                    self.wfile.write(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b'\n')
+                except OSError:
+                    # The hook ran out of time and left
+                    pass
+
+        address = _address(self.git_dir)
+        if hasattr(socket, 'AF_UNIX'):
+            if os.path.exists(address):
+                os.remove(address)
+            server = socketserver.ThreadingUnixStreamServer(address, Handler)
+        else:
+            server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+            with open(os.path.join(state_dir(self.git_dir), 'hookd.port'), 'w') as f:
+                f.write(str(server.server_address[1]))
+        server.daemon_threads = True
+        self.server = server
+        return server
+
+    def run(self):
+        """Serve until stopped or idle for IDLE_TIMEOUT seconds"""
+        if is_running(self.git_dir):
+            print('vibetrack-hookd: already running', flush=True)
+            return
+        os.makedirs(state_dir(self.git_dir), exist_ok=True)
+        server = self._serve()
+        threading.Thread(target=server.serve_forever, name='vibetrack-hookd-serve', daemon=True).start()
+        threading.Thread(target=self._watch_index, name='vibetrack-hookd-watch', daemon=True).start()
+        print(f'vibetrack-hookd: pid {os.getpid()} serving {self.git_dir}', flush=True)
+        try:
+            while not self._stop.wait(1.0):
+                if time.monotonic() - self.last_activity > IDLE_TIMEOUT:
+                    print('vibetrack-hookd: idle, exiting', flush=True)
+                    break
+        finally:
+            self._stop.set()
+            server.shutdown()
+            server.server_close()
+            if isinstance(server.server_address, str) and os.path.exists(server.server_address):
+                os.remove(server.server_address)
+            self.executor.shutdown(wait=False)
+            self.readers.shutdown(wait=False)
+            self.index.close()
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m vibetrack.hook_manager',
+                                     description='Git hook client and background analyzer')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='run one hook (called by the installed scripts)')
+    run.add_argument('hook', choices=HOOKS)
+    run.add_argument('args', nargs='*')
+    daemon = commands.add_parser('daemon', help='serve the hooks of one repository')
+    daemon.add_argument('git_dir')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        stdin_text = sys.stdin.read() if args.hook == 'pre-push' else ''
+        return run_hook(args.hook, args.args, stdin_text)
+    HookDaemon(os.path.abspath(args.git_dir)).run()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,6 @@
 # vibetrack/local_client.py
 import requests
-import json
-
-API_URL = "http://172.20.10.4:1234/v1/chat/completions"
+from vibetrack.local_client import get_client
 
 def send_to_local_model(diff_text: str) -> str:
     messages = [
@@ -17,22 +15,11 @@ Please explain:
 3. What’s the difference in behavior?"""}
     ]
 
-    payload = {
-        "model": "mistralai/mathstral-7b-v0.1",  # ← نام دقیق مدل لوکال
-        "messages": messages,
-        "temperature": 0.7,
-        "max_tokens": 512
-    }
-
     try:
-        response = requests.post(API_URL, headers={"Content-Type": "application/json"}, data=json.dumps(payload))
-        response.raise_for_status()
-        result = response.json()
-
-        return result["choices"][0]["message"]["content"].strip()
+        return get_client().chat(messages, temperature=0.7, max_tokens=512)
 
     except requests.exceptions.RequestException as e:
         return f"[❌ Error contacting local model] {str(e)}"
 
-    except KeyError:
-        return f"[❌ Invalid response format] {response.text}"
+    except (KeyError, IndexError, ValueError) as e:
+        return f"[❌ Invalid response format] {e!r}"
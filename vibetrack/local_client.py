@@ -1,9 +1,330 @@
-import requests
 import json
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from vibetrack.diff_utils import PreparedDiff, prepare_diff_for_model
+from vibetrack.endpoint_pool import EndpointPool, split_urls
+from vibetrack.response_cache import ResponseCache, cache_key
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
 
-API_URL = "http://172.20.10.4:1234/v1/chat/completions"
+# Endpoint(s) and model of the OpenAI-compatible server, overridable from the environment;
+# several comma-separated URLs are balanced by an EndpointPool
+API_URL = os.environ.get("VIBETRACK_API_URL", "http://172.20.10.4:1234/v1/chat/completions")
+MODEL = os.environ.get("VIBETRACK_MODEL", "mistralai/mathstral-7b-v0.1")
+CONNECT_TIMEOUT = _env_float("VIBETRACK_CONNECT_TIMEOUT", 5)
+READ_TIMEOUT = _env_float("VIBETRACK_READ_TIMEOUT", 300)
+MAX_RETRIES = int(_env_float("VIBETRACK_MAX_RETRIES", 3))
+# Requests the servers are asked to run at once (chunked analysis), and the connection pool size
+CONCURRENCY = max(1, int(_env_float("VIBETRACK_CONCURRENCY", 4 * max(len(split_urls(API_URL)), 1))))
+# Answers are cached on disk unless VIBETRACK_NO_CACHE is set (or --no-cache is passed)
+CACHE_ENABLED = os.environ.get("VIBETRACK_NO_CACHE", "").lower() in ("", "0", "false")
+
+# Overloaded or restarting server: worth another try after a pause
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# The connection broke before or while the answer came: nothing was shown yet, so another try is safe
+RETRY_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError)
+
+class LocalModelClient:
+    """Chat completions over one keep-alive connection pool, with timeouts, jittered retries,
+    failover between the servers of an EndpointPool and an optional ResponseCache in front"""
+
+    def __init__(self, api_url=None, model=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, backoff=0.5, max_backoff=10.0, pool_size=4, cache=None):
+        self.pool = EndpointPool(api_url or API_URL)
+        # The first server, for messages that name one
+        self.api_url = self.pool.endpoints[0].url
+        self.model = model or MODEL
+        self.timeout = (connect_timeout if connect_timeout is not None else CONNECT_TIMEOUT,
+                        read_timeout if read_timeout is not None else READ_TIMEOUT)
+        self.max_retries = max_retries if max_retries is not None else MAX_RETRIES
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retries = 0
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.pool), pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def retry_delay(self, attempt, response=None):
+        """Full-jitter exponential backoff, or the server's Retry-After when it sends one"""
+        if response is not None:
+            try:
+                return min(float(response.headers.get("Retry-After", "")), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def can_fail_over(self, tried):
+        """Whether a healthy server not in `tried` is left"""
+        return any(endpoint.healthy and endpoint not in tried for endpoint in self.pool.endpoints)
+
+    def next_delay(self, attempt, tried, response=None):
+        """No wait when another server can take the request, else retry_delay"""
+        return 0 if self.can_fail_over(tried) else self.retry_delay(attempt, response)
+
+    def post(self, payload, stream=False):
+        """POST a payload, failing over to another server or retrying on connection
+        failures and 429/5xx answers
+
+        A streamed response carries its server as `response.endpoint`, to be
+        released with pool.release once the stream is closed.
+        """
+        attempt = 0
+        tried = []
+        while True:
+            endpoint = self.pool.acquire(exclude=tried)
+            tried.append(endpoint)
+            started = time.perf_counter()
+            try:
+                response = self.session.post(endpoint.url, json=payload, timeout=self.timeout, stream=stream)
+            except RETRY_ERRORS:
+                self.pool.release(endpoint, failed=True)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.next_delay(attempt, tried)
+            except requests.exceptions.ReadTimeout:
+                self.pool.release(endpoint, failed=True)
+                # The server may still be generating: asking it again would only double its
+                # load, so a read timeout is retried only on another server
+                if attempt >= self.max_retries or not self.can_fail_over(tried):
+                    raise
+                delay = 0
+            else:
+                failed = response.status_code in RETRY_STATUSES
+                if not failed or attempt >= self.max_retries:
+                    if stream and response.ok:
+                        response.endpoint = endpoint
+                    else:
+                        self.pool.release(endpoint, time.perf_counter() - started if response.ok else None, failed)
+                    response.raise_for_status()
+                    return response
+                self.pool.release(endpoint, failed=True)
+                response.close()
+                delay = self.next_delay(attempt, tried, response)
+            if delay:
+                time.sleep(delay)
+            attempt += 1
+            self.retries += 1
+
+    def _cache_key(self, messages, temperature, max_tokens):
+        return cache_key(self.model, messages, temperature=temperature, max_tokens=max_tokens)
+
+    def chat(self, messages, temperature=0.7, max_tokens=1024):
+        """Send chat messages and return the completion text"""
+        key = None
+        if self.cache is not None:
+            key = self._cache_key(messages, temperature, max_tokens)
+            entry = self.cache.get(key)
+            if entry is not None:
+                return entry["text"]
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        result = self.post(payload).json()
+        text = result["choices"][0]["message"]["content"].strip()
+        if key is not None and text:
+            self.cache.put(key, text, model=self.model)
+        return text
+
+    def stream_chat(self, messages, temperature=0.7, max_tokens=1024):
+        """Send chat messages with `stream: true` and return a ChatStream of the tokens
+
+        A cached answer comes back as a CachedStream with the same interface.
+        """
+        on_complete = None
+        if self.cache is not None:
+            key = self._cache_key(messages, temperature, max_tokens)
+            entry = self.cache.get(key)
+            if entry is not None:
+                return CachedStream(entry)
+
+            def on_complete(stream):
+                if stream.text:
+                    self.cache.put(key, stream.text, model=self.model, tokens=stream.tokens)
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True
+        }
+        started = time.perf_counter()
+        response = self.post(payload, stream=True)
+
+        def on_close(stream):
+            latency = stream.finished_at - started if stream.complete else None
+            self.pool.release(response.endpoint, latency, failed=not stream.complete)
+        return ChatStream(response, started, on_complete, on_close)
+
+    def close(self):
+        self.pool.close()
+        self.session.close()
+
+class ChatStream:
+    """Text pieces of a streamed (server-sent events) completion, timed as they arrive
+
+    Iterating yields each piece of text as soon as the server sends it. Servers
+    that ignore `stream` and answer with one JSON body are handled too: the
+    whole completion then arrives as a single piece.
+    """
+
+    def __init__(self, response, started=None, on_complete=None, on_close=None):
+        self.response = response
+        self.on_complete = on_complete
+        self.on_close = on_close
+        self.complete = False
+        self.started = started if started is not None else time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.pieces = []
+        self.chunks = 0
+        self.usage_tokens = None
+
+    def _received(self, content):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+        self.pieces.append(content)
+
+    def _events(self):
+        if "application/json" in self.response.headers.get("Content-Type", ""):
+            yield self.response.json()
+            return
+        for line in self.response.iter_lines():
+            # Comments (": keep-alive") and "event:" fields carry no text
+            if not line.startswith(b"data:"):
+                continue
+            data = line[len(b"data:"):].strip()
+            if data == b"[DONE]":
+                return
+            yield json.loads(data)
+
+    def __iter__(self):
+        try:
+            for event in self._events():
+                usage = event.get("usage")
+                if usage and usage.get("completion_tokens"):
+                    self.usage_tokens = usage["completion_tokens"]
+                for choice in event.get("choices") or []:
+                    content = (choice.get("delta") or choice.get("message") or {}).get("content")
+                    if content:
+                        self._received(content)
+                        yield content
+            self.finished_at = time.perf_counter()
+            self.complete = True
+            # Only an answer that arrived in full is worth keeping
+            if self.on_complete is not None:
+                self.on_complete(self)
+        finally:
+            if self.finished_at is None:
+                self.finished_at = time.perf_counter()
+            self.response.close()
+            if self.on_close is not None:
+                self.on_close(self)
+                self.on_close = None
+
+    @property
+    def text(self):
+        return "".join(self.pieces).strip()
+
+    @property
+    def tokens(self):
+        """Completion tokens as reported by the server, else one per streamed chunk"""
+        return self.usage_tokens or self.chunks
+
+    @property
+    def time_to_first_token(self):
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started
+
+    @property
+    def tokens_per_second(self):
+        if self.first_token_at is None or self.finished_at is None:
+            return None
+        generating = self.finished_at - self.first_token_at
+        # The first token is what ended the wait, so it is not counted in the rate
+        return (self.tokens - 1) / generating if generating > 0 and self.tokens > 1 else None
+
+    def stats(self):
+        """Timing of the finished stream, for the console and the saved report"""
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "tokens_per_second": self.tokens_per_second,
+            "tokens": self.tokens,
+            "total_time": (self.finished_at or time.perf_counter()) - self.started
+        }
+
+class CachedStream:
+    """A cached answer behind the ChatStream interface: the whole text arrives at once"""
+
+    def __init__(self, entry):
+        self.started = time.perf_counter()
+        self.entry = entry
+        self.finished_at = None
+
+    def __iter__(self):
+        yield self.entry["text"]
+        self.finished_at = time.perf_counter()
+
+    @property
+    def text(self):
+        return self.entry["text"].strip()
+
+    @property
+    def tokens(self):
+        return self.entry.get("tokens", 0)
+
+    def stats(self):
+        return {
+            "cached": True,
+            "time_to_first_token": None,
+            "tokens_per_second": None,
+            "tokens": self.tokens,
+            "total_time": (self.finished_at or time.perf_counter()) - self.started
+        }
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Get the shared client, so every analysis in the process reuses its connections"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LocalModelClient(pool_size=CONCURRENCY, cache=ResponseCache() if CACHE_ENABLED else None)
+        return _client
+
+def disable_cache():
+    """Always ask the model (the --no-cache option)"""
+    global CACHE_ENABLED
+    with _client_lock:
+        CACHE_ENABLED = False
+        if _client is not None:
+            _client.cache = None
+
+def build_messages(diff_text, persian_mode=False):
+    """The system and user prompts asking the model to explain a diff"""
+    # Accept a PreparedDiff, a ParsedDiff or the per-file chunks produced by diff_utils.stream_git_diff;
+    # anything that is not prepared yet is summarized and trimmed to the size budgets first
+    if isinstance(diff_text, PreparedDiff):
+        diff_text = diff_text.text
+    elif not isinstance(diff_text, str):
+        diff_text = prepare_diff_for_model(diff_text).text
 
-def send_to_local_model(diff_text, persian_mode=False):
     if persian_mode:
         system_prompt = """تو یک برنامه‌نویس باتجربه و مربی کدنویسی هستی. کارت اینه که تغییرات کد رو به زبان ساده و فارسی توضیح بدی. مخصوصاً برای کسایی که vibe coding میکنن و نمیدونن چی عوض شده."""
         
@@ -33,24 +354,23 @@ Please explain clearly:
 
 Make your explanation narrative and easy to understand, not overly technical."""
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
 
-    payload = {
-        "model": "mistralai/mathstral-7b-v0.1",
-        "messages": messages,
-        "temperature": 0.7,
-        "max_tokens": 1024
-    }
+def model_error_message(error, persian_mode=False):
+    if persian_mode:
+        return f"❌ خطا در اتصال به هوش مصنوعی: {str(error)}\n\n💡 احتمالاً سرور AI در دسترس نیست. لطفاً تنظیمات رو چک کن."
+    else:
+        return f"❌ Error connecting to AI: {str(error)}\n\n💡 The AI server might not be available. Please check your configuration."
 
+def send_to_local_model(diff_text, persian_mode=False):
     try:
-        response = requests.post(API_URL, headers={"Content-Type": "application/json"}, data=json.dumps(payload))
-        result = response.json()
-        return result["choices"][0]["message"]["content"].strip()
+        return get_client().chat(build_messages(diff_text, persian_mode), temperature=0.7, max_tokens=1024)
     except Exception as e:
-        if persian_mode:
-            return f"❌ خطا در اتصال به هوش مصنوعی: {str(e)}\n\n💡 احتمالاً سرور AI در دسترس نیست. لطفاً تنظیمات رو چک کن."
-        else:
-            return f"❌ Error connecting to AI: {str(e)}\n\n💡 The AI server might not be available. Please check your configuration."
\ No newline at end of file
+        return model_error_message(e, persian_mode)
+
+def stream_from_local_model(diff_text, persian_mode=False):
+    """Like send_to_local_model, but returns a ChatStream; connection errors are raised"""
+    return get_client().stream_chat(build_messages(diff_text, persian_mode), temperature=0.7, max_tokens=1024)
@@ -1,16 +1,162 @@
+import os
 import sys
 import subprocess
-from vibetrack.diff_utils import generate_diff, generate_git_diff, get_pending_changes, get_staged_changes
-from vibetrack.local_client import send_to_local_model as analyze_diff
-from vibetrack.save_result import save_markdown
+import time
+from vibetrack.diff_utils import SpooledDiff, generate_diff, parse_diff, prepare_diff_for_model, stream_git_diff
+from vibetrack.chunked_analysis import analyze_chunks, needs_chunks, reduce_messages, split_diff
+from vibetrack.local_client import CONCURRENCY, get_client, model_error_message, stream_from_local_model
+from vibetrack.save_result import save_report
+from vibetrack.tree_diff import compare_trees, iter_tree_diffs
 from rich.console import Console
+from rich.live import Live
+from rich.progress import BarColumn, Progress, SpinnerColumn, TextColumn
 from rich.panel import Panel
 from rich.syntax import Syntax
 from rich.text import Text
 
 console = Console()
 
-def analyze_git_diff(commit1: str, commit2: str = "HEAD", save_to_file: bool = True, persian_mode: bool = False):
+def save_analysis(diff, explanation, old_file, new_file, model_stats, analysis_type="diff", persian_mode=False):
+    """Record the analysis in the history, write the files in VIBETRACK_REPORT_FORMATS and show where each went"""
+    report_id, files = save_report(diff, explanation, old_file, new_file, analysis_type, extra_data={"model_stats": model_stats})
+    if persian_mode:
+        console.print(f"\n[bold green]✅ تحلیل در تاریخچه ذخیره شد:[/bold green] [cyan]{report_id}[/cyan]")
+    else:
+        console.print(f"\n[bold green]✅ Analysis saved to history:[/bold green] [cyan]{report_id}[/cyan]")
+    label = "تحلیل ذخیره شد در:" if persian_mode else "Analysis saved to:"
+    for filename in files.values():
+        console.print(f"[bold green]✅ {label}[/bold green] [cyan]{filename}[/cyan]")
+    return report_id, files
+
+def show_diff_stream(file_diffs, title):
+    """Display each file's diff as soon as git produces it, spooling it to disk for the model and the report
+
+    Only the SpooledDiff's model view stays in memory; the report streams the
+    rest back from the spool.
+    """
+    diff = SpooledDiff()
+    for file_diff in file_diffs:
+        diff_panel = Panel(
+            Syntax(file_diff.rstrip('\n'), "diff", theme="monokai", line_numbers=False),
+            title=title,
+            border_style="green",
+            expand=False
+        )
+        console.print(diff_panel)
+        diff.add(file_diff)
+    return diff
+
+def prepare_for_model(diff, persian_mode: bool = False):
+    """Summarize and trim the diff for the model, telling the user what was left out"""
+    return _report_prepared(prepare_diff_for_model(diff), persian_mode)
+
+def _report_prepared(prepared, persian_mode: bool = False):
+    if prepared.summarized or prepared.trimmed:
+        reasons = {}
+        for _, reason in prepared.summarized:
+            reasons[reason] = reasons.get(reason, 0) + 1
+        reason_text = f" ({', '.join(f'{count} {reason}' for reason, count in reasons.items())})" if reasons else ""
+        if persian_mode:
+            console.print(f"✂️  [dim]{prepared.sent_bytes} از {prepared.original_bytes} بایت برای مدل فرستاده شد: "
+                          f"{len(prepared.summarized)} فایل خلاصه شد{reason_text}، {len(prepared.trimmed)} فایل کوتاه شد[/dim]")
+        else:
+            console.print(f"✂️  [dim]Sending {prepared.sent_bytes} of {prepared.original_bytes} bytes to the model: "
+                          f"{len(prepared.summarized)} files summarized{reason_text}, {len(prepared.trimmed)} trimmed[/dim]")
+    compaction = prepared.compaction
+    if compaction is not None and compaction.tokens_saved:
+        collapsed = ', '.join(f"{count} {name}" for name, count in compaction.counts.items() if count)
+        collapsed_text = f"; {collapsed}" if collapsed else ""
+        if persian_mode:
+            console.print(f"🗜️  [dim]فشرده‌سازی: {compaction.tokens_before} → {compaction.tokens_after} توکن "
+                          f"({compaction.tokens_saved} توکن صرفه‌جویی، {compaction.context} خط context{collapsed_text})[/dim]")
+        else:
+            console.print(f"🗜️  [dim]Compacted {compaction.tokens_before} → {compaction.tokens_after} tokens "
+                          f"({compaction.tokens_saved} saved, {compaction.context} context lines{collapsed_text})[/dim]")
+    return prepared
+
+def _stats_line(stats, persian_mode: bool = False):
+    if stats.get("cached"):
+        if persian_mode:
+            return f"[dim]⚡ از کش · {stats['total_time'] * 1000:.0f}ms[/dim]"
+        return f"[dim]⚡ from cache · {stats['total_time'] * 1000:.0f}ms[/dim]"
+    if stats["time_to_first_token"] is None:
+        return None
+    rate = f"{stats['tokens_per_second']:.1f}" if stats["tokens_per_second"] else "-"
+    if persian_mode:
+        return f"[dim]⏱ اولین توکن {stats['time_to_first_token']:.2f}s · {rate} توکن/ثانیه · {stats['tokens']} توکن[/dim]"
+    return f"[dim]⏱ first token {stats['time_to_first_token']:.2f}s · {rate} tok/s · {stats['tokens']} tokens[/dim]"
+
+def show_model_analysis(prompt, persian_mode: bool = False, title=None, border_style="yellow", messages=None):
+    """Stream the model's answer into a live panel as tokens arrive; returns (text, stats)
+
+    The prompt is wrapped in the diff explanation template unless ready-made
+    messages are given. stats holds time to first token and tokens/sec, or is
+    None when the model could not be reached.
+    """
+    if title is None:
+        title = "[bold yellow]🧠 تحلیل هوش مصنوعی[/bold yellow]" if persian_mode else "[bold yellow]🧠 AI Analysis[/bold yellow]"
+
+    def panel(text, subtitle=None):
+        return Panel(text or "[dim]…[/dim]", title=title, subtitle=subtitle, border_style=border_style, expand=False)
+
+    try:
+        if messages is not None:
+            stream = get_client().stream_chat(messages, temperature=0.7, max_tokens=1024)
+        else:
+            stream = stream_from_local_model(prompt, persian_mode=persian_mode)
+        with Live(panel(""), console=console, refresh_per_second=12, vertical_overflow="visible") as live:
+            text = ""
+            for piece in stream:
+                text += piece
+                live.update(panel(text))
+            stats = stream.stats()
+            live.update(panel(stream.text, _stats_line(stats, persian_mode)))
+        return stream.text, stats
+    except Exception as e:
+        explanation = model_error_message(e, persian_mode)
+        console.print(panel(explanation))
+        return explanation, None
+
+def show_chunked_analysis(diff, persian_mode: bool = False):
+    """Map-reduce a diff that is too large for one request: explain chunks in parallel, then merge"""
+    chunks = split_diff(diff)
+    workers = min(CONCURRENCY, len(chunks))
+    if persian_mode:
+        console.print(f"🧩 [dim]تغییرات برای یک درخواست خیلی بزرگه: {len(chunks)} بخش، {workers} تا همزمان تحلیل میشن[/dim]")
+    else:
+        console.print(f"🧩 [dim]Diff is too large for one request: analyzing {len(chunks)} parts, {workers} at a time[/dim]")
+
+    try:
+        with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"), BarColumn(),
+                      TextColumn("{task.completed}/{task.total}"), console=console, transient=True) as progress:
+            task = progress.add_task("🧩 بخش‌ها" if persian_mode else "🧩 Parts", total=len(chunks))
+            started = time.perf_counter()
+            partials = analyze_chunks(chunks, persian_mode, workers,
+                                      on_done=lambda chunk, elapsed: progress.advance(task))
+            map_time = time.perf_counter() - started
+    except Exception as e:
+        explanation = model_error_message(e, persian_mode)
+        console.print(Panel(explanation, border_style="yellow", expand=False))
+        return explanation, None
+
+    explanation, stats = show_model_analysis(None, persian_mode, messages=reduce_messages(chunks, partials, persian_mode))
+    if stats is not None:
+        stats["chunks"] = len(chunks)
+        stats["map_time"] = map_time
+    return explanation, stats
+
+def ask_model(diff, persian_mode: bool = False):
+    """Explain a diff: in one request when it fits the budget, else chunked (map-reduce)"""
+    prepared = prepare_diff_for_model(diff)
+    # A file trimmed to MAX_FILE_BYTES would reach the model as its first few KB only
+    if needs_chunks(prepared):
+        return show_chunked_analysis(diff, persian_mode)
+    explanation, stats = show_model_analysis(_report_prepared(prepared, persian_mode), persian_mode=persian_mode)
+    if stats is not None and prepared.compaction is not None:
+        stats["tokens_saved"] = prepared.compaction.tokens_saved
+    return explanation, stats
+
+def analyze_git_diff(commit1: str, commit2: str = "HEAD", save_to_file: bool = True, persian_mode: bool = False, path_filter=None):
     """Analyze diff between two commits"""
     if persian_mode:
         console.print(f"[bold blue]🔍 دارم تفاوت بین {commit1} و {commit2} رو چک میکنم...[/bold blue]")
@@ -18,8 +164,11 @@ def analyze_git_diff(commit1: str, commit2: str = "HEAD", save_to_file: bool = T
         console.print(f"[bold blue]🔍 Generating git diff between {commit1} and {commit2}...[/bold blue]")
     
     try:
-        diff = generate_git_diff(commit1, commit2)
-        if not diff.strip():
+        # Display each file's diff in a beautiful panel as git streams it
+        diff_stream = stream_git_diff([commit1, commit2], path_filter=path_filter)
+        title = "[bold green]📋 تفاوت‌ها[/bold green]" if persian_mode else "[bold green]📋 Git Diff[/bold green]"
+        diff = show_diff_stream(diff_stream, title)
+        if not diff:
             if persian_mode:
                 console.print("ℹ️  [yellow]هیچ تفاوتی بین این دو کامیت پیدا نشد[/yellow]")
             else:
@@ -29,39 +178,15 @@ def analyze_git_diff(commit1: str, commit2: str = "HEAD", save_to_file: bool = T
         old_file = f"Git: {commit1}"
         new_file = f"Git: {commit2}"
 
-        # Display diff in a beautiful panel
-        title = "[bold green]📋 تفاوت‌ها[/bold green]" if persian_mode else "[bold green]📋 Git Diff[/bold green]"
-        diff_panel = Panel(
-            Syntax(diff, "diff", theme="monokai", line_numbers=False),
-            title=title,
-            border_style="green",
-            expand=False
-        )
-        console.print(diff_panel)
-
         if persian_mode:
             console.print("\n[bold blue]🤖 دارم از هوش مصنوعی میپرسم چی شده...[/bold blue]")
         else:
             console.print("\n[bold blue]🤖 Asking AI to analyze the diff...[/bold blue]")
             
-        explanation = analyze_diff(diff, persian_mode=persian_mode)
-
-        # Display AI explanation in a beautiful panel
-        title = "[bold yellow]🧠 تحلیل هوش مصنوعی[/bold yellow]" if persian_mode else "[bold yellow]🧠 AI Analysis[/bold yellow]"
-        explanation_panel = Panel(
-            explanation,
-            title=title,
-            border_style="yellow",
-            expand=False
-        )
-        console.print(explanation_panel)
+        explanation, model_stats = ask_model(diff, persian_mode)
 
         if save_to_file:
-            filename = save_markdown(diff, explanation, old_file, new_file)
-            if persian_mode:
-                console.print(f"\n[bold green]✅ تحلیل ذخیره شد در:[/bold green] [cyan]{filename}[/cyan]")
-            else:
-                console.print(f"\n[bold green]✅ Analysis saved to:[/bold green] [cyan]{filename}[/cyan]")
+            save_analysis(diff, explanation, old_file, new_file, model_stats, persian_mode=persian_mode)
             
     except subprocess.CalledProcessError as e:
         error_msg = "[bold red]❌ خطای Git:[/bold red]" if persian_mode else "[bold red]❌ Git error:[/bold red]"
@@ -72,7 +197,7 @@ def analyze_git_diff(commit1: str, commit2: str = "HEAD", save_to_file: bool = T
         console.print(f"{error_msg} {e}")
         raise
 
-def analyze_pending_changes(save_to_file: bool = True, persian_mode: bool = False):
+def analyze_pending_changes(save_to_file: bool = True, persian_mode: bool = False, path_filter=None):
     """Analyze all uncommitted changes"""
     if persian_mode:
         console.print("[bold blue]🔍 دارم همه تغییرات uncommitted رو چک میکنم...[/bold blue]")
@@ -80,8 +205,11 @@ def analyze_pending_changes(save_to_file: bool = True, persian_mode: bool = Fals
         console.print("[bold blue]🔍 Analyzing all uncommitted changes...[/bold blue]")
     
     try:
-        diff = get_pending_changes()
-        if not diff.strip():
+        # Display each file's diff in a beautiful panel as git streams it
+        diff_stream = stream_git_diff(['HEAD'], path_filter=path_filter)
+        title = "[bold green]📋 تغییرات Uncommitted[/bold green]" if persian_mode else "[bold green]📋 Uncommitted Changes[/bold green]"
+        diff = show_diff_stream(diff_stream, title)
+        if not diff:
             if persian_mode:
                 console.print("✅ [green]هیچ ت��ییر uncommitted پیدا نشد[/green]")
                 console.print("🎉 [dim]همه چیز تمیزه! کارت تموم شده[/dim]")
@@ -92,46 +220,22 @@ def analyze_pending_changes(save_to_file: bool = True, persian_mode: bool = Fals
         old_file = "Working Directory (before changes)"
         new_file = "Working Directory (current)"
 
-        # Display diff in a beautiful panel
-        title = "[bold green]📋 تغییرات Uncommitted[/bold green]" if persian_mode else "[bold green]📋 Uncommitted Changes[/bold green]"
-        diff_panel = Panel(
-            Syntax(diff, "diff", theme="monokai", line_numbers=False),
-            title=title,
-            border_style="green",
-            expand=False
-        )
-        console.print(diff_panel)
-
         if persian_mode:
             console.print("\n[bold blue]🤖 دارم از هوش مصنوعی میپرسم چی شده...[/bold blue]")
         else:
             console.print("\n[bold blue]🤖 Asking AI to analyze the changes...[/bold blue]")
             
-        explanation = analyze_diff(diff, persian_mode=persian_mode)
-
-        # Display AI explanation in a beautiful panel
-        title = "[bold yellow]🧠 تحلیل هوش مصنوعی[/bold yellow]" if persian_mode else "[bold yellow]🧠 AI Analysis[/bold yellow]"
-        explanation_panel = Panel(
-            explanation,
-            title=title,
-            border_style="yellow",
-            expand=False
-        )
-        console.print(explanation_panel)
+        explanation, model_stats = ask_model(diff, persian_mode)
 
         if save_to_file:
-            filename = save_markdown(diff, explanation, old_file, new_file)
-            if persian_mode:
-                console.print(f"\n[bold green]✅ تحلیل ذخیره شد در:[/bold green] [cyan]{filename}[/cyan]")
-            else:
-                console.print(f"\n[bold green]✅ Analysis saved to:[/bold green] [cyan]{filename}[/cyan]")
+            save_analysis(diff, explanation, old_file, new_file, model_stats, persian_mode=persian_mode)
             
     except Exception as e:
         error_msg = "[bold red]❌ خطا:[/bold red]" if persian_mode else "[bold red]❌ Error:[/bold red]"
         console.print(f"{error_msg} {e}")
         raise
 
-def analyze_staged_changes(save_to_file: bool = True, persian_mode: bool = False):
+def analyze_staged_changes(save_to_file: bool = True, persian_mode: bool = False, path_filter=None):
     """Analyze only staged changes"""
     if persian_mode:
         console.print("[bold blue]🔍 دارم فایل‌های staged رو تحلیل میکنم...[/bold blue]")
@@ -139,8 +243,11 @@ def analyze_staged_changes(save_to_file: bool = True, persian_mode: bool = False
         console.print("[bold blue]🔍 Analyzing staged changes...[/bold blue]")
     
     try:
-        diff = get_staged_changes()
-        if not diff.strip():
+        # Display each file's diff in a beautiful panel as git streams it
+        diff_stream = stream_git_diff(['--cached'], path_filter=path_filter)
+        title = "[bold green]📋 فایل‌های Staged[/bold green]" if persian_mode else "[bold green]📋 Staged Changes[/bold green]"
+        diff = show_diff_stream(diff_stream, title)
+        if not diff:
             if persian_mode:
                 console.print("ℹ️  [yellow]هیچ فایل staged پیدا نشد[/yellow]")
                 console.print("💡 [dim]از 'git add' استفاده کن تا فایل‌ها رو stage کنی[/dim]")
@@ -152,58 +259,37 @@ def analyze_staged_changes(save_to_file: bool = True, persian_mode: bool = False
         old_file = "Repository (HEAD)"
         new_file = "Staged Changes"
 
-        # Display diff in a beautiful panel
-        title = "[bold green]📋 فایل‌های Staged[/bold green]" if persian_mode else "[bold green]📋 Staged Changes[/bold green]"
-        diff_panel = Panel(
-            Syntax(diff, "diff", theme="monokai", line_numbers=False),
-            title=title,
-            border_style="green",
-            expand=False
-        )
-        console.print(diff_panel)
-
         if persian_mode:
             console.print("\n[bold blue]🤖 دارم از هوش مصنوعی میپرسم چی شده...[/bold blue]")
         else:
             console.print("\n[bold blue]🤖 Asking AI to analyze the staged changes...[/bold blue]")
             
-        explanation = analyze_diff(diff, persian_mode=persian_mode)
-
-        # Display AI explanation in a beautiful panel
-        title = "[bold yellow]🧠 تحلیل هوش مصنوعی[/bold yellow]" if persian_mode else "[bold yellow]🧠 AI Analysis[/bold yellow]"
-        explanation_panel = Panel(
-            explanation,
-            title=title,
-            border_style="yellow",
-            expand=False
-        )
-        console.print(explanation_panel)
+        explanation, model_stats = ask_model(diff, persian_mode)
 
         if save_to_file:
-            filename = save_markdown(diff, explanation, old_file, new_file)
-            if persian_mode:
-                console.print(f"\n[bold green]✅ تحلیل ذخیره شد در:[/bold green] [cyan]{filename}[/cyan]")
-            else:
-                console.print(f"\n[bold green]✅ Analysis saved to:[/bold green] [cyan]{filename}[/cyan]")
+            save_analysis(diff, explanation, old_file, new_file, model_stats, persian_mode=persian_mode)
             
     except Exception as e:
         error_msg = "[bold red]❌ خطا:[/bold red]" if persian_mode else "[bold red]❌ Error:[/bold red]"
         console.print(f"{error_msg} {e}")
         raise
 
-def analyze_file_diff(old_file: str, new_file: str, save_to_file: bool = True):
+def analyze_file_diff(old_file: str, new_file: str, save_to_file: bool = True, algorithm: str = "myers"):
     """Analyze diff between two files"""
+    if os.path.isdir(old_file) and os.path.isdir(new_file):
+        return analyze_tree_diff(old_file, new_file, save_to_file=save_to_file, algorithm=algorithm)
+
     console.print(f"[bold blue]🔍 Generating diff between {old_file} and {new_file}...[/bold blue]")
     
     try:
-        diff = generate_diff(old_file, new_file)
-        if not diff.strip():
+        diff = parse_diff(generate_diff(old_file, new_file, algorithm=algorithm))
+        if not diff:
             console.print("ℹ️  [yellow]No differences found between the files[/yellow]")
             return
 
         # Display diff in a beautiful panel
         diff_panel = Panel(
-            Syntax(diff, "diff", theme="monokai", line_numbers=False),
+            Syntax(diff.text, "diff", theme="monokai", line_numbers=False),
             title="[bold green]📋 File Diff[/bold green]",
             border_style="green",
             expand=False
@@ -211,25 +297,45 @@ def analyze_file_diff(old_file: str, new_file: str, save_to_file: bool = True):
         console.print(diff_panel)
 
         console.print("\n[bold blue]🤖 Asking AI to analyze the diff...[/bold blue]")
-        explanation = analyze_diff(diff)
-
-        # Display AI explanation in a beautiful panel
-        explanation_panel = Panel(
-            explanation,
-            title="[bold yellow]🧠 AI Analysis[/bold yellow]",
-            border_style="yellow",
-            expand=False
-        )
-        console.print(explanation_panel)
+        explanation, model_stats = ask_model(diff)
 
         if save_to_file:
-            filename = save_markdown(diff, explanation, old_file, new_file)
-            console.print(f"\n[bold green]✅ Analysis saved to:[/bold green] [cyan]{filename}[/cyan]")
+            save_analysis(diff, explanation, old_file, new_file, model_stats)
             
     except Exception as e:
         console.print(f"[bold red]❌ Error:[/bold red] {e}")
         raise
 
+def analyze_tree_diff(old_dir: str, new_dir: str, save_to_file: bool = True, path_filter=None, algorithm: str = "myers"):
+    """Analyze differences between two directory trees"""
+    console.print(f"[bold blue]🔍 Comparing directory {old_dir} with {new_dir}...[/bold blue]")
+
+    try:
+        changes = compare_trees(old_dir, new_dir, path_filter=path_filter)
+        if not changes:
+            console.print("ℹ️  [yellow]No differences found between the directories[/yellow]")
+            return
+
+        counts = {}
+        for change in changes:
+            counts[change.status] = counts.get(change.status, 0) + 1
+        labels = (('M', 'modified'), ('A', 'added'), ('D', 'deleted'), ('R', 'renamed'))
+        summary = ', '.join(f"{counts[status]} {label}" for status, label in labels if status in counts)
+        console.print(f"📂 [bold cyan]{len(changes)} files changed:[/bold cyan] {summary}")
+
+        diff = show_diff_stream(iter_tree_diffs(old_dir, new_dir, changes, algorithm=algorithm),
+                                "[bold green]📋 Tree Diff[/bold green]")
+
+        console.print("\n[bold blue]🤖 Asking AI to analyze the diff...[/bold blue]")
+        explanation, model_stats = ask_model(diff)
+
+        if save_to_file:
+            save_analysis(diff, explanation, old_dir, new_dir, model_stats, analysis_type="tree")
+
+    except Exception as e:
+        console.print(f"[bold red]❌ Error:[/bold red] {e}")
+        raise
+
 def main():
     """Legacy main function for backward compatibility"""
     args = sys.argv[1:]
@@ -244,7 +350,7 @@ def main():
         analyze_file_diff(old_file, new_file)
 
     else:
-        console.print("[bold red]Usage:[/bold red] python main.py <old_file> <new_file>")
+        console.print("[bold red]Usage:[/bold red] python main.py <old_file> <new_file>  (files or directories)")
         console.print("[bold red]Or:[/bold red]  python main.py --git <commit1> [<commit2>]")
         console.print("\n[bold cyan]💡 Tip:[/bold cyan] Use 'vibetrack --help' for the new CLI interface!")
         sys.exit(1)
@@ -0,0 +1,236 @@
+"""
+Cheap local pre-screen of a commit message against its diff, run before any
+model request.
+
+A commit like `chore: bump version` that only touches pyproject.toml does not
+need a model to tell that its message fits. The pre-screen scores message/diff
+consistency from a few features that cost nothing next to a model call:
+- the conventional-commit type (docs, test, ci, build, chore, feat, fix...)
+  against the kinds of paths touched;
+- the message length, and subjects that say nothing ('wip', 'update');
+- files and symbols the message mentions against the files and lines changed;
+- the size of the diff: a large change with a one-word message is suspect.
+Scores of VIBETRACK_PRESCREEN_ACCEPT (0.8) or more count as a confident match
+and scores of VIBETRACK_PRESCREEN_REJECT (0.15) or less as a confident
+mismatch; only the commits in between go to the model. VIBETRACK_PRESCREEN=0
+sends every commit to the model.
+"""
+
+import os
+import re
+
+from vibetrack.diff_utils import LOCKFILE_NAMES
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+ENABLED = os.environ.get('VIBETRACK_PRESCREEN', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+ACCEPT = _env_float('VIBETRACK_PRESCREEN_ACCEPT', 0.8)
+REJECT = _env_float('VIBETRACK_PRESCREEN_REJECT', 0.15)
+# Pre-screen verdicts go into the analysis index under this model name, with a
+# version that changes with the scoring and the thresholds
+INDEX_MODEL = 'prescreen'
+SCORING_VERSION = '1'
+
+# Changed lines (lockfiles aside) and files past which a change counts as small or large
+SMALL_LINES = 20
+SMALL_FILES = 2
+LARGE_LINES = 400
+LARGE_FILES = 10
+
+_CONVENTIONAL_RE = re.compile(r'^(\w+)(?:\([^)]*\))?(!)?:\s*(.*)$')
+_VAGUE_SUBJECTS = {
+    'wip', 'update', 'updates', 'updated', 'fix', 'fixes', 'fixed', 'change', 'changes', 'changed',
+    'misc', 'stuff', 'tmp', 'temp', 'test', 'tests', 'commit', 'save', 'more', 'minor', 'cleanup', '.', '...',
+}
+# What a message can point at: `quoted` text, paths and file names, call-like or
+# snake_case / CamelCase identifiers
+_QUOTED_RE = re.compile(r'`([^`]+)`')
+_MENTION_RE = re.compile(r'[\w./-]+\.\w{1,6}\b|\b\w+\(\)|\b[a-z]+_\w+\b|\b[a-z]+[A-Z]\w*\b|\b[A-Z][a-z]+[A-Z]\w*\b')
+_WORD_RE = re.compile(r'[A-Za-z][A-Za-z0-9_-]{3,}')
+
+_DOC_SUFFIXES = ('.md', '.rst', '.txt', '.adoc', '.mdx')
+_DOC_NAMES = ('README', 'CHANGELOG', 'CHANGES', 'LICENSE', 'AUTHORS', 'CONTRIBUTING', 'NOTICE', 'HISTORY')
+_DOC_DIRS = {'docs', 'doc', 'documentation'}
+_TEST_DIRS = {'test', 'tests', '__tests__', 'spec', 'specs', 'testing'}
+_TEST_NAME_RE = re.compile(r'^test_|_test\.\w+$|\.(test|spec)\.\w+$|Test\.\w+$|_spec\.rb$')
+_CI_NAMES = {'.gitlab-ci.yml', '.travis.yml', 'Jenkinsfile', 'azure-pipelines.yml', 'appveyor.yml', 'bitbucket-pipelines.yml'}
+_CI_DIRS = {'.circleci', '.buildkite'}
+_BUILD_NAMES = {
+    'pyproject.toml', 'setup.py', 'setup.cfg', 'MANIFEST.in', 'tox.ini', 'noxfile.py', 'Pipfile',
+    'package.json', 'tsconfig.json', 'Cargo.toml', 'go.mod', 'Gemfile', 'pom.xml', 'build.gradle',
+    'build.gradle.kts', 'Makefile', 'CMakeLists.txt', 'Dockerfile', 'docker-compose.yml', '.gitignore',
+    '.gitattributes', '.editorconfig', '.pre-commit-config.yaml', '.dockerignore', 'VERSION', 'version.txt',
+    '.nvmrc', '.python-version', '.flake8', '.pylintrc', '.eslintrc.json', '.prettierrc',
+}
+_BUILD_NAME_RE = re.compile(r'^requirements.*\.(txt|in)$|^Dockerfile\.|\.(cfg|ini|toml)$')
+
+# Path kinds each conventional-commit type is expected to touch; the code types
+# say little on their own, so fitting paths counts for less there
+_TYPE_KINDS = {
+    'docs': {'docs'},
+    'test': {'tests'},
+    'tests': {'tests'},
+    'ci': {'ci'},
+    'build': {'build', 'ci'},
+    'deps': {'build'},
+    'chore': {'build', 'ci', 'docs', 'tests'},
+    'feat': {'source', 'tests', 'docs'},
+    'fix': {'source', 'tests'},
+    'perf': {'source'},
+    'refactor': {'source', 'tests'},
+}
+_CODE_TYPES = {'feat', 'fix', 'perf', 'refactor'}
+
+def path_kind(path):
+    """'docs', 'tests', 'ci', 'build' (dependencies, packaging, configuration) or 'source'"""
+    parts = path.replace(os.sep, '/').split('/')
+    name = parts[-1]
+    dirs = set(parts[:-1])
+    if name in LOCKFILE_NAMES or name.endswith('.lock') or name in _BUILD_NAMES or _BUILD_NAME_RE.search(name):
+        return 'ci' if dirs & _CI_DIRS else 'build'
+    if '.github' in dirs and 'workflows' in dirs or name in _CI_NAMES or dirs & _CI_DIRS:
+        return 'ci'
+    if dirs & _TEST_DIRS or _TEST_NAME_RE.search(name):
+        return 'tests'
+    if dirs & _DOC_DIRS or name.endswith(_DOC_SUFFIXES) or name.upper().startswith(_DOC_NAMES):
+        return 'docs'
+    return 'source'
+
+class Screen:
+    """What the pre-screen made of one commit
+
+    verdict is 'MATCH' or 'MISMATCH' when the score is decisive and None when
+    the commit needs the model; reasons lists the features that moved the score.
+    """
+    __slots__ = ('score', 'verdict', 'reasons')
+
+    def __init__(self, score, verdict, reasons):
+        self.score = score
+        self.verdict = verdict
+        self.reasons = reasons
+
+    @property
+    def confident(self):
+        return self.verdict is not None
+
+    @property
+    def summary(self):
+        return '; '.join(self.reasons) or 'nothing stood out'
+
+    def as_dict(self):
+        return {'score': round(self.score, 2), 'verdict': self.verdict, 'reasons': self.reasons}
+
+    def __repr__(self):
+        return f'Screen({self.score:.2f}, {self.verdict})'
+
+def _mentions(message):
+    mentions = set(_QUOTED_RE.findall(message))
+    mentions.update(_MENTION_RE.findall(_QUOTED_RE.sub(' ', message)))
+    return {mention.strip().rstrip('()').strip('./') for mention in mentions if len(mention.strip()) > 2}
+
+def prescreen(commit_message, diff):
+    """Score how well a commit message fits its ParsedDiff; returns a Screen"""
+    message = (commit_message or '').strip()
+    subject = message.splitlines()[0].strip() if message else ''
+    body = message[len(subject):].strip()
+    score = 0.5
+    reasons = []
+
+    paths = [diff_file.path for diff_file in diff.files]
+    kinds = {path_kind(path) for path in paths}
+    changed = sum(diff_file.added + diff_file.removed for diff_file in diff.files
+                  if diff_file.path.rsplit('/', 1)[-1] not in LOCKFILE_NAMES)
+
+    # Conventional-commit type against the kinds of paths touched
+    match = _CONVENTIONAL_RE.match(subject)
+    description = match.group(3) if match else subject
+    commit_type = match.group(1).lower() if match else None
+    expected = _TYPE_KINDS.get(commit_type)
+    if expected and kinds:
+        if kinds <= expected:
+            score += 0.1 if commit_type in _CODE_TYPES else 0.3
+            reasons.append(f"'{commit_type}' fits the files touched ({', '.join(sorted(kinds))})")
+        elif not kinds & expected:
+            score -= 0.4
+            reasons.append(f"'{commit_type}' but only {', '.join(sorted(kinds))} files changed")
+        elif commit_type not in _CODE_TYPES:
+            score -= 0.1
+            reasons.append(f"'{commit_type}' but {', '.join(sorted(kinds - expected))} files changed too")
+
+    # Message length
+    words = description.lower().strip(' .!').split()
+    if not description or len(description) < 8 or (len(words) <= 2 and set(words) <= _VAGUE_SUBJECTS):
+        score -= 0.3
+        reasons.append('the subject says almost nothing')
+    elif len(subject) > 100:
+        score -= 0.05
+        reasons.append('the subject is over 100 characters')
+    elif len(subject) >= 15:
+        score += 0.05
+
+    # Files and symbols the message names against what changed
+    mentions = _mentions(message)
+    if mentions:
+        names = set()
+        for path in paths:
+            names.add(path)
+            names.update(path.split('/'))
+        hits = [mention for mention in mentions
+                if mention in names or any(path.endswith(mention) for path in paths) or mention in diff.text]
+        misses = len(mentions) - len(hits)
+        if not misses:
+            score += 0.2
+            reasons.append(f"names what changed ({', '.join(sorted(hits)[:3])})")
+        elif misses * 2 >= len(mentions):
+            score -= 0.3
+            missing = sorted(set(mentions) - set(hits))
+            reasons.append(f"names things the diff does not touch ({', '.join(missing[:3])})")
+    else:
+        # Plain words can still point at a changed file ('parser' for parser.py)
+        stems = {part.rsplit('.', 1)[0].lower() for path in paths for part in path.split('/')}
+        named = sorted({word.lower() for word in _WORD_RE.findall(subject)} & stems)
+        if named:
+            score += 0.1
+            reasons.append(f'names the changed file {named[0]}')
+
+    # Diff size against how much the message says
+    if changed <= SMALL_LINES and len(paths) <= SMALL_FILES:
+        score += 0.1
+        reasons.append(f'small change ({changed} lines)')
+    elif changed > LARGE_LINES or len(paths) > LARGE_FILES:
+        score -= 0.2
+        reasons.append(f'large change ({changed} lines in {len(paths)} files)')
+        if body:
+            score += 0.05
+        elif len(subject) < 30:
+            score -= 0.1
+            reasons.append('a short subject for a large change')
+
+    score = min(max(score, 0.0), 1.0)
+    if score >= ACCEPT:
+        verdict = 'MATCH'
+    elif score <= REJECT:
+        verdict = 'MISMATCH'
+    else:
+        verdict = None
+    return Screen(score, verdict, reasons)
+
+def index_version(prompt_version, enabled=None):
+    """The index prompt version pre-screen verdicts are stored under, or None when the pre-screen is off"""
+    if enabled is None:
+        enabled = ENABLED
+    if not enabled:
+        return None
+    return f'{prompt_version}+{SCORING_VERSION}:{ACCEPT:g}:{REJECT:g}'
+
+def screen_commit(commit_message, diff, enabled=None):
+    """prescreen() unless the pre-screen is off (enabled=False, or VIBETRACK_PRESCREEN=0) or there is no diff"""
+    if enabled is None:
+        enabled = ENABLED
+    if not enabled or not diff:
+        return None
+    return prescreen(commit_message, diff)
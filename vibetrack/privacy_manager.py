@@ -1,9 +1,11 @@
 import os
 import json
+import asyncio
 import hashlib
 from datetime import datetime
 from cryptography.fernet import Fernet
 from rich.console import Console
+from vibetrack.diff_utils import PathFilter, as_parsed_diff, prepare_diff_for_model
 
 console = Console()
 
@@ -41,6 +43,7 @@ class PrivacyManager:
     
     def save_private_analysis(self, diff, explanation, project_path, analysis_type="diff", extra_data=None):
         """Save analysis in encrypted format"""
+        diff = as_parsed_diff(diff)
         project_hash = self._get_project_hash(project_path)
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         
@@ -49,7 +52,8 @@ class PrivacyManager:
             "timestamp": datetime.now().isoformat(),
             "project_path": project_path,  # This will be encrypted
             "analysis_type": analysis_type,
-            "diff": diff,
+            "diff": diff.text,
+            "diff_stats": diff.stats(),
             "explanation": explanation,
             "extra_data": extra_data or {}
         }
@@ -162,6 +166,10 @@ class PrivacyManager:
 *Private analysis - stored encrypted locally*
 """
 
+# Bump when a prompt changes, so the analysis index treats every commit as due again
+ANALYSIS_PROMPT_VERSION = "1"
+QUALITY_PROMPT_VERSION = "1"
+
 class SilentMode:
     """Handle silent mode operations for CI/CD"""
     
@@ -171,12 +179,15 @@ class SilentMode:
         from vibetrack.local_client import send_to_local_model
         
         try:
+            diff = as_parsed_diff(diff)
+
             # Use English for CI/CD environments
             analysis = send_to_local_model(diff, persian_mode=False)
             
             return {
                 "success": True,
                 "analysis": analysis,
+                "diff_stats": diff.stats(),
                 "timestamp": datetime.now().isoformat(),
                 "type": analysis_type
             }
@@ -194,58 +205,221 @@ class SilentMode:
         if output_format == "json":
             return json.dumps(analysis_result, indent=2)
         elif output_format == "text":
+            if "commits" in analysis_result:
+                lines = [f"{'✅' if result['success'] else '❌'} {result['commit_hash'][:8]} "
+                         f"{result.get('quality_analysis') or result.get('error', '')}"
+                         for result in analysis_result["commits"]]
+                lines.append(f"\n{len(analysis_result['commits'])} checked, "
+                             f"{analysis_result['already_analyzed']} already analyzed, "
+                             f"{analysis_result['still_pending']} still pending, "
+                             f"{analysis_result.get('model_calls_avoided', 0)} settled by the local pre-screen")
+                return "\n".join(lines)
             if analysis_result["success"]:
-                return f"✅ Analysis completed successfully\n\n{analysis_result['analysis']}"
+                text = analysis_result.get("analysis") or analysis_result.get("quality_analysis")
+                return f"✅ Analysis completed successfully\n\n{text}"
             else:
                 return f"❌ Analysis failed: {analysis_result['error']}"
         else:
             return str(analysis_result)
     
     @staticmethod
-    def check_commit_quality(commit_hash="HEAD"):
-        """Check commit quality in silent mode"""
-        import subprocess
+    def _stored(index, shas, kind, prompt_version, model, screened_version=None):
+        """{SHA: stored result} from the model's rows, then from the pre-screen's under screened_version"""
+        from vibetrack.prescreen import INDEX_MODEL
         
-        try:
-            # Get commit message
-            commit_msg = subprocess.check_output(
-                ['git', 'log', '--format=%B', '-n', '1', commit_hash],
-                stderr=subprocess.STDOUT
-            ).decode('utf-8').strip()
-            
-            # Get commit diff
-            commit_diff = subprocess.check_output(
-                ['git', 'show', commit_hash, '--format=""'],
-                stderr=subprocess.STDOUT
-            ).decode('utf-8')
-            
-            # Analyze
-            prompt = f"""Commit message: {commit_msg}
-            
-Changes: {commit_diff}
+        stored = index.results(shas, kind, prompt_version, model)
+        if screened_version is not None:
+            stored.update(index.results([sha for sha in shas if sha not in stored], kind, screened_version, INDEX_MODEL))
+        return stored
+    
+    @staticmethod
+    def _incremental(commit_hashes, kind, prompt_version, index, run, screened_version=None):
+        """Run `run(commit_hashes)` only for the commits the index has no result for
 
-Rate this commit quality (1-10) and provide brief feedback:
-1. Message clarity
-2. Change consistency
-3. Overall quality
+        Results come back in the given order; those taken from the index have
+        'from_index' set, and new successful ones are recorded. Pre-screened
+        results count as done only under screened_version, which is recorded
+        apart from the model's, so turning the pre-screen off (or changing its
+        thresholds) sends those commits to the model again.
+        """
+        if index is None:
+            return run(commit_hashes)
+        from vibetrack.git_objects import get_object_store
+        from vibetrack.local_client import get_client
+        from vibetrack.prescreen import INDEX_MODEL
+        
+        model = get_client().model
+        store = get_object_store()
+        shas = [store.resolve(f"{commit_hash}^{{commit}}") or commit_hash for commit_hash in commit_hashes]
+        stored = SilentMode._stored(index, shas, kind, prompt_version, model, screened_version)
+        pending = [sha for sha in shas if sha not in stored]
+        fresh = dict(zip(pending, run(pending))) if pending else {}
+        done = [(sha, result) for sha, result in fresh.items() if result.get("success")]
+        index.record_many([(sha, result) for sha, result in done if not result.get("prescreened")],
+                          kind, prompt_version, model)
+        if screened_version is not None:
+            index.record_many([(sha, result) for sha, result in done if result.get("prescreened")],
+                              kind, screened_version, INDEX_MODEL)
+        
+        results = []
+        for commit_hash, sha in zip(commit_hashes, shas):
+            if sha in fresh:
+                results.append(fresh[sha])
+            else:
+                results.append(dict(stored[sha], from_index=True))
+        return results
+    
+    @staticmethod
+    def analyze_commits(commit_hashes, concurrency=None, index=None):
+        """Analyze many commits at once (at most `concurrency` model requests in flight)
 
-Provide JSON response with: {{"score": X, "feedback": "brief feedback"}}"""
-            
-            from vibetrack.local_client import send_to_local_model
-            analysis = send_to_local_model(prompt, persian_mode=False)
-            
+        With an AnalysisIndex, commits it already holds are not analyzed again.
+        """
+        return SilentMode._incremental(commit_hashes, "analysis", ANALYSIS_PROMPT_VERSION, index,
+                                       lambda pending: SilentMode._analyze_commits(pending, concurrency))
+    
+    @staticmethod
+    def _analyze_commits(commit_hashes, concurrency=None):
+        from vibetrack.async_engine import run_sync
+        
+        async def analyze_all(engine):
+            return await engine.gather(engine.analyze_commit(commit_hash) for commit_hash in commit_hashes)
+        
+        results = []
+        for commit_hash, outcome in zip(commit_hashes, run_sync(analyze_all, concurrency=concurrency)):
+            if isinstance(outcome, Exception):
+                results.append({
+                    "success": False,
+                    "error": str(outcome),
+                    "commit_hash": commit_hash,
+                    "timestamp": datetime.now().isoformat(),
+                    "type": "ci-analysis"
+                })
+            else:
+                results.append({
+                    "success": True,
+                    "commit_hash": commit_hash,
+                    "commit_message": outcome["commit_message"],
+                    "analysis": outcome["analysis"],
+                    "diff_stats": outcome["diff"].stats(),
+                    "timestamp": datetime.now().isoformat(),
+                    "type": "ci-analysis"
+                })
+        return results
+    
+    @staticmethod
+    async def _check_commit_quality(engine, commit_hash, prescreen=None):
+        from vibetrack.prescreen import screen_commit
+        
+        commit_msg, commit_diff = await asyncio.gather(engine.commit_message(commit_hash),
+                                                       engine.read_commit_diff(commit_hash))
+        
+        # Commits the local pre-screen is sure about need no model call. The default
+        # filter keeps source files only, so a commit touching nothing else (a version
+        # bump in pyproject.toml) is screened on all of its files
+        screen_diff = commit_diff or await engine.read_commit_diff(commit_hash, PathFilter(include=[]))
+        screen = screen_commit(commit_msg, screen_diff, prescreen)
+        if screen is not None and screen.confident:
             return {
                 "success": True,
                 "commit_hash": commit_hash,
                 "commit_message": commit_msg,
-                "quality_analysis": analysis,
+                "diff_stats": screen_diff.stats(),
+                "quality_analysis": json.dumps({"score": round(screen.score * 10), "feedback": screen.summary}),
+                "prescreened": True,
+                "prescreen": screen.as_dict(),
                 "timestamp": datetime.now().isoformat()
             }
+        
+        # Analyze
+        prompt = f"""Commit message: {commit_msg}
             
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "commit_hash": commit_hash,
-                "timestamp": datetime.now().isoformat()
-            }
\ No newline at end of file
+Changes: {prepare_diff_for_model(commit_diff).text}
+
+Rate this commit quality (1-10) and provide brief feedback:
+1. Message clarity
+2. Change consistency
+3. Overall quality
+
+Provide JSON response with: {{"score": X, "feedback": "brief feedback"}}"""
+        
+        from vibetrack.local_client import build_messages
+        analysis = await engine.chat(build_messages(prompt, persian_mode=False))
+        
+        return {
+            "success": True,
+            "commit_hash": commit_hash,
+            "commit_message": commit_msg,
+            "diff_stats": commit_diff.stats(),
+            "quality_analysis": analysis,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    @staticmethod
+    def check_commits_quality(commit_hashes, concurrency=None, index=None, prescreen=None):
+        """Check the quality of many commits at once
+
+        With an AnalysisIndex, commits it already holds are not checked again.
+        Commits the local pre-screen is confident about are rated without the
+        model ('prescreened'); prescreen=False sends every one to the model.
+        """
+        from vibetrack.prescreen import index_version
+        
+        return SilentMode._incremental(commit_hashes, "quality", QUALITY_PROMPT_VERSION, index,
+                                       lambda pending: SilentMode._check_commits_quality(pending, concurrency, prescreen),
+                                       index_version(QUALITY_PROMPT_VERSION, prescreen))
+    
+    @staticmethod
+    def _check_commits_quality(commit_hashes, concurrency=None, prescreen=None):
+        from vibetrack.async_engine import run_sync
+        
+        async def check_all(engine):
+            return await engine.gather(SilentMode._check_commit_quality(engine, commit_hash, prescreen)
+                                       for commit_hash in commit_hashes)
+        
+        results = []
+        for commit_hash, outcome in zip(commit_hashes, run_sync(check_all, concurrency=concurrency)):
+            if isinstance(outcome, Exception):
+                outcome = {
+                    "success": False,
+                    "error": str(outcome),
+                    "commit_hash": commit_hash,
+                    "timestamp": datetime.now().isoformat()
+                }
+            results.append(outcome)
+        return results
+    
+    @staticmethod
+    def check_commit_quality(commit_hash="HEAD", index=None, prescreen=None):
+        """Check commit quality in silent mode"""
+        return SilentMode.check_commits_quality([commit_hash], index=index, prescreen=prescreen)[0]
+    
+    @staticmethod
+    def check_new_commits(revision="HEAD", index=None, concurrency=None, max_count=None, prescreen=None):
+        """Check the commits reachable from `revision` that the index has not seen yet (newest first)
+
+        A nightly run therefore costs as much as the commits added since the
+        last one; max_count caps a single run (the rest stays due).
+        """
+        from vibetrack.analysis_index import AnalysisIndex
+        from vibetrack.diff_utils import list_commits
+        from vibetrack.local_client import get_client
+        from vibetrack.prescreen import index_version
+        
+        index = index or AnalysisIndex()
+        commits = list_commits(revision)
+        # Pre-screened commits are settled too, or they would fill every run's max_count again
+        stored = SilentMode._stored(index, commits, "quality", QUALITY_PROMPT_VERSION, get_client().model,
+                                    index_version(QUALITY_PROMPT_VERSION, prescreen))
+        pending = [commit for commit in commits if commit not in stored]
+        batch = pending[:max_count] if max_count else pending
+        results = SilentMode.check_commits_quality(batch, concurrency, index, prescreen) if batch else []
+        return {
+            "success": all(result["success"] for result in results),
+            "revision": revision,
+            "commits": results,
+            "already_analyzed": len(commits) - len(pending),
+            "still_pending": len(pending) - len(batch),
+            "model_calls_avoided": sum(1 for result in results if result.get("prescreened")),
+            "timestamp": datetime.now().isoformat()
+        }
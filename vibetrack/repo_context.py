@@ -0,0 +1,175 @@
+"""
+Repository metadata (branch, HEAD, status, recent commits) collected in as few
+git calls as possible and shared by everything that prints or saves it.
+
+One `git status --porcelain=v2 --branch` gives branch, HEAD and file status,
+one `git log` gives the recent commits. The result is memoized per repository
+and reused until `.git/HEAD`, the index or the current branch ref changes on
+disk. Unstaged edits to the work tree do not touch those files, so the cached
+status only reflects them after the next commit, checkout or `git add`.
+"""
+
+import os
+import subprocess
+
+DEFAULT_COMMIT_COUNT = 5
+
+_contexts = {}
+
+def _locate(start):
+    """(work tree root, .git directory) for `start` (default: cwd), or (None, None) outside a repository"""
+    path = os.path.abspath(start or os.getcwd())
+    while True:
+        candidate = os.path.join(path, '.git')
+        if os.path.isdir(candidate):
+            return path, candidate
+        if os.path.isfile(candidate):
+            # Worktrees and submodules: ".git" is a file pointing at the real directory
+            with open(candidate, 'r') as f:
+                content = f.read().strip()
+            if content.startswith('gitdir:'):
+                git_dir = content[len('gitdir:'):].strip()
+                return path, os.path.normpath(os.path.join(path, git_dir))
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None, None
+        path = parent
+
+def find_git_dir(start=None):
+    """Locate the .git directory for `start` (default: cwd) without running git"""
+    return _locate(start)[1]
+
+def find_worktree_root(start=None):
+    """Locate the top directory of the work tree containing `start` (default: cwd) without running git"""
+    return _locate(start)[0]
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _signature(git_dir):
+    """The on-disk state a cached context depends on"""
+    if git_dir is None:
+        return None
+    head_path = os.path.join(git_dir, 'HEAD')
+    ref_mtime = None
+    try:
+        with open(head_path, 'r') as f:
+            head = f.read().strip()
+        if head.startswith('ref:'):
+            ref = head[len('ref:'):].strip()
+            ref_mtime = _mtime(os.path.join(git_dir, ref)) or _mtime(os.path.join(git_dir, 'packed-refs'))
+    except OSError:
+        head = None
+    return (head, _mtime(head_path), _mtime(os.path.join(git_dir, 'index')), ref_mtime)
+
+class StatusEntry:
+    """One changed path, with porcelain v1 style XY codes ('??' for untracked)"""
+    __slots__ = ('code', 'path', 'orig_path')
+
+    def __init__(self, code, path, orig_path=None):
+        self.code = code
+        self.path = path
+        self.orig_path = orig_path
+
+    @property
+    def display_path(self):
+        return f'{self.orig_path} -> {self.path}' if self.orig_path else self.path
+
+def _parse_status(output):
+    """Parse `git status --porcelain=v2 --branch -z` into (branch fields, entries)"""
+    branch = {}
+    entries = []
+    fields = output.split('\0')
+    index = 0
+    while index < len(fields):
+        record = fields[index]
+        index += 1
+        if not record:
+            continue
+        kind = record[0]
+        if kind == '#':
+            key, _, value = record[2:].partition(' ')
+            branch[key] = value
+        elif kind == '1':
+            parts = record.split(' ', 8)
+            entries.append(StatusEntry(parts[1].replace('.', ' '), parts[8]))
+        elif kind == '2':
+            parts = record.split(' ', 9)
+            # With -z the rename source is the next NUL-separated field
+            entries.append(StatusEntry(parts[1].replace('.', ' '), parts[9], fields[index]))
+            index += 1
+        elif kind == 'u':
+            parts = record.split(' ', 10)
+            entries.append(StatusEntry(parts[1], parts[10]))
+        elif kind == '?':
+            entries.append(StatusEntry('??', record[2:]))
+    return branch, entries
+
+class RepoContext:
+    """Snapshot of the repository metadata used in the CLI output and reports"""
+
+    def __init__(self, git_dir=None, commit_count=DEFAULT_COMMIT_COUNT):
+        self.git_dir = git_dir
+        self.commit_count = commit_count
+        self.signature = _signature(git_dir)
+        self.branch = 'unknown'
+        self.head = None
+        self.upstream = None
+        self.ahead = 0
+        self.behind = 0
+        self.entries = []
+        self.commits = []
+        self.git_calls = 0
+        self._load()
+
+    def _git(self, *args):
+        self.git_calls += 1
+        return subprocess.check_output(['git'] + list(args), stderr=subprocess.STDOUT).decode('utf-8', errors='replace')
+
+    def _load(self):
+        branch, self.entries = _parse_status(self._git('status', '--porcelain=v2', '--branch', '-z'))
+
+        head_name = branch.get('branch.head', '')
+        self.branch = head_name if head_name and head_name != '(detached)' else 'unknown'
+        oid = branch.get('branch.oid', '')
+        self.head = oid if oid and oid != '(initial)' else None
+        self.upstream = branch.get('branch.upstream')
+        ahead_behind = branch.get('branch.ab', '').split()
+        if len(ahead_behind) == 2:
+            self.ahead, self.behind = int(ahead_behind[0]), -int(ahead_behind[1])
+
+        self.commits = self._load_commits(self.commit_count) if self.head else []
+
+    def _load_commits(self, count):
+        output = self._git('log', f'-{count}', '--format=%h%x00%s')
+        commits = []
+        for line in output.splitlines():
+            short_hash, _, subject = line.partition('\0')
+            commits.append((short_hash, subject))
+        return commits
+
+    def recent_commits(self, count=DEFAULT_COMMIT_COUNT):
+        """The latest `count` (short hash, subject) pairs, fetching more only if needed"""
+        if count > self.commit_count and self.head:
+            self.commits = self._load_commits(count)
+            self.commit_count = count
+        return self.commits[:count]
+
+    def is_stale(self):
+        return _signature(self.git_dir) != self.signature
+
+def get_repo_context(commit_count=DEFAULT_COMMIT_COUNT):
+    """Get the memoized context for the current repository, reloading it if git state changed"""
+    git_dir = find_git_dir()
+    context = _contexts.get(git_dir)
+    if context is None or context.is_stale():
+        context = RepoContext(git_dir, max(commit_count, DEFAULT_COMMIT_COUNT))
+        _contexts[git_dir] = context
+    return context
+
+def invalidate_repo_context():
+    """Drop every cached context, e.g. after the work tree was changed behind git's back"""
+    _contexts.clear()
@@ -0,0 +1,196 @@
+"""
+Persistent cache of model answers, so asking about the same diff twice does
+not wait for the model twice.
+
+Entries are content-addressed: the key is a SHA-256 of the model name, the
+sampling parameters and the chat messages (prompt template plus diff) with
+line endings and trailing whitespace normalized. Each answer is one small JSON
+file; reading an entry bumps its mtime, and when the cache grows past its
+entry or byte limit the least recently used files are removed first.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import weakref
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+MAX_ENTRIES = _env_int('VIBETRACK_CACHE_MAX_ENTRIES', 500)
+MAX_BYTES = _env_int('VIBETRACK_CACHE_MAX_BYTES', 20 * 1024 * 1024)
+
+_SUFFIX = '.json'
+# Hit/miss totals across runs, kept next to the entries. Lookups are counted in
+# memory and added to the file every FLUSH_EVERY lookups and at exit
+_COUNTERS = 'counters'
+FLUSH_EVERY = 100
+
+_caches = weakref.WeakSet()
+
+def default_cache_dir():
+    """VIBETRACK_CACHE_DIR, else $XDG_CACHE_HOME/vibetrack/responses (~/.cache by default)"""
+    configured = os.environ.get('VIBETRACK_CACHE_DIR')
+    if configured:
+        return configured
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'vibetrack', 'responses')
+
+def _normalize(text):
+    # CRLF vs LF or trailing blanks do not change what the model is asked
+    return '\n'.join(line.rstrip() for line in text.replace('\r\n', '\n').split('\n')).strip()
+
+def cache_key(model, messages, **params):
+    """Hash of everything that decides the answer"""
+    payload = {
+        'model': model,
+        'params': params,
+        'messages': [[message['role'], _normalize(message['content'])] for message in messages],
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+class ResponseCache:
+    """Answers on disk keyed by cache_key, with LRU eviction by entry count and total size"""
+
+    def __init__(self, directory=None, max_entries=None, max_bytes=None):
+        self.directory = directory or default_cache_dir()
+        self.max_entries = max_entries if max_entries is not None else MAX_ENTRIES
+        self.max_bytes = max_bytes if max_bytes is not None else MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self._unsaved = {'hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key):
+        """The cached entry (a dict with at least 'text'), or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+        self._count('hits')
+        return entry
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            self._unsaved[name] += 1
+            due = sum(self._unsaved.values()) >= FLUSH_EVERY
+        if due:
+            self.flush()
+
+    def _saved_totals(self):
+        try:
+            with open(os.path.join(self.directory, _COUNTERS), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'hits': 0, 'misses': 0}
+
+    def flush(self):
+        """Add the lookups counted since the last flush to the counters file (replaced atomically)"""
+        with self._lock:
+            unsaved = self._unsaved
+            if not any(unsaved.values()):
+                return
+            self._unsaved = {'hits': 0, 'misses': 0}
+            totals = self._saved_totals()
+            for name, count in unsaved.items():
+                totals[name] = totals.get(name, 0) + count
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                fd, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(totals, f)
+                os.replace(temporary, os.path.join(self.directory, _COUNTERS))
+            except OSError:
+                pass
+
+    def totals(self):
+        """Hits and misses over every run that used this directory"""
+        totals = self._saved_totals()
+        with self._lock:
+            for name, count in self._unsaved.items():
+                totals[name] = totals.get(name, 0) + count
+        return totals
+
+    def put(self, key, text, **extra):
+        """Store an answer atomically, then evict if the cache is over its limits"""
+        entry = dict(extra, text=text)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(temporary, self._path(key))
+        except OSError:
+            # A read-only or full disk only costs the cache, never the analysis
+            return
+        self.evict()
+
+    def _entries(self):
+        """(mtime, size, path) of every entry, least recently used first"""
+        entries = []
+        try:
+            with os.scandir(self.directory) as scan:
+                for item in scan:
+                    if item.name.endswith(_SUFFIX):
+                        try:
+                            info = item.stat()
+                        except OSError:
+                            continue
+                        entries.append((info.st_mtime_ns, info.st_size, item.path))
+        except OSError:
+            pass
+        entries.sort()
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until both limits hold; returns how many went"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if len(entries) - removed <= self.max_entries and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """Remove every entry (the hit/miss totals are kept)"""
+        removed = 0
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def usage(self):
+        """(entries, bytes) currently on disk"""
+        entries = self._entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+@atexit.register
+def _flush_caches():
+    for cache in list(_caches):
+        cache.flush()
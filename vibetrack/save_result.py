@@ -1,53 +1,409 @@
-import os
+"""
+Saved reports: one Report per analysis, rendered to Markdown, JSON or HTML.
+
+A Report gathers what every format shows once: the diff statistics and the
+repository context (branch, recent commits) are read on first use and then
+shared by all renderers. Renderers are generators of text chunks, and only
+the formats asked for are rendered, streamed straight into the file. Each
+report gets an ID made of its timestamp, the process ID and a per-process
+sequence number. Two runs in the same second therefore never share a file
+name, and all formats of one report share the ID. Files are written to a
+temporary name and moved into place, so a reader never sees half a report.
+
+The diff, the only part that grows without bound, is never copied whole:
+renderers hand it to the file in REPORT_CHUNK_CHARS slices (diff.iter_text),
+escaped for HTML or JSON one slice at a time. A SpooledDiff is read back from
+its temporary file, so the analysis commands never hold the text at all and
+memory use while saving stays the same whether the diff is 2 KB or 200 MB.
+"""
+
+import base64
+import html
+import itertools
 import json
+import os
+import tempfile
+import zlib
 from datetime import datetime
-from vibetrack.diff_utils import get_current_branch, get_recent_commits
+from vibetrack.diff_utils import SpooledDiff, as_parsed_diff, get_current_branch
+from vibetrack.repo_context import get_repo_context
 
-def save_markdown(diff, explanation, old_file, new_file, analysis_type="diff", extra_data=None):
-    """Save analysis to markdown file with comprehensive report"""
-    # Create history directory if it doesn't exist
-    history_dir = "history"
-    if not os.path.exists(history_dir):
-        os.makedirs(history_dir)
-    
-    # Generate filename with timestamp and type
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"{history_dir}/vibetrack_{analysis_type}_{timestamp}.md"
-    
-    # Get additional context
-    current_branch = get_current_branch()
-    recent_commits = get_recent_commits(3)
-    
-    # Create comprehensive markdown content
-    markdown_content = f"""# 🎯 VibeTrack Analysis Report
+HISTORY_DIR = 'history'
+FORMATS = ('md', 'json', 'html')
+# Files written by the analysis commands besides the history entry, e.g. "md,json,html" (none by default)
+REPORT_FORMATS = [name.strip() for name in os.environ.get('VIBETRACK_REPORT_FORMATS', '').split(',') if name.strip()]
+VERSION = '0.1.0'
+# Characters of diff rendered and written at a time
+REPORT_CHUNK_CHARS = 64 * 1024
+
+_sequence = itertools.count(1)
+
+def report_id(when=None):
+    """A report ID no other report shares, even one saved in the same second by another process"""
+    when = when or datetime.now()
+    return f"{when.strftime('%Y-%m-%d_%H-%M-%S')}_{os.getpid():x}-{next(_sequence)}"
+
+def _json_string_chunks(chunks):
+    """A JSON string literal for text given in slices (escaping is per character, so slices join cleanly)"""
+    yield '"'
+    for chunk in chunks:
+        yield json.encoder.encode_basestring(chunk)[1:-1]
+    yield '"'
+
+def _deflate_chunks(chunks):
+    """Text given in slices, zlib-compressed a slice at a time"""
+    compressor = zlib.compressobj(6)
+    for chunk in chunks:
+        yield compressor.compress(chunk.encode('utf-8'))
+    yield compressor.flush()
+
+def _base64_chunks(pieces):
+    """Base64 of the concatenated byte pieces, encoded as they come (3 bytes at a time line up)"""
+    pending = b''
+    for piece in pieces:
+        pending += piece
+        cut = len(pending) - len(pending) % 3
+        if cut:
+            yield base64.b64encode(pending[:cut]).decode('ascii')
+            pending = pending[cut:]
+    if pending:
+        yield base64.b64encode(pending).decode('ascii')
+
+def write_atomic(path, chunks):
+    """Write text chunks to a temporary file next to path, then move it into place"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(prefix='.vibetrack-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        # mkstemp creates the file private to its owner; reports are as readable as any other file
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+    return path
+
+def _model_stats_lines(extra_data):
+    """Model timings and prompt savings, as Technical Details lines"""
+    stats = (extra_data or {}).get('model_stats')
+    if stats and stats.get('cached'):
+        return '- **Model Answer:** served from the response cache\n'
+    if not stats or stats.get('time_to_first_token') is None:
+        return ''
+    lines = f"- **Time to First Token:** {stats['time_to_first_token']:.2f} s\n"
+    if stats.get('tokens_per_second'):
+        lines += f"- **Generation Speed:** {stats['tokens_per_second']:.1f} tokens/s ({stats['tokens']} tokens)\n"
+    if stats.get('tokens_saved'):
+        lines += f"- **Prompt Compaction:** {stats['tokens_saved']} tokens saved\n"
+    if stats.get('chunks'):
+        lines += f"- **Chunked Analysis:** {stats['chunks']} parts in {stats['map_time']:.1f} s, then merged\n"
+    return lines
+
+STYLE = """    <style>
+        body {
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            line-height: 1.6;
+            margin: 0;
+            padding: 20px;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            min-height: 100vh;
+        }
+        .container {
+            max-width: 1200px;
+            margin: 0 auto;
+            background: white;
+            border-radius: 15px;
+            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
+            overflow: hidden;
+        }
+        .header {
+            background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%);
+            color: white;
+            padding: 30px;
+            text-align: center;
+        }
+        .content {
+            padding: 30px;
+        }
+        .section {
+            margin-bottom: 30px;
+            padding: 20px;
+            border-radius: 10px;
+            border-left: 4px solid #4facfe;
+            background: #f8f9fa;
+        }
+        .diff-container {
+            background: #1e1e1e;
+            color: #d4d4d4;
+            padding: 20px;
+            border-radius: 10px;
+            overflow-x: auto;
+            font-family: 'Courier New', monospace;
+            font-size: 14px;
+        }
+        .analysis {
+            background: #fff3cd;
+            border-left-color: #ffc107;
+        }
+        .metadata {
+            background: #d1ecf1;
+            border-left-color: #17a2b8;
+        }
+        h1, h2, h3 { color: #333; }
+        .emoji { font-size: 1.2em; }
+        .footer {
+            text-align: center;
+            padding: 20px;
+            background: #f8f9fa;
+            color: #666;
+        }
+        .add { color: #2e7d32; }
+        .del { color: #c62828; }
+        #file-filter {
+            width: 100%;
+            padding: 8px;
+            margin: 10px 0;
+            box-sizing: border-box;
+        }
+        .file-index {
+            width: 100%;
+            border-collapse: collapse;
+            font-family: 'Courier New', monospace;
+            font-size: 13px;
+            margin-bottom: 20px;
+        }
+        .file-index td { padding: 2px 8px; border-bottom: 1px solid #e0e0e0; }
+        .file-index td.add, .file-index td.del { text-align: right; width: 5em; }
+        details.file { margin: 6px 0; }
+        details.file summary {
+            cursor: pointer;
+            font-family: 'Courier New', monospace;
+            padding: 6px 10px;
+            background: #e9ecef;
+            border-radius: 6px;
+        }
+        details.file pre { margin: 6px 0 0; white-space: pre; }
+        .diff-container .add { color: #89d185; }
+        .diff-container .del { color: #f48771; }
+        .diff-container .hunk { color: #569cd6; }
+    </style>"""
+
+# Expands a file section on demand: unpack its script block (base64, then zlib through the
+# browser's DecompressionStream) and colour the lines, once
+SCRIPT = """    <script>
+    (function () {
+        var LARGE = 2000000;
+        function unpack(id) {
+            var data = atob(document.getElementById(id).textContent);
+            var bytes = new Uint8Array(data.length);
+            for (var i = 0; i < data.length; i++) { bytes[i] = data.charCodeAt(i); }
+            var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('deflate'));
+            return new Response(stream).text();
+        }
+        function render(pre, text) {
+            if (text.length > LARGE) { pre.textContent = text; return; }
+            var fragment = document.createDocumentFragment();
+            text.split('\\n').forEach(function (line) {
+                var span = document.createElement('span');
+                if (line.startsWith('@@')) { span.className = 'hunk'; }
+                else if (line[0] === '+' && !line.startsWith('+++')) { span.className = 'add'; }
+                else if (line[0] === '-' && !line.startsWith('---')) { span.className = 'del'; }
+                span.textContent = line + '\\n';
+                fragment.appendChild(span);
+            });
+            pre.appendChild(fragment);
+        }
+        function expand(section) {
+            if (section.dataset.loaded) { return; }
+            section.dataset.loaded = '1';
+            var pre = section.querySelector('pre');
+            if (!window.DecompressionStream) {
+                pre.textContent = 'This browser cannot unpack the diff (DecompressionStream is missing).';
+                return;
+            }
+            pre.textContent = '…';
+            unpack('chunk-' + section.id.slice(5)).then(function (text) {
+                pre.textContent = '';
+                render(pre, text);
+            });
+        }
+        document.querySelectorAll('details.file').forEach(function (section) {
+            section.addEventListener('toggle', function () { if (section.open) { expand(section); } });
+        });
+        function openTarget() {
+            var section = location.hash && document.getElementById(location.hash.slice(1));
+            if (section && section.tagName === 'DETAILS') { section.open = true; }
+        }
+        window.addEventListener('hashchange', openTarget);
+        openTarget();
+        document.getElementById('file-filter').addEventListener('input', function () {
+            var term = this.value.toLowerCase();
+            document.querySelectorAll('[data-path]').forEach(function (element) {
+                element.style.display = element.dataset.path.indexOf(term) === -1 ? 'none' : '';
+            });
+        });
+    })();
+    </script>"""
+
+def repository_context():
+    """(branch, recent commits, HEAD, repository path) for the current directory"""
+    try:
+        context = get_repo_context(5)
+        git_dir = context.git_dir
+        repo = os.path.dirname(git_dir) if git_dir and os.path.basename(git_dir) == '.git' else git_dir
+        return context.branch, context.recent_commits(5), context.head, repo or os.getcwd()
+    except Exception:
+        return 'unknown', [], None, os.getcwd()
+
+class Report:
+    """One analysis, gathered once and rendered lazily to any of FORMATS"""
+
+    def __init__(self, diff, explanation, old_file, new_file, analysis_type='diff', extra_data=None):
+        # A SpooledDiff stays on disk; anything else becomes a ParsedDiff
+        self.diff = diff if isinstance(diff, SpooledDiff) else as_parsed_diff(diff)
+        self.explanation = explanation or ''
+        self.old_file = old_file
+        self.new_file = new_file
+        self.analysis_type = analysis_type
+        self.extra_data = extra_data
+        self.generated = datetime.now()
+        self.id = report_id(self.generated)
+        self._context = None
+        self._stats = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a report from its as_dict() form, e.g. a history entry"""
+        metadata = data['metadata']
+        analysis = data['analysis']
+        report = cls(analysis['diff'], analysis['explanation'], metadata['old_file'], metadata['new_file'],
+                     metadata['analysis_type'], data.get('extra_data'))
+        report.generated = datetime.fromisoformat(metadata['generated'])
+        report.id = metadata.get('id', report.id)
+        commits = [tuple(line[2:].split(' ', 1)) for line in (data['context']['recent_commits'] or '').splitlines()]
+        report._context = (metadata['current_branch'], commits, metadata.get('commit_hash'), metadata.get('repo'))
+        return report
+
+    def _load_context(self):
+        if self._context is None:
+            self._context = repository_context()
+        return self._context
+
+    @property
+    def branch(self):
+        return self._load_context()[0]
+
+    @property
+    def commit_hash(self):
+        """The commit analyzed (extra_data['commit_hash']), else HEAD when the report was made"""
+        return (self.extra_data or {}).get('commit_hash') or self._load_context()[2]
+
+    @property
+    def repo(self):
+        return self._load_context()[3]
+
+    def recent_commits(self, count=5):
+        """Recent commits as lines of text, or None when there are none"""
+        commits = self._load_context()[1][:count]
+        if not commits:
+            return None
+        return '\n'.join(f'📝 {commit_hash} {commit_message}' for commit_hash, commit_message in commits)
+
+    @property
+    def stats(self):
+        """Diff statistics and the explanation's length, counted once for all formats"""
+        if self._stats is None:
+            self._stats = dict(self.diff.stats(), analysis_words=len(self.explanation.split()))
+        return self._stats
+
+    def filename(self, report_format, history_dir=HISTORY_DIR):
+        return os.path.join(history_dir, f'vibetrack_{self.analysis_type}_{self.id}.{report_format}')
+
+    def render(self, report_format, formats=None):
+        """Text chunks of the report in one format"""
+        renderers = {'md': self.markdown, 'json': self.json, 'html': self.html}
+        if report_format not in renderers:
+            raise ValueError(f"Unknown report format {report_format!r}; use one of: {', '.join(FORMATS)}")
+        if report_format == 'md':
+            return self.markdown([report_format] if formats is None else formats)
+        return renderers[report_format]()
+
+    def save(self, formats=None, history_dir=HISTORY_DIR):
+        """Write the report in each format asked for (REPORT_FORMATS by default); returns {format: filename}"""
+        formats = list(REPORT_FORMATS if formats is None else formats)
+        for report_format in formats:
+            if report_format not in FORMATS:
+                raise ValueError(f"Unknown report format {report_format!r}; use one of: {', '.join(FORMATS)}")
+        return {report_format: write_atomic(self.filename(report_format, history_dir), self.render(report_format, formats))
+                for report_format in formats}
+
+    def history_row(self):
+        """The report as a HistoryStore row"""
+        first_line = next((line.strip() for line in self.explanation.splitlines() if line.strip()), '')
+        return {
+            'id': self.id,
+            'batch': self.id,
+            'created_at': self.generated.isoformat(),
+            'repo': self.repo,
+            'branch': self.branch,
+            'analysis_type': self.analysis_type,
+            'commit_hash': self.commit_hash,
+            'files_changed': self.stats['files_changed'],
+            'additions': self.stats['additions'],
+            'deletions': self.stats['deletions'],
+            'summary': first_line[:200],
+            # The store reads the diff itself a slice at a time
+            'data': self._as_dict(self.diff if len(self.diff) else ''),
+        }
+
+    def record(self, store=None):
+        """Append the report to the analysis history (a HistoryStore, the default one if None); returns its ID"""
+        append_history([self.history_row()], store)
+        return self.id
+
+    def markdown(self, formats=('md',)):
+        extra_data = self.extra_data
+        yield f"""# 🎯 VibeTrack Analysis Report
 
 ## 📊 Report Information
-- **Generated:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-- **Analysis Type:** {analysis_type.title()}
-- **Comparison:** {old_file} → {new_file}
-- **Current Branch:** {current_branch}
+- **Generated:** {self.generated.strftime("%Y-%m-%d %H:%M:%S")}
+- **Analysis Type:** {self.analysis_type.title()}
+- **Comparison:** {self.old_file} → {self.new_file}
+- **Current Branch:** {self.branch}
 
 ## 📋 Repository Context
 ### Recent Commits
 ```
-{recent_commits if recent_commits else "No recent commits found"}
+{self.recent_commits(3) or "No recent commits found"}
 ```
 
 ## 🔍 Changes Detected
 
 ```diff
-{diff}
-```
+"""
+        last = ''
+        for chunk in self.diff.iter_text(size=REPORT_CHUNK_CHARS):
+            last = chunk
+            yield chunk
+        if not last.endswith('\n'):
+            yield '\n'
+        yield f"""```
 
 ## 🧠 AI Analysis
 
-{explanation}
+{self.explanation}
 """
 
-    # Add extra data if provided (for commit message analysis, etc.)
-    if extra_data:
-        if 'commit_message' in extra_data:
-            markdown_content += f"""
+        # Add extra data if provided (for commit message analysis, etc.)
+        if extra_data:
+            if 'commit_message' in extra_data:
+                yield f"""
 
 ## 📝 Commit Message Analysis
 ### Original Message
@@ -59,8 +415,8 @@ def save_markdown(diff, explanation, old_file, new_file, analysis_type="diff", e
 {extra_data.get('consistency_analysis', 'No consistency analysis available')}
 """
 
-        if 'suggested_message' in extra_data:
-            markdown_content += f"""
+            if 'suggested_message' in extra_data:
+                yield f"""
 
 ### 💡 Suggested Improvement
 ```
@@ -68,156 +424,95 @@ def save_markdown(diff, explanation, old_file, new_file, analysis_type="diff", e
 ```
 """
 
-        if 'file_stats' in extra_data:
-            markdown_content += f"""
+            if 'file_stats' in extra_data:
+                yield f"""
 
 ## 📈 File Statistics
 {extra_data['file_stats']}
 """
 
-    # Add metadata section
-    markdown_content += f"""
+        names = {'md': 'Markdown', 'json': 'JSON', 'html': 'HTML'}
+        saved = '\n'.join(f"- {'✅' if report_format in formats else '➖'} {names[report_format]} "
+                          f'(`vibetrack_{self.analysis_type}_{self.id}.{report_format}`)' for report_format in FORMATS)
+        yield f"""
 
 ## 🔧 Technical Details
-- **Files Changed:** {len([line for line in diff.split('\n') if line.startswith('diff --git')])}
-- **Report Size:** {len(diff.split('\n'))} lines of diff
-- **Analysis Length:** {len(explanation.split())} words
-
+- **Files Changed:** {self.stats['files_changed']}
+- **Report Size:** {self.stats['lines']} lines of diff
+- **Analysis Length:** {self.stats['analysis_words']} words
+{_model_stats_lines(extra_data)}
 ## 📱 Export Options
-This report is available in:
-- ✅ Markdown format (current)
-- 📄 JSON format (use --export-json flag)
-- 🌐 HTML format (use --export-html flag)
+This report is in the analysis history as `{self.id}` and was saved as:
+{saved}
+
+Export another format with `vibetrack history export {self.id} --format html`.
 
 ---
-*Generated by VibeTrack v0.1.0 - دستیار شخصی برای Vibe Coders*
+*Generated by VibeTrack v{VERSION} - دستیار شخصی برای Vibe Coders*
 *GitHub: https://github.com/alireza-taheriF/vibetrack*
 """
-    
-    # Write to file
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(markdown_content)
-    
-    return filename
-
-def save_json_report(diff, explanation, old_file, new_file, analysis_type="diff", extra_data=None):
-    """Save analysis to JSON file for programmatic access"""
-    history_dir = "history"
-    if not os.path.exists(history_dir):
-        os.makedirs(history_dir)
-    
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"{history_dir}/vibetrack_{analysis_type}_{timestamp}.json"
-    
-    # Create JSON structure
-    report_data = {
-        "metadata": {
-            "generated": datetime.now().isoformat(),
-            "analysis_type": analysis_type,
-            "old_file": old_file,
-            "new_file": new_file,
-            "current_branch": get_current_branch(),
-            "vibetrack_version": "0.1.0"
-        },
-        "analysis": {
-            "diff": diff,
-            "explanation": explanation,
-            "diff_stats": {
-                "lines_changed": len(diff.split('\n')),
-                "files_changed": len([line for line in diff.split('\n') if line.startswith('diff --git')]),
-                "analysis_words": len(explanation.split())
+
+    def as_dict(self):
+        """The JSON report as a dict"""
+        return self._as_dict(''.join(self.diff.iter_text()))
+
+    def _as_dict(self, diff):
+        stats = self.stats
+        report_data = {
+            'metadata': {
+                'id': self.id,
+                'generated': self.generated.isoformat(),
+                'analysis_type': self.analysis_type,
+                'old_file': self.old_file,
+                'new_file': self.new_file,
+                'current_branch': self.branch,
+                'commit_hash': self.commit_hash,
+                'repo': self.repo,
+                'vibetrack_version': VERSION
+            },
+            'analysis': {
+                'diff': diff,
+                'explanation': self.explanation,
+                'diff_stats': {
+                    'lines_changed': stats['lines'],
+                    'files_changed': stats['files_changed'],
+                    'additions': stats['additions'],
+                    'deletions': stats['deletions'],
+                    'analysis_words': stats['analysis_words']
+                }
+            },
+            'context': {
+                'recent_commits': self.recent_commits(5)
             }
-        },
-        "context": {
-            "recent_commits": get_recent_commits(5)
         }
-    }
-    
-    # Add extra data
-    if extra_data:
-        report_data["extra_data"] = extra_data
-    
-    # Write JSON file
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(report_data, f, indent=2, ensure_ascii=False)
-    
-    return filename
-
-def save_html_report(diff, explanation, old_file, new_file, analysis_type="diff", extra_data=None):
-    """Save analysis to HTML file for web viewing"""
-    history_dir = "history"
-    if not os.path.exists(history_dir):
-        os.makedirs(history_dir)
-    
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"{history_dir}/vibetrack_{analysis_type}_{timestamp}.html"
-    
-    # Create HTML content
-    html_content = f"""<!DOCTYPE html>
+        if self.extra_data:
+            report_data['extra_data'] = self.extra_data
+        return report_data
+
+    def json(self):
+        # The diff is swapped for a marker, which the encoder yields as a chunk of its own, then streamed in its place
+        marker = f'\0vibetrack-diff-{self.id}\0'
+        report_data = self._as_dict(marker)
+        encoded_marker = json.encoder.encode_basestring(marker)
+        for chunk in json.JSONEncoder(indent=2, ensure_ascii=False, default=str).iterencode(report_data):
+            if chunk == encoded_marker:
+                yield from _json_string_chunks(self.diff.iter_text(size=REPORT_CHUNK_CHARS))
+            else:
+                yield chunk
+
+    def html(self):
+        escape = html.escape
+        commit_section = ''
+        if self.extra_data and 'commit_message' in self.extra_data:
+            commit_section = ("<div class='section'><h2><span class='emoji'>📝</span> تحلیل پیام کامیت</h2><pre>"
+                              + escape(self.extra_data['commit_message']) + '</pre></div>')
+        yield """<!DOCTYPE html>
 <html lang="fa" dir="rtl">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>VibeTrack Analysis Report</title>
-    <style>
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            margin: 0;
-            padding: 20px;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }}
-        .container {{
-            max-width: 1200px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 15px;
-            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-            overflow: hidden;
-        }}
-        .header {{
-            background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%);
-            color: white;
-            padding: 30px;
-            text-align: center;
-        }}
-        .content {{
-            padding: 30px;
-        }}
-        .section {{
-            margin-bottom: 30px;
-            padding: 20px;
-            border-radius: 10px;
-            border-left: 4px solid #4facfe;
-            background: #f8f9fa;
-        }}
-        .diff-container {{
-            background: #1e1e1e;
-            color: #d4d4d4;
-            padding: 20px;
-            border-radius: 10px;
-            overflow-x: auto;
-            font-family: 'Courier New', monospace;
-            font-size: 14px;
-        }}
-        .analysis {{
-            background: #fff3cd;
-            border-left-color: #ffc107;
-        }}
-        .metadata {{
-            background: #d1ecf1;
-            border-left-color: #17a2b8;
-        }}
-        h1, h2, h3 {{ color: #333; }}
-        .emoji {{ font-size: 1.2em; }}
-        .footer {{
-            text-align: center;
-            padding: 20px;
-            background: #f8f9fa;
-            color: #666;
-        }}
-    </style>
+""" + STYLE + f"""
 </head>
 <body>
     <div class="container">
@@ -230,36 +525,212 @@ def save_html_report(diff, explanation, old_file, new_file, analysis_type="diff"
             <div class="section metadata">
                 <h2><span class="emoji">📊</span> اطلاعات گزارش</h2>
                 <ul>
-                    <li><strong>تاریخ تولید:</strong> {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</li>
-                    <li><strong>نوع تحلیل:</strong> {analysis_type.title()}</li>
-                    <li><strong>مقایسه:</strong> {old_file} → {new_file}</li>
-                    <li><strong>Branch فعلی:</strong> {get_current_branch()}</li>
+                    <li><strong>تاریخ تولید:</strong> {self.generated.strftime("%Y-%m-%d %H:%M:%S")}</li>
+                    <li><strong>نوع تحلیل:</strong> {escape(self.analysis_type.title())}</li>
+                    <li><strong>مقایسه:</strong> {escape(str(self.old_file))} → {escape(str(self.new_file))}</li>
+                    <li><strong>Branch فعلی:</strong> {escape(self.branch)}</li>
                 </ul>
             </div>
             
             <div class="section">
                 <h2><span class="emoji">🔍</span> تغییرات شناسایی شده</h2>
-                <div class="diff-container">
-                    <pre>{diff}</pre>
-                </div>
-            </div>
+"""
+        yield from self._html_files()
+        yield f"""            </div>
             
             <div class="section analysis">
                 <h2><span class="emoji">🧠</span> تحلیل هوش مصنوعی</h2>
-                <div style="white-space: pre-wrap;">{explanation}</div>
+                <div style="white-space: pre-wrap;">{escape(self.explanation)}</div>
             </div>
             
-            {"<div class='section'><h2><span class='emoji'>📝</span> تحلیل پیام کامیت</h2><pre>" + extra_data.get('commit_message', '') + "</pre></div>" if extra_data and 'commit_message' in extra_data else ""}
+            {commit_section}
         </div>
         
         <div class="footer">
-            <p>Generated by VibeTrack v0.1.0 | <a href="https://github.com/alireza-taheriF/vibetrack">GitHub</a></p>
+            <p>Generated by VibeTrack v{VERSION} | <a href="https://github.com/alireza-taheriF/vibetrack">GitHub</a></p>
         </div>
     </div>
+"""
+        yield from self._html_chunks()
+        yield SCRIPT + """
 </body>
 </html>"""
-    
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    
-    return filename
\ No newline at end of file
+
+    def _html_sections(self):
+        """(path, start, end, additions, deletions) of each file; the whole diff is one section if it has no files"""
+        if self.diff.files:
+            return [(diff_file.path, diff_file.start, diff_file.end, diff_file.added, diff_file.removed)
+                    for diff_file in self.diff.files]
+        if len(self.diff):
+            return [('diff', 0, None, self.stats['additions'], self.stats['deletions'])]
+        return []
+
+    def _html_files(self):
+        """The file index and one collapsed section per file; the diff bodies come later, in _html_chunks"""
+        escape = html.escape
+        sections = self._html_sections()
+        yield f"""                <p>{len(sections)} فایل، <span class="add">+{self.stats['additions']}</span> <span class="del">-{self.stats['deletions']}</span> — برای دیدن تغییرات هر فایل روی آن کلیک کنید</p>
+                <input id="file-filter" type="search" dir="ltr" placeholder="Filter files...">
+                <table class="file-index" dir="ltr">
+"""
+        for number, (path, _, _, added, removed) in enumerate(sections):
+            yield (f'                    <tr data-path="{escape(path.lower())}"><td><a href="#file-{number}">{escape(path)}</a></td>'
+                   f'<td class="add">+{added}</td><td class="del">-{removed}</td></tr>\n')
+        yield """                </table>
+                <div class="diff-files" dir="ltr">
+"""
+        for number, (path, _, _, added, removed) in enumerate(sections):
+            yield (f'                    <details class="file" id="file-{number}" data-path="{escape(path.lower())}">'
+                   f'<summary>{escape(path)} <span class="add">+{added}</span> <span class="del">-{removed}</span></summary>'
+                   f'<pre class="diff-container"></pre></details>\n')
+        yield """                </div>
+"""
+
+    def _html_chunks(self):
+        """Each file's diff, zlib-compressed and base64-encoded in a script block the browser does not run"""
+        for number, (_, start, end, _, _) in enumerate(self._html_sections()):
+            yield f'    <script type="application/octet-stream" id="chunk-{number}">'
+            # Base64 has no '<', so the block cannot end early
+            yield from _base64_chunks(_deflate_chunks(self.diff.iter_text(start, end, REPORT_CHUNK_CHARS)))
+            yield '</script>\n'
+
+def append_history(rows, store=None):
+    """Append rows to the given HistoryStore, or to the default one"""
+    from vibetrack.history_store import HistoryStore
+    if store is not None:
+        return store.append_many(rows)
+    with HistoryStore() as store:
+        return store.append_many(rows)
+
+def save_report(diff, explanation, old_file, new_file, analysis_type='diff', extra_data=None, formats=None, store=None):
+    """Record the analysis in the history and write the files asked for; returns (ID, {format: filename})"""
+    report = Report(diff, explanation, old_file, new_file, analysis_type, extra_data)
+    report.record(store)
+    return report.id, report.save(formats)
+
+def save_markdown(diff, explanation, old_file, new_file, analysis_type='diff', extra_data=None):
+    """Save analysis to markdown file with comprehensive report"""
+    return Report(diff, explanation, old_file, new_file, analysis_type, extra_data).save(['md'])['md']
+
+def save_json_report(diff, explanation, old_file, new_file, analysis_type='diff', extra_data=None):
+    """Save analysis to JSON file for programmatic access"""
+    return Report(diff, explanation, old_file, new_file, analysis_type, extra_data).save(['json'])['json']
+
+def save_html_report(diff, explanation, old_file, new_file, analysis_type='diff', extra_data=None):
+    """Save analysis to HTML file for web viewing"""
+    return Report(diff, explanation, old_file, new_file, analysis_type, extra_data).save(['html'])['html']
+
+def _table_cell(text):
+    return ' '.join(str(text).split()).replace('|', '\\|')
+
+def range_rows(revision_range, results, stats, batch=None, when=None):
+    """HistoryStore rows for a checked commit range, one per commit, sharing one batch ID"""
+    when = when or datetime.now()
+    batch = batch or report_id(when)
+    branch, _, _, repo = repository_context()
+    rows = []
+    for position, result in enumerate(results, 1):
+        diff_stats = result['diff_stats']
+        verdict = 'error' if result['error'] else (result['verdict'] or '-')
+        rows.append({
+            'id': f'{batch}.{position:05d}',
+            'batch': batch,
+            'created_at': when.isoformat(),
+            'repo': repo,
+            'branch': branch,
+            'analysis_type': 'log',
+            'commit_hash': result['commit_hash'],
+            'files_changed': diff_stats['files_changed'],
+            'additions': diff_stats['additions'],
+            'deletions': diff_stats['deletions'],
+            'summary': f"{verdict}: {result['subject']}"[:200],
+            'data': {'range': revision_range, 'result': result, 'stats': stats},
+        })
+    return rows
+
+def record_range(revision_range, results, stats, store=None):
+    """Append a checked commit range to the analysis history; returns its batch ID"""
+    rows = range_rows(revision_range, results, stats)
+    append_history(rows, store)
+    return rows[0]['batch'] if rows else None
+
+def range_report(revision_range, results, stats, generated=None, branch=None):
+    """Markdown chunks of the report for a checked commit range"""
+    generated = generated or datetime.now()
+    counts = {}
+    for result in results:
+        key = 'error' if result['error'] else (result['verdict'] or 'unclear')
+        counts[key] = counts.get(key, 0) + 1
+    verdict_summary = ', '.join(f'{count} {verdict.lower()}' for verdict, count in sorted(counts.items()))
+    rate = f"{stats['commits_per_minute']:.0f}" if stats.get('commits_per_minute') else '-'
+
+    yield f"""# 🎯 VibeTrack Commit Range Report
+
+## 📊 Report Information
+- **Generated:** {generated.strftime("%Y-%m-%d %H:%M:%S")}
+- **Analysis Type:** Commit Range
+- **Range:** {revision_range}
+- **Current Branch:** {branch or get_current_branch()}
+- **Commits:** {stats['commits']} ({verdict_summary})
+
+## 📋 Commits
+
+| # | Commit | Subject | +/- | Verdict |
+|---|--------|---------|-----|---------|
+"""
+    for index, result in enumerate(results, 1):
+        diff_stats = result['diff_stats']
+        verdict = 'error' if result['error'] else (result['verdict'] or '-')
+        yield (f"| {index} | `{result['commit_hash'][:8]}` | {_table_cell(result['subject'])} | "
+               f"+{diff_stats['additions']} -{diff_stats['deletions']} | {verdict} |\n")
+
+    yield '\n## 🧠 AI Analysis\n'
+    for index, result in enumerate(results, 1):
+        diff_stats = result['diff_stats']
+        yield f"""
+### {index}. `{result['commit_hash'][:8]}` {result['subject']}
+- **Author:** {result['author']}, {result['date']}
+- **Files Changed:** {diff_stats['files_changed']} (+{diff_stats['additions']} -{diff_stats['deletions']})
+- **Verdict:** {'error' if result['error'] else (result['verdict'] or '-')}
+
+```
+{result['commit_message']}
+```
+
+{result['error'] or result['analysis'] or 'No changes in this commit.'}
+"""
+
+    yield f"""
+## 🔧 Technical Details
+- **Commits Analyzed:** {stats['commits']} ({stats['failed']} failed, {stats.get('from_index', 0)} reused from the analysis index, {stats.get('model_calls_avoided', 0)} settled by the local pre-screen)
+- **Wall Time:** {stats['total_time']:.1f} s ({rate} commits/min, {stats['concurrency']} at a time)
+
+---
+*Generated by VibeTrack v{VERSION} - دستیار شخصی برای Vibe Coders*
+*GitHub: https://github.com/alireza-taheriF/vibetrack*
+"""
+
+def save_range_report(revision_range, results, stats, batch=None):
+    """Save one markdown report for a checked commit range (commit_analyzer.analyze_commit_range)"""
+    generated = datetime.now()
+    filename = os.path.join(HISTORY_DIR, f'vibetrack_log_{batch or report_id(generated)}.md')
+    return write_atomic(filename, range_report(revision_range, results, stats, generated))
+
+def export_history(rows, report_format, history_dir=HISTORY_DIR):
+    """Write the analysis in HistoryStore.get() rows as a file; returns its filename"""
+    first = rows[0]
+    if first['analysis_type'] != 'log':
+        return Report.from_dict(first['data']).save([report_format], history_dir)[report_format]
+    filename = os.path.join(history_dir, f"vibetrack_log_{first['batch']}.{report_format}")
+    data = first['data']
+    results = [row['data']['result'] for row in rows]
+    if report_format == 'md':
+        chunks = range_report(data['range'], results, data['stats'],
+                              datetime.fromisoformat(first['created_at']), first['branch'])
+    elif report_format == 'json':
+        export = {'range': data['range'], 'generated': first['created_at'], 'current_branch': first['branch'],
+                  'stats': data['stats'], 'commits': results}
+        chunks = json.JSONEncoder(indent=2, ensure_ascii=False, default=str).iterencode(export)
+    else:
+        raise ValueError('Commit range reports export as md or json')
+    return write_atomic(filename, chunks)
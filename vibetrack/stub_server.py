@@ -0,0 +1,319 @@
+"""
+Stand-in OpenAI-compatible server for load tests and CI, where no model runs.
+
+It answers POST /v1/chat/completions (with or without `stream: true`) and
+GET /v1/models, with a configurable wait before the first token, token rate,
+number of requests generated at once, and injected errors. Answers come from:
+- a cassette being replayed (`--replay --cassette FILE`): the answers recorded for the
+  same prompt, so runs are deterministic; unknown prompts get a 404;
+- a real server being recorded (`--record URL --cassette FILE`): requests are
+  forwarded and every answer is appended to the cassette;
+- otherwise a canned answer derived from the prompt.
+Cassettes are JSON lines keyed like the response cache (model, sampling
+parameters and normalized messages). GET /stub/stats reports request, error
+and peak concurrency counts.
+
+Usage: python -m vibetrack.stub_server [--port 8001] [--latency 0.2] [--token-rate 50] [--error-rate 0.1]
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from vibetrack.response_cache import cache_key
+
+_WORDS = ('This change updates the code path and keeps the behavior of the callers the same. '
+          'It renames a helper, adjusts the arguments and adds a check for the empty case.').split()
+_PIECE_RE = re.compile(r'\s*\S+')
+
+def canned_answer(messages, tokens=40):
+    """A fixed answer of about `tokens` words, chosen by the prompt"""
+    digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode('utf-8')).hexdigest()
+    start = int(digest[:8], 16) % len(_WORDS)
+    words = [_WORDS[(start + index) % len(_WORDS)] for index in range(tokens)]
+    return f'[stub {digest[:8]}] ' + ' '.join(words)
+
+def pieces(text):
+    """The text cut into word-sized pieces, the way a server streams tokens"""
+    return _PIECE_RE.findall(text) or [text]
+
+class Cassette:
+    """Recorded answers in a JSON-lines file, keyed by response_cache.cache_key"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry['key']] = entry
+        except FileNotFoundError:
+            pass
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def record(self, key, model, text, usage=None):
+        entry = {'key': key, 'model': model, 'text': text, 'usage': usage}
+        with self._lock:
+            self.entries[key] = entry
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # A client that hung up (or a connection cut by stop()) is part of the test, not a server bug
+        if not isinstance(sys.exc_info()[1], (ConnectionError, socket.timeout)):
+            super().handle_error(request, client_address)
+
+class StubServer:
+    """The stand-in server on a background thread; `url` is its chat completions endpoint"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, token_rate=0.0, slots=0,
+                 error_rate=0.0, error_status=503, retry_after=None, answer_tokens=40,
+                 cassette=None, replay=False, record_url=None, seed=None):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.answer_tokens = answer_tokens
+        self.cassette = Cassette(cassette) if cassette else None
+        self.replay = replay
+        self.record_url = record_url
+        if (replay or record_url) and self.cassette is None:
+            raise ValueError('Record and replay need a cassette file')
+        # Requests generating at once, like a server with that many slots (0: no limit)
+        self._slots = threading.Semaphore(slots) if slots > 0 else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'streams': 0, 'in_flight': 0, 'peak_in_flight': 0}
+        self.httpd = _HTTPServer((host, port), self._handler_class())
+        self._thread = None
+        self._connections = set()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/v1/chat/completions'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='vibetrack-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop like a server that went down: kept-alive connections are cut as well"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            self.stats[name] += delta
+            if name == 'in_flight':
+                self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+
+    def _inject_error(self):
+        with self._lock:
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def answer(self, payload):
+        """(status, text, usage) for a chat completions payload"""
+        model = payload.get('model', 'stub')
+        messages = payload.get('messages', [])
+        key = cache_key(model, messages, temperature=payload.get('temperature', 0.7),
+                        max_tokens=payload.get('max_tokens', 1024))
+        if self.cassette is not None:
+            entry = self.cassette.get(key)
+            if entry is not None:
+                return 200, entry['text'], entry.get('usage')
+            if self.replay:
+                return 404, f'No recorded answer for this prompt ({key[:12]})', None
+        if self.record_url:
+            forwarded = dict(payload, stream=False)
+            response = requests.post(self.record_url, json=forwarded, timeout=(5, 600))
+            if not response.ok:
+                return response.status_code, response.text, None
+            result = response.json()
+            text = result['choices'][0]['message']['content']
+            self.cassette.record(key, model, text, result.get('usage'))
+            return 200, text, result.get('usage')
+        return 200, canned_answer(messages, self.answer_tokens), None
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; without this, kept-alive
+                # connections wait on delayed ACKs like no real server does
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with stub._lock:
+                    stub._connections.add(self.connection)
+
+            def finish(self):
+                with stub._lock:
+                    stub._connections.discard(self.connection)
+                try:
+                    super().finish()
+                except OSError:
+                    pass
+
+            def _json(self, status, body, headers=None):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip('/').endswith('/models'):
+                    self._json(200, {'object': 'list', 'data': [{'id': 'stub', 'object': 'model'}]})
+                elif self.path.rstrip('/') == '/stub/stats':
+                    with stub._lock:
+                        stats = dict(stub.stats)
+                    self._json(200, stats)
+                else:
+                    self._json(404, {'error': {'message': 'Not found'}})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._json(400, {'error': {'message': 'Invalid JSON'}})
+                    return
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._json(404, {'error': {'message': 'Not found'}})
+                    return
+                stub._count('requests')
+                if stub._inject_error():
+                    stub._count('errors')
+                    headers = {'Retry-After': str(stub.retry_after)} if stub.retry_after is not None else None
+                    self._json(stub.error_status, {'error': {'message': 'Injected error'}}, headers)
+                    return
+                stub._count('in_flight')
+                try:
+                    if stub._slots is not None:
+                        with stub._slots:
+                            self._complete(payload)
+                    else:
+                        self._complete(payload)
+                finally:
+                    stub._count('in_flight', -1)
+
+            def _complete(self, payload):
+                status, text, usage = stub.answer(payload)
+                if status != 200:
+                    stub._count('errors')
+                    self._json(status, {'error': {'message': text}})
+                    return
+                parts = pieces(text)
+                usage = usage or {'prompt_tokens': 0, 'completion_tokens': len(parts), 'total_tokens': len(parts)}
+                delay = 1.0 / stub.token_rate if stub.token_rate > 0 else 0.0
+                time.sleep(stub.latency)
+                created = int(time.time())
+                if not payload.get('stream'):
+                    time.sleep(delay * len(parts))
+                    self._json(200, {
+                        'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': created,
+                        'model': payload.get('model', 'stub'),
+                        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text},
+                                     'finish_reason': 'stop'}],
+                        'usage': usage
+                    })
+                    return
+
+                stub._count('streams')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+                for index, part in enumerate(parts):
+                    if index:
+                        time.sleep(delay)
+                    self._event({'choices': [{'index': 0, 'delta': {'content': part}, 'finish_reason': None}]},
+                                created, payload)
+                self._event({'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}], 'usage': usage},
+                            created, payload)
+                self.wfile.write(b'data: [DONE]\n\n')
+                self.wfile.flush()
+
+            def _event(self, body, created, payload):
+                body = dict(body, id='chatcmpl-stub', object='chat.completion.chunk', created=created,
+                            model=payload.get('model', 'stub'))
+                self.wfile.write(b'data: ' + json.dumps(body).encode('utf-8') + b'\n\n')
+                self.wfile.flush()
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before the first token')
+    parser.add_argument('--token-rate', type=float, default=0.0, help='tokens per second (0: all at once)')
+    parser.add_argument('--slots', type=int, default=0, help='requests generated at once (0: no limit)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with --error-status')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--retry-after', type=float, default=None, help='Retry-After seconds sent with injected errors')
+    parser.add_argument('--answer-tokens', type=int, default=40, help='length of canned answers')
+    parser.add_argument('--seed', type=int, default=None, help='seed for error injection')
+    parser.add_argument('--cassette', help='JSON-lines file of recorded answers')
+    parser.add_argument('--record', metavar='URL', help='forward requests to this server and record its answers')
+    parser.add_argument('--replay', action='store_true', help='answer only from the cassette')
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, latency=args.latency, token_rate=args.token_rate, slots=args.slots,
+                        error_rate=args.error_rate, error_status=args.error_status, retry_after=args.retry_after,
+                        answer_tokens=args.answer_tokens, cassette=args.cassette, replay=args.replay,
+                        record_url=args.record, seed=args.seed)
+    mode = 'replaying ' + args.cassette if args.replay else (f'recording {args.record}' if args.record else 'canned answers')
+    print(f'Stub model server on {server.url} ({mode}); export VIBETRACK_API_URL={server.url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Compare two directory trees that are not in git (vendor drops, release
+tarballs, exported sources).
+
+Both trees are walked, files that could be unchanged (present on both sides
+with the same size) are hashed in a thread pool, and only paths whose content
+differs are diffed. A file that disappeared on one side and appeared under
+another name with identical content is reported as a rename, like git does.
+Hashes are git blob ids, so they line up with the diff's index lines.
+"""
+
+import hashlib
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+from vibetrack.diff_engine import DEFAULT_ALGORITHM, unified_diff_files
+from vibetrack.diff_utils import PathFilter
+from vibetrack.git_objects import TreeChange
+
+_HASH_CHUNK = 1 << 20
+# Files per pool task: most source files are small, so a future per file costs more than the hash
+_HASH_BATCH = 256
+
+def walk_tree(root, path_filter=None):
+    """Map every regular file under root ('/'-separated relative path) to (size, git mode)
+
+    Symlinks are not followed, .git directories are skipped and directories
+    covered by an exclude rule are not entered.
+    """
+    files = {}
+    stack = ['']
+    while stack:
+        relative_dir = stack.pop()
+        try:
+            entries = os.scandir(os.path.join(root, relative_dir) if relative_dir else root)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                relative = f'{relative_dir}/{entry.name}' if relative_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name != '.git' and not (path_filter is not None and path_filter.excludes_dir(relative)):
+                            stack.append(relative)
+                    elif entry.is_file(follow_symlinks=False):
+                        if path_filter is None or path_filter.matches(relative):
+                            info = entry.stat(follow_symlinks=False)
+                            mode = '100755' if info.st_mode & stat.S_IXUSR else '100644'
+                            files[relative] = (info.st_size, mode)
+                except OSError:
+                    continue
+    return files
+
+def hash_file(path):
+    """git blob id of a file (hashlib drops the GIL while hashing, so threads overlap)"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        digest = hashlib.sha1(b'blob %d\0' % size)
+        while True:
+            chunk = f.read(_HASH_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _hash_batch(paths):
+    return [hash_file(path) for path in paths]
+
+def hash_files(paths, pool):
+    """Hash many files on a thread pool, in order"""
+    batches = [paths[start:start + _HASH_BATCH] for start in range(0, len(paths), _HASH_BATCH)]
+    return [oid for batch in pool.map(_hash_batch, batches) for oid in batch]
+
+def compare_trees(old_root, new_root, path_filter=None, workers=None):
+    """List the TreeChanges (A/D/M/R) between two directories, sorted by path"""
+    if path_filter is None:
+        path_filter = PathFilter()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        old_walk = pool.submit(walk_tree, old_root, path_filter)
+        new_files = walk_tree(new_root, path_filter)
+        old_files = old_walk.result()
+
+        common = old_files.keys() & new_files.keys()
+        removed = sorted(old_files.keys() - common)
+        added = sorted(new_files.keys() - common)
+        # A size change already proves the content changed; everything else needs a hash
+        same_size = sorted(path for path in common if old_files[path][0] == new_files[path][0])
+
+        jobs = [(old_root, path) for path in same_size + removed] + [(new_root, path) for path in same_size + added]
+        hashes = dict(zip(jobs, hash_files([os.path.join(root, path) for root, path in jobs], pool)))
+
+    changes = []
+    for path in common:
+        old_mode, new_mode = old_files[path][1], new_files[path][1]
+        old_oid = hashes.get((old_root, path))
+        new_oid = hashes.get((new_root, path))
+        if old_oid is not None and old_oid == new_oid and old_mode == new_mode:
+            continue
+        changes.append(TreeChange('M', path, path, old_mode, new_mode, old_oid, new_oid))
+
+    # Exact renames: pair removed and added files with the same content
+    removed_by_hash = {}
+    for path in removed:
+        removed_by_hash.setdefault(hashes[(old_root, path)], []).append(path)
+    renamed_from = set()
+    for path in added:
+        oid = hashes[(new_root, path)]
+        candidates = removed_by_hash.get(oid)
+        if candidates:
+            old_path = candidates.pop(0)
+            renamed_from.add(old_path)
+            changes.append(TreeChange('R', old_path, path, old_files[old_path][1], new_files[path][1], oid, oid))
+        else:
+            changes.append(TreeChange('A', None, path, None, new_files[path][1], None, oid))
+    for path in removed:
+        if path not in renamed_from:
+            changes.append(TreeChange('D', path, None, old_files[path][1], None, hashes[(old_root, path)], None))
+
+    changes.sort(key=lambda change: change.path)
+    return changes
+
+def _rename_diff(change):
+    lines = [f'diff --git a/{change.old_path} b/{change.new_path}']
+    if change.old_mode != change.new_mode:
+        lines.append(f'old mode {change.old_mode}')
+        lines.append(f'new mode {change.new_mode}')
+    lines += ['similarity index 100%', f'rename from {change.old_path}', f'rename to {change.new_path}']
+    return '\n'.join(lines) + '\n'
+
+def iter_tree_diffs(old_root, new_root, changes=None, path_filter=None, algorithm=DEFAULT_ALGORITHM):
+    """Yield the git-style diff of every changed file between two directories"""
+    if changes is None:
+        changes = compare_trees(old_root, new_root, path_filter)
+    for change in changes:
+        if change.status == 'R':
+            yield _rename_diff(change)
+            continue
+        old_path = os.path.join(old_root, change.old_path) if change.old_path is not None else None
+        new_path = os.path.join(new_root, change.new_path) if change.new_path is not None else None
+        file_diff = unified_diff_files(old_path, new_path, algorithm=algorithm,
+                                       old_name=change.old_path, new_name=change.new_path)
+        if file_diff:
+            yield file_diff